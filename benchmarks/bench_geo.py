@@ -0,0 +1,104 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from core.geo import REFERENTIEL, ZONES_FISCALES, ZONES_4, ZONES_MACRO, normaliser_departements, attributs_departement
+
+# ---------------------------------------------------------
+# Benchmark : référentiel vectorisé (core.geo) vs .apply ligne à ligne
+#
+#   python benchmarks/bench_geo.py                # 10 000 000 lignes
+#   python benchmarks/bench_geo.py --lignes 1e6
+# ---------------------------------------------------------
+
+# Ancien chemin : fonctions appelées une fois par ligne (versions des pages / de prep_data.py)
+_DEP_REGION = REFERENTIEL["region"].to_dict()
+_DEP_FISCALE = {d: z for z, deps in ZONES_FISCALES.items() for d in deps}
+
+
+def pad_dep(dep):
+    if dep in ["2A", "2B"]:
+        return dep
+    return dep.zfill(2)
+
+
+def map_region(dep):
+    return _DEP_REGION.get(dep, "Région inconnue")
+
+
+def map_zone_macro(region):
+    return ZONES_MACRO.get(region, "Centre")
+
+
+def map_zone_fiscale(dep):
+    return _DEP_FISCALE.get(dep, "Zone C")
+
+
+def get_zone(dep):
+    for z, liste in ZONES_4.items():
+        if dep in liste:
+            return z
+    return "Zone_Autre"
+
+
+def chemin_apply(deps: pd.Series) -> pd.DataFrame:
+    codes = deps.astype(str).str.replace(" ", "").apply(pad_dep)
+    region = codes.apply(map_region)
+    return pd.DataFrame({
+        "code_departement": codes,
+        "region": region,
+        "zone_macro": region.apply(map_zone_macro),
+        "zone_fiscale": codes.apply(map_zone_fiscale),
+        "zone4": codes.apply(get_zone),
+    })
+
+
+def chemin_vectorise(deps: pd.Series) -> pd.DataFrame:
+    codes = normaliser_departements(deps)
+    geo = attributs_departement(codes, ["region", "zone_macro", "zone_fiscale", "zone4"])
+    return pd.concat([codes.rename("code_departement"), geo], axis=1)
+
+
+def chrono(f, *args):
+    t0 = time.perf_counter()
+    out = f(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lignes", type=float, default=10_000_000)
+    args = parser.parse_args()
+    n = int(args.lignes)
+
+    # Codes bruts comme dans les CSV : non paddés, Corse, quelques hors référentiel
+    rng = np.random.default_rng(0)
+    valeurs = np.array(
+        [c.lstrip("0") if c[0] == "0" and rng.random() < 0.5 else c for c in REFERENTIEL.index]
+        + ["971", "974"],
+        dtype=object,
+    )
+    deps = pd.Series(valeurs[rng.integers(0, len(valeurs), n)], dtype=object)
+    print(f"📊 {n:,} lignes, {deps.nunique()} codes distincts")
+
+    ref, t_apply = chrono(chemin_apply, deps)
+    print(f"⏱️ .apply ligne à ligne : {t_apply:6.2f} s")
+
+    vec, t_vec = chrono(chemin_vectorise, deps)
+    print(f"⏱️ core.geo vectorisé   : {t_vec:6.2f} s  (x{t_apply / t_vec:.0f})")
+
+    deps_cat = deps.astype("category")
+    _, t_cat = chrono(chemin_vectorise, deps_cat)
+    print(f"⏱️ core.geo sur colonne déjà catégorielle : {t_cat:6.3f} s")
+
+    for c in ref.columns:
+        assert (vec[c].astype(object).to_numpy() == ref[c].to_numpy()).all(), c
+    print("✅ Résultats identiques")
+
+
+if __name__ == "__main__":
+    main()
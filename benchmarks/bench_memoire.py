@@ -0,0 +1,105 @@
+import sys
+import json
+import pickle
+import argparse
+import subprocess
+import os
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from core.lecture import CSV_PATH
+from core.cube import BORNES_PRIX
+from core.dataset import _Magasin
+
+# ---------------------------------------------------------
+# Benchmark : mémoire résidente, copie par page et par session (avant)
+# vs base partagée (après)
+#
+#   python benchmarks/bench_memoire.py                 # 10 sessions
+#   python benchmarks/bench_memoire.py --sessions 20
+#
+# Chaque scénario tourne dans un processus neuf ; on mesure l'écart de RSS
+# (/proc/self/statm, Linux) entre le démarrage et la fin du scénario, objets
+# toujours référencés.
+# ---------------------------------------------------------
+
+# Colonnes lues par chaque page (versions actuelles de pages/*.py)
+PAGES = {
+    "analyse_immobilier": [
+        "annee", "code_departement", "nom_departement", "region", "zone_macro", "zone_fiscale", "zone_paris",
+        "type_local", "prix_m2", "valeur_fonciere", "surface_reelle_bati", "commune", "nb_transactions", "id_mutation",
+    ],
+    "analyse_climat": [
+        "code_departement", "nom_departement", "region", "zone5", "annee", "population_exposee",
+        "risque_global", "risque_chaleur", "risque_inondation", "risque_secheresse", "risque_feux",
+        "code_commune", "commune",
+    ],
+    "conclusion": ["zone", "region", "code_departement", "nom_departement", "type_local", "annee", "prix_m2", "risque_climatique"],
+}
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def scenario_avant(sessions: int) -> list:
+    """
+    Ancien chemin : chaque page lit tout le CSV sous @st.cache_data, qui garde
+    le résultat sérialisé et en renvoie une copie désérialisée à chaque appel
+    (une par session, au minimum).
+    """
+    gardes = []
+    for _ in PAGES:
+        df = pd.read_csv(CSV_PATH, dtype={"code_departement": str}, low_memory=False)
+        blob = pickle.dumps(df)
+        del df
+        gardes.append(blob)
+        gardes += [pickle.loads(blob) for _ in range(sessions)]
+    return gardes
+
+
+def scenario_apres(sessions: int) -> list:
+    """Chemin actuel : un magasin de colonnes par processus, vues projetées par page et par session."""
+    magasin = _Magasin()
+    immo = magasin.vue(PAGES["analyse_immobilier"])
+    gardes = [magasin, immo[immo["prix_m2"].between(*BORNES_PRIX, inclusive="both")]]
+    for _ in range(sessions):
+        gardes += [magasin.vue(PAGES["analyse_climat"]), magasin.vue(PAGES["conclusion"])]
+    return gardes
+
+
+def mesurer(scenario: str, sessions: int) -> dict:
+    depart = rss()
+    gardes = {"avant": scenario_avant, "apres": scenario_apres}[scenario](sessions)
+    octets = rss() - depart
+    assert gardes
+    return {"scenario": scenario, "sessions": sessions, "octets": octets}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--scenario", choices=["avant", "apres"])
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(mesurer(args.scenario, args.sessions)))
+        return
+
+    print(f"📊 {len(PAGES)} pages, {args.sessions} sessions, {CSV_PATH.name}")
+    resultats = {}
+    for scenario in ["avant", "apres"]:
+        sortie = subprocess.run(
+            [sys.executable, __file__, "--scenario", scenario, "--sessions", str(args.sessions)],
+            capture_output=True, text=True, check=True,
+        )
+        resultats[scenario] = json.loads(sortie.stdout.strip().splitlines()[-1])["octets"]
+        print(f"💾 {scenario:5s} : {resultats[scenario] / 1024 ** 2:8.1f} Mo de RSS")
+
+    print(f"✅ Gain mesuré : x{resultats['avant'] / max(resultats['apres'], 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Briques partagées par les pages du dashboard (chargement, géographie, filtres...)
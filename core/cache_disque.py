@@ -0,0 +1,137 @@
+import os
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from core.lecture import DATA_DIR
+
+
+# CACHE DISQUE DES AGRÉGATS
+#
+# Second niveau sous le mémo LRU en mémoire (core.memo) : les agrégats des
+# pages (cartes départementales, classements de communes, séries annuelles,
+# dep_agg climat) sont écrits en Arrow IPC compressé, sous une clé
+# <version des données>-<signature de la requête>-<date d'écriture>. Au
+# redémarrage, les vues courantes sont relues au lieu d'être recalculées.
+# Âge maximal compté depuis l'écriture (date portée par le nom du fichier),
+# taille totale plafonnée par éviction des fichiers les moins récemment lus
+# (date de modification, rafraîchie à chaque lecture).
+
+CACHE_DIR = DATA_DIR / "cache_agregats"
+MAX_OCTETS = 256 * 1024 ** 2
+AGE_MAX_S = 7 * 24 * 3600
+
+
+def signature(cle) -> str:
+    return hashlib.sha1(repr(cle).encode("utf-8")).hexdigest()[:20]
+
+
+class CacheDisque:
+    def __init__(self, dossier: Path, version: str, max_octets: int = MAX_OCTETS, age_max_s: float = AGE_MAX_S):
+        self.dossier = Path(dossier)
+        self.version = version
+        self.max_octets = max_octets
+        self.age_max_s = age_max_s
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.purger()
+
+    def _motif(self, cle) -> str:
+        return f"{self.version}-{signature(cle)}-*.arrow"
+
+    @staticmethod
+    def _creation(chemin: Path) -> float:
+        """Date d'écriture de l'entrée, portée par le nom (<version>-<signature>-<création>.arrow)."""
+        try:
+            return float(chemin.stem.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            return 0.0
+
+    def _compter(self, trouve: bool) -> None:
+        with self._verrou:
+            if trouve:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lire(self, cle):
+        """DataFrame stocké pour la clé, ou None (absent, trop vieux ou illisible)."""
+        for chemin in self.dossier.glob(self._motif(cle)):
+            try:
+                if time.time() - self._creation(chemin) > self.age_max_s:
+                    chemin.unlink(missing_ok=True)
+                    continue
+                with pa.memory_map(str(chemin), "r") as source:
+                    df = pa.ipc.open_file(source).read_all().to_pandas()
+                os.utime(chemin)  # date de dernière lecture, pour l'éviction LRU
+                self._compter(True)
+                return df
+            except (OSError, pa.ArrowInvalid):
+                continue
+        self._compter(False)
+        return None
+
+    def ecrire(self, cle, df: pd.DataFrame) -> None:
+        anciens = list(self.dossier.glob(self._motif(cle)))
+        chemin = self.dossier / f"{self.version}-{signature(cle)}-{int(time.time())}.arrow"
+        table = pa.Table.from_pandas(df)
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        tmp = chemin.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with pa.OSFile(str(tmp), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                    writer.write_table(table)
+            tmp.replace(chemin)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        for ancien in anciens:
+            if ancien != chemin:
+                ancien.unlink(missing_ok=True)
+        self.purger()
+
+    def purger(self) -> None:
+        """
+        Supprime les autres versions, les entrées écrites depuis plus de
+        age_max_s (même si elles sont relues), puis les moins récemment lues
+        au-delà du plafond.
+        """
+        with self._verrou:
+            maintenant = time.time()
+            fichiers = []
+            for f in self.dossier.glob("*.arrow"):
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                if not f.name.startswith(f"{self.version}-") or maintenant - self._creation(f) > self.age_max_s:
+                    f.unlink(missing_ok=True)
+                else:
+                    fichiers.append((st.st_mtime, st.st_size, f))
+
+            total = sum(taille for _, taille, _ in fichiers)
+            for _, taille, f in sorted(fichiers, key=lambda x: x[0]):
+                if total <= self.max_octets:
+                    break
+                f.unlink(missing_ok=True)
+                total -= taille
+
+    def octets(self) -> int:
+        return int(sum(f.stat().st_size for f in self.dossier.glob("*.arrow")))
+
+    def stats(self) -> dict:
+        with self._verrou:
+            hits, misses = self.hits, self.misses
+        return {
+            "fichiers": len(list(self.dossier.glob("*.arrow"))),
+            "octets": self.octets(),
+            "max_octets": self.max_octets,
+            "hits": hits,
+            "misses": misses,
+        }
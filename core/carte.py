@@ -0,0 +1,275 @@
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objects as go
+
+from core.lecture import BASE_DIR, DATA_DIR
+
+
+# GÉOMÉTRIE LOCALE DES DÉPARTEMENTS
+#
+# Les cartes n'utilisent plus le GeoJSON distant (pleine résolution) :
+# prep_geo.py dérive du fichier source plusieurs niveaux simplifiés en
+# préservant la topologie (les frontières communes à deux départements sont
+# simplifiées une seule fois, sans trous ni chevauchements).
+#
+# Les niveaux sont servis par Streamlit (static/, voir .streamlit/config.toml)
+# et référencés par URL dans les figures : le navigateur les télécharge une
+# fois et les garde en cache, le serveur ne lit ni ne sérialise la géométrie.
+# Aucun repli sur une source distante : sans niveau préparé, les pages
+# affichent une erreur à la place des cartes.
+
+GEO_DIR = DATA_DIR / "geo"
+STATIC_GEO_DIR = BASE_DIR / "static" / "geo"
+STATIC_GEO_URL = "app/static/geo"
+
+# Fichier source pleine résolution (france-geojson, propriétés code / nom),
+# déposé une fois dans data/geo/ : aucun accès réseau au runtime.
+SOURCE_GEOJSON = GEO_DIR / "departements.geojson"
+
+# Niveaux de simplification : tolérance de Douglas-Peucker (degrés) et
+# nombre de décimales conservées
+NIVEAUX = {
+    "fin": (0.001, 4),
+    "moyen": (0.005, 3),
+    "leger": (0.02, 3),
+}
+
+# Largeur (en degrés de longitude) de la France métropolitaine + Corse
+ETENDUE_DEG = 10.0
+
+
+MESSAGE_GEOMETRIE = (
+    "Géométrie des départements introuvable (static/geo/) : "
+    "lancer `python prep_geo.py` pour préparer les niveaux simplifiés."
+)
+
+
+class GeometrieAbsente(FileNotFoundError):
+    """Aucun niveau simplifié de la géométrie des départements n'a été préparé."""
+
+    def __init__(self):
+        super().__init__(MESSAGE_GEOMETRIE)
+
+
+def chemin_niveau(niveau: str):
+    return STATIC_GEO_DIR / f"departements_{niveau}.geojson"
+
+
+def niveaux_disponibles() -> list:
+    return [n for n in NIVEAUX if chemin_niveau(n).exists()]
+
+
+def niveau_pour(largeur_px: int = 800):
+    """
+    Niveau le plus léger dont l'erreur reste sous le pixel pour une carte de
+    `largeur_px` de large (France entière), sinon le plus fin disponible.
+    """
+    disponibles = sorted(niveaux_disponibles(), key=lambda n: NIVEAUX[n][0])
+    if not disponibles:
+        return None
+    pixel = ETENDUE_DEG / max(largeur_px, 1)
+    adaptes = [n for n in disponibles if NIVEAUX[n][0] <= pixel]
+    return adaptes[-1] if adaptes else disponibles[0]
+
+
+def geometrie_disponible() -> bool:
+    return bool(niveaux_disponibles())
+
+
+def geojson_departements(largeur_px: int = 800) -> str:
+    """URL du niveau local adapté à la taille de la carte ; GeometrieAbsente si aucun niveau n'a été préparé."""
+    niveau = niveau_pour(largeur_px)
+    if niveau is None:
+        raise GeometrieAbsente()
+    return f"{STATIC_GEO_URL}/{chemin_niveau(niveau).name}"
+
+
+# GABARITS DE CHOROPLÈTHE
+#
+# Trace, géographie (fitbounds, fond masqué) et mise en page construites une
+# fois par (géométrie, échelle de couleurs) ; à chaque rerun seules les
+# valeurs par département (locations, z, survol) sont injectées.
+
+@lru_cache(maxsize=32)
+def _gabarit(geojson: str, colorscale) -> go.Figure:
+    fig = go.Figure(go.Choropleth(
+        geojson=geojson,
+        featureidkey="properties.code",
+        locations=[],
+        z=[],
+        colorscale=colorscale,
+        marker_line_width=0.3,
+        marker_line_color="#222",
+    ))
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
+    return fig
+
+
+def choroplethe(
+    codes, valeurs, noms, titre: str, survol: dict = None, colorscale="Blues", format_z: str = ",.0f",
+    largeur_px: int = 800,
+) -> go.Figure:
+    """
+    Carte départementale à partir du gabarit en cache : `codes` / `valeurs`
+    / `noms` alignés, `survol` = {libellé: valeurs} affichées au survol.
+    """
+    survol = {
+        lib: np.round(v, 2) if np.issubdtype(np.asarray(v).dtype, np.floating) else v
+        for lib, v in (survol or {}).items()
+    }
+    lignes = [f"{titre} : %{{z:{format_z}}}"] + [f"{lib} : %{{customdata[{i}]}}" for i, lib in enumerate(survol)]
+    fig = go.Figure(_gabarit(geojson_departements(largeur_px), colorscale))
+    fig.update_traces(
+        locations=np.asarray(codes, dtype=object),
+        z=np.asarray(valeurs, dtype="float64"),
+        text=np.asarray(noms, dtype=object),
+        customdata=np.column_stack([np.asarray(v, dtype=object) for v in survol.values()]) if survol else None,
+        hovertemplate="<b>%{text}</b><br>" + "<br>".join(lignes) + "<extra></extra>",
+        colorbar_title_text=titre,
+    )
+    return fig
+
+
+# SIMPLIFICATION TOPOLOGIQUE (hors ligne, prep_geo.py)
+
+def _douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Masque des points conservés d'une polyligne (extrémités toujours gardées)."""
+    n = len(points)
+    garder = np.zeros(n, dtype=bool)
+    garder[0] = garder[-1] = True
+    pile = [(0, n - 1)]
+    while pile:
+        i, j = pile.pop()
+        if j <= i + 1:
+            continue
+        a, b = points[i], points[j]
+        segment = points[i + 1:j] - a
+        ab = b - a
+        longueur = np.hypot(*ab)
+        if longueur == 0:
+            d = np.hypot(segment[:, 0], segment[:, 1])
+        else:
+            d = np.abs(ab[0] * segment[:, 1] - ab[1] * segment[:, 0]) / longueur
+        k = int(np.argmax(d))
+        if d[k] > tolerance:
+            m = i + 1 + k
+            garder[m] = True
+            pile += [(i, m), (m, j)]
+    return garder
+
+
+def _polygones(geometrie: dict) -> list:
+    if geometrie["type"] == "Polygon":
+        return [geometrie["coordinates"]]
+    if geometrie["type"] == "MultiPolygon":
+        return geometrie["coordinates"]
+    return []
+
+
+def _cle(point) -> tuple:
+    return (round(point[0] * 1e7), round(point[1] * 1e7))
+
+
+def simplifier_topologie(geojson: dict, tolerance: float, decimales: int = 4, proprietes=("code", "nom")) -> dict:
+    """
+    Simplifie toutes les frontières d'une FeatureCollection sans casser les
+    contacts entre polygones : chaque anneau est découpé en arcs aux jonctions
+    (points partagés par un ensemble différent d'anneaux), chaque arc est
+    simplifié une seule fois puis réutilisé, à l'envers, par l'anneau voisin.
+    """
+    # Anneaux (sans le point de fermeture)
+    anneaux = []
+    structure = []
+    for feature in geojson["features"]:
+        polys = []
+        for poly in _polygones(feature["geometry"]):
+            ids = []
+            for ring in poly:
+                pts = np.asarray(ring, dtype="float64")[:, :2]
+                if len(pts) > 1 and np.array_equal(pts[0], pts[-1]):
+                    pts = pts[:-1]
+                ids.append(len(anneaux))
+                anneaux.append(pts)
+            polys.append(ids)
+        structure.append(polys)
+
+    # Anneaux contenant chaque point
+    cles = [[_cle(p) for p in pts] for pts in anneaux]
+    occurrences = {}
+    for i, ks in enumerate(cles):
+        for k in ks:
+            occurrences.setdefault(k, set()).add(i)
+
+    # Jonctions : le voisinage du point change (début / fin de frontière commune)
+    jonctions = set()
+    for ks in cles:
+        n = len(ks)
+        for j, k in enumerate(ks):
+            ens = occurrences[k]
+            if len(ens) > 2 or ens != occurrences[ks[j - 1]] or ens != occurrences[ks[(j + 1) % n]]:
+                jonctions.add(k)
+
+    arcs = {}
+
+    def arc_simplifie(pts, ks):
+        # Sens canonique : les deux anneaux voisins obtiennent le même arc
+        sens = tuple(ks) <= tuple(reversed(ks))
+        cle_arc = tuple(ks) if sens else tuple(reversed(ks))
+        if cle_arc not in arcs:
+            p = pts if sens else pts[::-1]
+            arcs[cle_arc] = p[_douglas_peucker(p, tolerance)]
+        res = arcs[cle_arc]
+        return res if sens else res[::-1]
+
+    def anneau_simplifie(i):
+        pts, ks = anneaux[i], cles[i]
+        n = len(pts)
+        if n < 4:
+            return pts
+        coupes = [j for j, k in enumerate(ks) if k in jonctions]
+        if not coupes:
+            # Île : coupée au premier point et au point le plus éloigné
+            d = np.hypot(*(pts - pts[0]).T)
+            coupes = sorted({0, int(np.argmax(d))})
+        morceaux = []
+        for a, b in zip(coupes, coupes[1:] + [coupes[0] + n]):
+            idx = np.arange(a, b + 1) % n
+            morceaux.append(arc_simplifie(pts[idx], [ks[j] for j in idx])[:-1])
+        return np.concatenate(morceaux)
+
+    features = []
+    for feature, polys in zip(geojson["features"], structure):
+        nouveaux = []
+        for ids in polys:
+            rings = []
+            for i in ids:
+                pts = np.round(anneau_simplifie(i), decimales)
+                # Doublons consécutifs créés par l'arrondi
+                pts = pts[np.any(pts != np.roll(pts, 1, axis=0), axis=1)]
+                if len(pts) >= 3:
+                    rings.append(np.vstack([pts, pts[:1]]).tolist())
+                elif i == ids[0]:
+                    # Anneau extérieur réduit à rien (petite île) : polygone supprimé
+                    break
+            else:
+                if rings:
+                    nouveaux.append(rings)
+        if not nouveaux:
+            # Département jamais supprimé : anneau extérieur le plus long, non simplifié
+            plus_long = max((ids[0] for ids in polys if ids), key=lambda i: len(anneaux[i]))
+            pts = np.round(anneaux[plus_long], decimales)
+            nouveaux = [[np.vstack([pts, pts[:1]]).tolist()]]
+
+        geometrie = (
+            {"type": "Polygon", "coordinates": nouveaux[0]} if len(nouveaux) == 1
+            else {"type": "MultiPolygon", "coordinates": nouveaux}
+        )
+        features.append({
+            "type": "Feature",
+            "properties": {k: feature["properties"].get(k) for k in proprietes},
+            "geometry": geometrie,
+        })
+
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,83 @@
+import logging
+import pandas as pd
+
+from core.lecture import ARROW_PATH, DATA_DIR, ecrire_arrow, lire_arrow
+from core.cube import ATTRIBUTS_DEPARTEMENT
+
+log = logging.getLogger(__name__)
+
+
+# CLASSEMENT DES COMMUNES PRÉ-AGRÉGÉ
+#
+# Effectif et somme du prix au m² par (annee, code_departement, type_local,
+# commune), attributs du département portés par chaque ligne comme dans le
+# cube : les filtres de la page (hors prix) s'appliquent directement. Un
+# classement quelconque est un roll-up par commune de ces lignes, filtré sur
+# un nombre minimum de ventes, dont on extrait les extrêmes par sélection
+# partielle (nlargest / nsmallest) au lieu de trier toutes les communes.
+
+CLASSEMENT_PATH = DATA_DIR / "classement_communes.arrow"
+
+CLES = ["annee", "code_departement", "type_local", "commune"]
+
+# Nombre minimum de ventes pour classer une commune (évite le bruit des
+# petites communes, cf. data/analyse_base.py)
+SEUIL_VENTES = 30
+TOP_N = 20
+
+
+def construire_classement(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrège la vue immobilier (une ligne par transaction) par commune, année et type."""
+    classement = (
+        df[CLES + ["prix_m2"]]
+        .groupby(CLES, observed=True, as_index=False, sort=True)["prix_m2"]
+        .agg(nb="count", somme_prix="sum")
+    )
+    classement = classement[classement["nb"] > 0]
+
+    attributs = (
+        df[["code_departement", *ATTRIBUTS_DEPARTEMENT]]
+        .drop_duplicates("code_departement")
+        .set_index("code_departement")
+    )
+    classement = classement.join(attributs, on="code_departement")
+    for c in ["code_departement", "type_local", "commune", *ATTRIBUTS_DEPARTEMENT]:
+        classement[c] = classement[c].astype("category")
+    return classement.reset_index(drop=True)
+
+
+def ecrire_classement(classement: pd.DataFrame) -> None:
+    ecrire_arrow(classement, CLASSEMENT_PATH)
+
+
+def charger_classement(df_vue: pd.DataFrame):
+    """Table construite hors ligne (prep_dashboard.py) si elle est à jour, sinon reconstruite ; None sans colonne commune."""
+    if "commune" not in df_vue.columns:
+        return None
+    if CLASSEMENT_PATH.exists() and (
+        not ARROW_PATH.exists() or CLASSEMENT_PATH.stat().st_mtime >= ARROW_PATH.stat().st_mtime
+    ):
+        return lire_arrow(path=CLASSEMENT_PATH)
+    log.warning("Classement des communes absent ou périmé : lancer `python prep_dashboard.py`.")
+    return construire_classement(df_vue)
+
+
+def par_commune(lignes: pd.DataFrame) -> pd.DataFrame:
+    """Roll-up par commune : nb_ventes et prix_m2 moyen (toutes les communes, sans seuil)."""
+    out = (
+        lignes.groupby(["commune", "nom_departement"], observed=True, as_index=False)[["nb", "somme_prix"]]
+        .sum()
+        .rename(columns={"nb": "nb_ventes"})
+    )
+    out = out[out["nb_ventes"] > 0]
+    out["prix_m2"] = out["somme_prix"] / out["nb_ventes"]
+    return out[["commune", "nom_departement", "prix_m2", "nb_ventes"]].reset_index(drop=True)
+
+
+def extremes(communes_agg: pd.DataFrame, seuil: int = SEUIL_VENTES, k: int = TOP_N):
+    """(k plus chères, k moins chères) parmi les communes d'au moins `seuil` ventes."""
+    retenues = communes_agg[communes_agg["nb_ventes"] >= seuil]
+    return (
+        retenues.nlargest(k, "prix_m2").reset_index(drop=True),
+        retenues.nsmallest(k, "prix_m2").reset_index(drop=True),
+    )
@@ -0,0 +1,122 @@
+import logging
+import pandas as pd
+
+from core.lecture import ARROW_PATH, DATA_DIR, ecrire_arrow, lire_arrow
+
+log = logging.getLogger(__name__)
+
+
+# MART CLIMAT
+#
+# Tables pré-agrégées de la page climat, construites hors ligne avec la base
+# dérivée (prep_dashboard.py) : la page ne lit plus les lignes brutes.
+#   - departements : population exposée (somme) et indices de risque
+#     (moyennes) par département, lignes à population renseignée ;
+#   - communes : idem par commune (codes nettoyés, zone5 et région portées) ;
+#   - annees : sommes et effectifs par (annee, département, zone5, région),
+#     dont toute série annuelle filtrée est un roll-up exact.
+
+MART_CLIMAT = {
+    "departements": DATA_DIR / "climat_departements.arrow",
+    "communes": DATA_DIR / "climat_communes.arrow",
+    "annees": DATA_DIR / "climat_annees.arrow",
+}
+
+RISQUES = ["risque_global", "risque_chaleur", "risque_inondation", "risque_secheresse", "risque_feux"]
+CLES_DEPARTEMENT = ["code_departement", "nom_departement", "zone5", "region"]
+CLES_COMMUNE = ["zone5", "region", "code_departement", "nom_departement", "code_commune", "commune"]
+
+# Colonnes de la base lues pour construire le mart
+COLONNES_CLIMAT = [
+    "annee", "code_departement", "nom_departement", "region", "zone5", "population_exposee",
+    *RISQUES, "code_commune", "commune",
+]
+
+
+def _moyennes(d: pd.DataFrame, cles: list) -> pd.DataFrame:
+    risques = [c for c in RISQUES if c in d.columns]
+    agg = {"population_exposee": ("population_exposee", "sum")}
+    agg.update({c: (c, "mean") for c in risques})
+    return d.groupby(cles, as_index=False, observed=True).agg(**agg)
+
+
+def construire_departements(df: pd.DataFrame) -> pd.DataFrame:
+    return _moyennes(df[df["population_exposee"].notna().to_numpy()], CLES_DEPARTEMENT)
+
+
+def construire_communes(df: pd.DataFrame) -> pd.DataFrame:
+    """Communes identifiées (code différent de 00000, nom renseigné), population renseignée."""
+    ok = (
+        df["population_exposee"].notna().to_numpy()
+        & (df["code_commune"] != "00000").to_numpy()
+        & df["commune"].notna().to_numpy()
+    )
+    return _moyennes(df[ok], CLES_COMMUNE)
+
+
+def construire_annees(df: pd.DataFrame) -> pd.DataFrame:
+    """Sommes et effectifs (valeurs renseignées) par (annee, département, zone5, région)."""
+    risques = [c for c in RISQUES if c in df.columns]
+    d = df[df["annee"].notna().to_numpy()]
+    mesures = pd.DataFrame({
+        "annee": d["annee"],
+        "nom_departement": d["nom_departement"],
+        "zone5": d["zone5"],
+        "region": d["region"],
+        "population_exposee": d["population_exposee"],
+        "nb_population": d["population_exposee"].notna().astype("int64"),
+    })
+    for c in risques:
+        mesures[c] = d[c]
+        mesures[f"nb_{c}"] = d[c].notna().astype("int64")
+    cles = ["annee", "nom_departement", "zone5", "region"]
+    return mesures.groupby(cles, observed=True, dropna=False, as_index=False).sum(min_count=1)
+
+
+def construire_mart(df: pd.DataFrame) -> dict:
+    mart = {
+        "departements": construire_departements(df),
+        "annees": construire_annees(df),
+    }
+    if {"code_commune", "commune"}.issubset(df.columns):
+        mart["communes"] = construire_communes(df)
+    return mart
+
+
+def ecrire_mart(mart: dict) -> None:
+    for nom, table in mart.items():
+        ecrire_arrow(table, MART_CLIMAT[nom])
+
+
+def mart_a_jour() -> bool:
+    """Toutes les tables du mart présentes et postérieures à la base dérivée."""
+    return all(
+        c.exists() and (not ARROW_PATH.exists() or c.stat().st_mtime >= ARROW_PATH.stat().st_mtime)
+        for c in MART_CLIMAT.values()
+    )
+
+
+def charger_mart(charger_base) -> dict:
+    """
+    Mart construit hors ligne s'il est à jour ; sinon reconstruit depuis la
+    base, lue par `charger_base()` uniquement dans ce cas.
+    """
+    if mart_a_jour():
+        return {nom: lire_arrow(path=chemin) for nom, chemin in MART_CLIMAT.items() if chemin.exists()}
+    log.warning("Mart climat absent ou périmé : lancer `python prep_dashboard.py`.")
+    return construire_mart(charger_base())
+
+
+# ROLL-UPS DE LA TABLE ANNUELLE
+
+def population_par_annee(annees: pd.DataFrame) -> pd.DataFrame:
+    lignes = annees[annees["nb_population"] > 0]
+    return lignes.groupby("annee", as_index=False)["population_exposee"].sum()
+
+
+def risque_par_zone_annee(annees: pd.DataFrame, risque: str) -> pd.DataFrame:
+    """Moyenne annuelle de `risque` par zone (somme des valeurs / effectif)."""
+    out = annees.groupby(["annee", "zone5"], observed=True, as_index=False)[[risque, f"nb_{risque}"]].sum()
+    out = out[out[f"nb_{risque}"] > 0]
+    out[risque] = out[risque] / out[f"nb_{risque}"]
+    return out[["annee", "zone5", risque]].reset_index(drop=True)
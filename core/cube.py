@@ -0,0 +1,133 @@
+import logging
+import pandas as pd
+import numpy as np
+
+from core.lecture import ARROW_PATH, DATA_DIR, ecrire_arrow, lire_arrow
+
+log = logging.getLogger(__name__)
+
+
+# CUBE IMMOBILIER PRÉ-AGRÉGÉ
+#
+# Cellules (annee, code_departement, type_local, tranche de prix au m²) avec
+# effectif, somme et somme des carrés du prix au m², et somme de la valeur
+# foncière. Les attributs du département (nom, région, zones) sont portés par
+# chaque cellule : tous les filtres de la page s'appliquent au cube, et les
+# KPI / graphiques sont des roll-ups (somme des mesures) sur quelques milliers
+# de cellules au lieu des lignes brutes.
+
+CUBE_PATH = DATA_DIR / "cube_immobilier.arrow"
+
+# Vue « prix_m2 nettoyé » de la page immobilier
+BORNES_PRIX = (50, 30000)
+
+# Largeur des tranches de prix : le curseur de prix avance du même pas, ses
+# bornes tombent donc toujours sur des bords de tranche. Une plage
+# [prix_min, prix_max] du curseur retient les tranches prix_min à prix_max
+# incluses, soit les prix de [prix_min, prix_max + LARGEUR_TRANCHE) : même
+# sélection sur le cube et sur les lignes brutes.
+LARGEUR_TRANCHE = 100
+
+CLES = ["annee", "code_departement", "type_local", "tranche"]
+ATTRIBUTS_DEPARTEMENT = ["nom_departement", "region", "zone_macro", "zone_fiscale", "zone_paris"]
+
+
+def construire_cube(df: pd.DataFrame, largeur: int = LARGEUR_TRANCHE) -> pd.DataFrame:
+    """Agrège la vue immobilier (une ligne par transaction) en cellules du cube."""
+    prix = df["prix_m2"].to_numpy(dtype="float64")
+    mesures = pd.DataFrame({
+        "annee": df["annee"].to_numpy(),
+        "code_departement": df["code_departement"],
+        "type_local": df["type_local"],
+        "tranche": (np.floor(prix / largeur) * largeur).astype("int32"),
+        "prix": prix,
+        "prix2": prix * prix,
+    }, index=df.index)
+
+    agg = {
+        "nb": ("prix", "count"),
+        "somme_prix": ("prix", "sum"),
+        "somme_prix2": ("prix2", "sum"),
+    }
+    if "valeur_fonciere" in df.columns:
+        mesures["valeur"] = df["valeur_fonciere"].to_numpy(dtype="float64")
+        agg["somme_valeur"] = ("valeur", "sum")
+        agg["nb_valeur"] = ("valeur", "count")
+    if "nb_transactions" in df.columns:
+        mesures["transactions"] = pd.to_numeric(df["nb_transactions"], errors="coerce").fillna(0).to_numpy()
+        agg["nb_transactions"] = ("transactions", "sum")
+
+    cube = mesures.groupby(CLES, observed=True, as_index=False, sort=True).agg(**agg)
+
+    attributs = (
+        df[["code_departement", *ATTRIBUTS_DEPARTEMENT]]
+        .drop_duplicates("code_departement")
+        .set_index("code_departement")
+    )
+    cube = cube.join(attributs, on="code_departement")
+    for c in ["code_departement", "type_local", *ATTRIBUTS_DEPARTEMENT]:
+        cube[c] = cube[c].astype("category")
+    return cube
+
+
+def ecrire_cube(cube: pd.DataFrame) -> None:
+    ecrire_arrow(cube, CUBE_PATH)
+
+
+def charger_cube(df_vue: pd.DataFrame) -> pd.DataFrame:
+    """Cube construit hors ligne (prep_dashboard.py) s'il est à jour, sinon reconstruit depuis la vue."""
+    if CUBE_PATH.exists() and (not ARROW_PATH.exists() or CUBE_PATH.stat().st_mtime >= ARROW_PATH.stat().st_mtime):
+        return lire_arrow(path=CUBE_PATH)
+    log.warning("Cube absent ou périmé : lancer `python prep_dashboard.py`.")
+    return construire_cube(df_vue)
+
+
+# ROLL-UPS
+
+def agreger(cellules: pd.DataFrame, par=None) -> pd.DataFrame:
+    """
+    Somme des mesures par `par` (ou au total), puis indicateurs :
+    nb, prix_m2 (moyenne), ecart_type, valeur_fonciere (moyenne),
+    nb_transactions si présent.
+    """
+    mesures = [c for c in ["nb", "somme_prix", "somme_prix2", "somme_valeur", "nb_valeur", "nb_transactions"] if c in cellules.columns]
+    if par:
+        out = cellules.groupby(par, observed=True, as_index=False)[mesures].sum()
+        out = out[out["nb"] > 0]
+    else:
+        out = cellules[mesures].sum().to_frame().T
+
+    nb = out["nb"].to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["prix_m2"] = out["somme_prix"] / nb
+        variance = out["somme_prix2"] / nb - out["prix_m2"] ** 2
+        out["ecart_type"] = np.sqrt(np.maximum(variance, 0))
+        if "somme_valeur" in out.columns:
+            out["valeur_fonciere"] = out["somme_valeur"] / out["nb_valeur"]
+    return out
+
+
+def bornes_histogramme(cellules: pd.DataFrame, nb_barres: int = 50, largeur: int = LARGEUR_TRANCHE) -> np.ndarray:
+    """
+    Bords de `nb_barres` classes environ couvrant l'étendue des prix des
+    cellules (première à dernière tranche non vide), comme un histogramme
+    des lignes, mais alignés sur les tranches du cube (pas multiple de
+    `largeur`).
+    """
+    tranches = cellules.loc[cellules["nb"].to_numpy() > 0, "tranche"].to_numpy(dtype="float64")
+    if not len(tranches):
+        return np.array([0.0, float(largeur)])
+    debut, fin = tranches.min(), tranches.max() + largeur
+    pas = largeur * max(1, int(np.ceil((fin - debut) / largeur / max(nb_barres, 1))))
+    return debut + pas * np.arange(int(np.ceil((fin - debut) / pas)) + 1, dtype="float64")
+
+
+def histogramme(cellules: pd.DataFrame, nb_barres: int = 50) -> tuple:
+    """Bords et effectifs par classe de prix : np.histogram des tranches pondérées par leur effectif."""
+    bornes = bornes_histogramme(cellules, nb_barres)
+    effectifs, _ = np.histogram(
+        cellules["tranche"].to_numpy(dtype="float64"),
+        bins=bornes,
+        weights=cellules["nb"].to_numpy(dtype="float64"),
+    )
+    return bornes, effectifs.astype("int64")
@@ -0,0 +1,112 @@
+import streamlit as st
+import pandas as pd
+import threading
+
+from core.memo import MemoLRU
+from core.execution import WORKERS, creer_pool
+from core.export import FileExports
+from core.cache_disque import CACHE_DIR, CacheDisque
+from core.cube import CUBE_PATH
+from core.classement import CLASSEMENT_PATH
+from core.climat import MART_CLIMAT
+from core.prevision import PREVISIONS_IMMOBILIER_PATH, PREVISIONS_CLIMAT_PATH
+from core.lecture import (
+    CSV_PATH, ARROW_PATH, ColonnesManquantes, lire_colonnes, colonnes_disponibles, verifier_colonnes, version_donnees,
+)
+
+# Copy-on-Write : les vues dérivées (filtres, colonnes) ne dupliquent la mémoire
+# qu'au moment d'une écriture. Toujours actif à partir de pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+# CHARGEMENT DE LA BASE COMMUNE
+
+class _Magasin:
+    """
+    Colonnes de la base déjà chargées, une seule fois par processus. Chaque page
+    demande son jeu de colonnes : seules celles pas encore lues sont projetées
+    depuis le fichier, puis toutes les pages partagent les mêmes Series.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.absentes = set()
+        self._verrou = threading.Lock()
+
+    def vue(self, colonnes) -> pd.DataFrame:
+        with self._verrou:
+            a_lire = [c for c in colonnes if c not in self.series and c not in self.absentes]
+            if a_lire:
+                lu = lire_colonnes(a_lire)
+                for c in a_lire:
+                    if c in lu.columns:
+                        self.series[c] = lu[c]
+                    else:
+                        self.absentes.add(c)
+
+        presentes = [self.series[c] for c in colonnes if c in self.series]
+        if not presentes:
+            return pd.DataFrame()
+        return pd.concat(presentes, axis=1)
+
+
+@st.cache_resource(show_spinner="Chargement de la base…")
+def _magasin() -> _Magasin:
+    return _Magasin()
+
+
+def get_base(requises, optionnelles=()) -> pd.DataFrame:
+    """
+    Base commune aux pages, projetée sur les colonnes utilisées et partagée
+    (sans copie) entre toutes les sessions. À traiter en lecture seule :
+    toute transformation doit produire un nouvel objet.
+
+    Les colonnes requises sont vérifiées une fois ici (la page s'arrête avec
+    un message si l'une manque) ; les optionnelles sont renvoyées si présentes.
+    """
+    if not ARROW_PATH.exists() and not CSV_PATH.exists():
+        st.error(f"Fichier introuvable : {CSV_PATH}")
+        st.stop()
+
+    df = _magasin().vue(list(dict.fromkeys([*requises, *optionnelles])))
+    try:
+        verifier_colonnes(df, requises)
+    except ColonnesManquantes as e:
+        st.error(
+            f"{e}\n\nColonnes disponibles :\n- " + "\n- ".join(colonnes_disponibles()[:120])
+        )
+        st.stop()
+    return df
+
+
+# MÉMO DES AGRÉGATS (une instance par page, partagée entre sessions)
+#
+# Niveau mémoire (LRU) + niveau disque (data/cache_agregats/<page>/) dont les
+# entrées sont préfixées par la version des fichiers de données : une base
+# régénérée invalide d'elle-même les agrégats persistés.
+
+# Base et tables dérivées dont les agrégats persistés peuvent provenir
+FICHIERS_DONNEES = [
+    ARROW_PATH, CSV_PATH, CUBE_PATH, CLASSEMENT_PATH,
+    *MART_CLIMAT.values(), PREVISIONS_IMMOBILIER_PATH, PREVISIONS_CLIMAT_PATH,
+]
+
+@st.cache_resource
+def memo_agregats(page: str, max_entrees: int = 256, max_octets: int = 64 * 1024 ** 2) -> MemoLRU:
+    disque = CacheDisque(CACHE_DIR / page, version=version_donnees(*FICHIERS_DONNEES))
+    return MemoLRU(max_entrees=max_entrees, max_octets=max_octets, disque=disque)
+
+
+# POOL DE CALCUL (partagé entre sessions, voir core.execution)
+
+@st.cache_resource
+def pool_calculs(workers: int = WORKERS):
+    return creer_pool(workers)
+
+
+# FILE DES EXPORTS VOLUMINEUX (partagée, voir core.export)
+
+@st.cache_resource
+def file_exports() -> FileExports:
+    return FileExports()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+
+# NUAGES DE POINTS À GRANDE ÉCHELLE
+#
+# Au-delà de quelques dizaines de milliers de points, un nuage (même WebGL)
+# ne montre plus que du sur-tracé : on agrège alors tous les points filtrés
+# sur une grille 2D (np.histogram2d) affichée en carte de densité. En dessous,
+# les points sont tracés, avec un échantillon stratifié (chaque catégorie
+# garde sa part) si leur nombre dépasse le plafond d'affichage.
+
+SEUIL_DENSITE = 50_000
+MAX_POINTS = 20_000
+GRILLE = (80, 60)
+QUANTILE_MAX = 0.995
+
+
+def grille_densite(x, y, grille=GRILLE, quantile_max: float = QUANTILE_MAX):
+    """
+    Effectifs sur une grille nb_x x nb_y. Les axes s'arrêtent au quantile
+    `quantile_max` : quelques valeurs extrêmes n'écrasent pas l'échelle.
+    Renvoie (bords_x, bords_y, effectifs[nb_y, nb_x]).
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    bornes = [
+        (np.nanmin(v), max(np.nanquantile(v, quantile_max), np.nanmin(v) + 1e-9))
+        for v in (x, y)
+    ]
+    effectifs, bords_x, bords_y = np.histogram2d(x, y, bins=grille, range=bornes)
+    return bords_x, bords_y, effectifs.T.astype("int64")
+
+
+def echantillon_stratifie(df: pd.DataFrame, colonne: str, n: int, random_state: int = 42) -> pd.DataFrame:
+    """
+    Échantillon de `n` lignes au plus, réparti entre les valeurs de `colonne`
+    au prorata de leurs effectifs (au moins une ligne par valeur présente).
+    """
+    if len(df) <= n:
+        return df
+    codes, _ = pd.factorize(df[colonne], use_na_sentinel=False)
+    effectifs = np.bincount(codes)
+    quotas = np.maximum(1, np.floor(effectifs * n / len(df))).astype("int64")
+    quotas = np.minimum(quotas, effectifs)
+
+    rng = np.random.default_rng(random_state)
+    # Rang aléatoire de chaque ligne dans sa strate : on garde les `quota` premiers
+    alea = rng.random(len(df))
+    ordre = np.lexsort((alea, codes))
+    debuts = np.concatenate([[0], np.cumsum(effectifs)[:-1]])
+    rang = np.empty(len(df), dtype="int64")
+    rang[ordre] = np.arange(len(df)) - np.repeat(debuts, effectifs)
+    return df[rang < quotas[codes]]
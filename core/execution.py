@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+
+# EXÉCUTION PARALLÈLE DES AGRÉGATS D'UN RERUN
+#
+# Les agrégats d'un même onglet (carte, histogramme, série annuelle, nuage de
+# points...) sont indépendants : ils sont soumis ensemble à un pool de threads
+# partagé puis récupérés au moment de l'affichage. NumPy / pandas relâchent le
+# GIL sur les opérations lourdes (groupby, tri, réductions), les calculs se
+# recouvrent donc sur un pod multi-cœurs. Aucun appel st.* dans les jobs.
+
+# Nombre de workers : variable d'environnement DASHBOARD_WORKERS (1 = séquentiel)
+WORKERS = int(os.environ.get("DASHBOARD_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def creer_pool(workers: int = WORKERS):
+    """Pool de threads partagé, ou None pour une exécution séquentielle."""
+    if workers <= 1:
+        return None
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calculs")
+
+
+class LotCalculs:
+    """Jobs nommés d'un rerun : soumis au pool, chronométrés, récupérés par nom."""
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._futurs = {}
+        self.durees = {}
+
+    @property
+    def workers(self) -> int:
+        return self.pool._max_workers if self.pool is not None else 1
+
+    def _chrono(self, nom, fn, args, kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.durees[nom] = time.perf_counter() - t0
+
+    def soumettre(self, nom: str, fn, *args, **kwargs) -> "LotCalculs":
+        if self.pool is None:
+            futur = Future()
+            try:
+                futur.set_result(self._chrono(nom, fn, args, kwargs))
+            except Exception as e:
+                futur.set_exception(e)
+        else:
+            futur = self.pool.submit(self._chrono, nom, fn, args, kwargs)
+        self._futurs[nom] = futur
+        return self
+
+    def resultat(self, nom: str):
+        """Attend le job `nom` et renvoie son résultat (ou relève son exception)."""
+        return self._futurs[nom].result()
+
+    def chronos(self) -> pd.DataFrame:
+        return (
+            pd.DataFrame({"job": list(self.durees), "secondes": list(self.durees.values())})
+            .sort_values("secondes", ascending=False)
+            .round(4)
+            .reset_index(drop=True)
+        )
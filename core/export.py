@@ -0,0 +1,186 @@
+import gzip
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.lecture import DATA_DIR
+
+# Optionnel : export Excel (openpyxl, mode write-only à mémoire constante)
+try:
+    from openpyxl import Workbook
+    HAS_OPENPYXL = True
+except Exception:
+    HAS_OPENPYXL = False
+
+
+# EXPORT DES DONNÉES FILTRÉES
+#
+# L'export n'est jamais construit en une seule chaîne : les lignes retenues
+# (numéros de ligne issus des masques de filtres) sont lues par blocs, sur
+# les seules colonnes demandées, et écrites au fil de l'eau dans un fichier
+# temporaire (CSV gzip, Parquet par row groups ou Excel write-only). La
+# mémoire de pointe est celle d'un bloc. Au-delà du plafond de lignes d'un
+# téléchargement direct, l'export part dans une file traitée en tâche de
+# fond et le fichier est récupéré une fois prêt.
+
+TAILLE_BLOC = 100_000
+MAX_LIGNES_DIRECT = 500_000
+MAX_LIGNES_EXCEL = 1_048_575
+EXPORT_DIR = DATA_DIR / "exports"
+AGE_MAX_EXPORT_S = 24 * 3600
+
+FORMATS = {
+    "CSV compressé (.csv.gz)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+if HAS_OPENPYXL:
+    FORMATS["Excel (.xlsx)"] = ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
+def _blocs(df: pd.DataFrame, lignes: np.ndarray, colonnes, taille: int = TAILLE_BLOC):
+    vue = df[list(colonnes)]
+    for debut in range(0, len(lignes), taille):
+        yield vue.take(lignes[debut:debut + taille])
+
+
+def _ecrire_csv_gz(blocs, chemin) -> None:
+    with gzip.open(chemin, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        for i, bloc in enumerate(blocs):
+            f.write(bloc.to_csv(index=False, header=(i == 0)))
+
+
+def _ecrire_parquet(blocs, chemin) -> None:
+    writer = None
+    try:
+        for bloc in blocs:
+            table = pa.Table.from_pandas(bloc, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(chemin, table.schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _ecrire_xlsx(blocs, chemin) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("donnees")
+    for i, bloc in enumerate(blocs):
+        if i == 0:
+            ws.append(list(bloc.columns))
+        # Valeurs Python natives (NaN -> cellule vide)
+        for ligne in bloc.astype(object).where(bloc.notna(), None).itertuples(index=False, name=None):
+            ws.append(list(ligne))
+    wb.save(chemin)
+
+
+_ECRIVAINS = {"csv.gz": _ecrire_csv_gz, "parquet": _ecrire_parquet, "xlsx": _ecrire_xlsx}
+
+
+def exporter(df: pd.DataFrame, lignes: np.ndarray, colonnes, extension: str, chemin) -> None:
+    """Écrit les `lignes` de `df` (colonnes projetées) dans `chemin`, bloc par bloc."""
+    if extension == "xlsx":
+        lignes = lignes[:MAX_LIGNES_EXCEL]
+    _ECRIVAINS[extension](_blocs(df, lignes, colonnes), chemin)
+
+
+def export_direct(df: pd.DataFrame, lignes: np.ndarray, colonnes, extension: str) -> bytes:
+    """Export (au plus MAX_LIGNES_DIRECT lignes) écrit sur disque puis relu : seul le fichier compressé tient en mémoire."""
+    fd, chemin = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(fd)
+    try:
+        exporter(df, lignes[:MAX_LIGNES_DIRECT], colonnes, extension, chemin)
+        with open(chemin, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(chemin)
+
+
+class ExportExpire(FileNotFoundError):
+    """Fichier d'un export terminé supprimé par la purge (plus de AGE_MAX_EXPORT_S)."""
+
+    def __init__(self):
+        super().__init__("Export expiré (fichier supprimé après 24 h) : relancer l'export.")
+
+
+class FileExports:
+    """
+    File d'exports volumineux traités un par un en tâche de fond. Les
+    fichiers de plus de AGE_MAX_EXPORT_S sont purgés avec leur entrée : un
+    export purgé passe à l'état « expiré », puis est oublié.
+    """
+
+    def __init__(self, dossier=EXPORT_DIR, workers: int = 1):
+        self.dossier = dossier
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="exports")
+        self._verrou = threading.Lock()
+        self._travaux = {}
+        self._purger()
+
+    def _purger(self) -> None:
+        """Supprime les fichiers trop vieux et les entrées des travaux finis correspondants."""
+        limite = time.time() - AGE_MAX_EXPORT_S
+        for f in self.dossier.iterdir():
+            if f.is_file() and f.stat().st_mtime < limite:
+                f.unlink(missing_ok=True)
+        for identifiant, travail in list(self._travaux.items()):
+            fini = travail["etat"] not in ("en attente", "en cours")
+            if fini and (travail["cree"] < limite or not travail["chemin"].exists()):
+                del self._travaux[identifiant]
+
+    def _executer(self, identifiant, df, lignes, colonnes, extension):
+        with self._verrou:
+            travail = self._travaux[identifiant]
+            travail["etat"] = "en cours"
+        tmp = travail["chemin"].with_suffix(".tmp")
+        try:
+            exporter(df, lignes, colonnes, extension, tmp)
+            tmp.replace(travail["chemin"])
+            etat = "terminé"
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            etat = f"erreur : {e}"
+        with self._verrou:
+            travail["etat"] = etat
+
+    def soumettre(self, df: pd.DataFrame, lignes: np.ndarray, colonnes, extension: str) -> str:
+        identifiant = uuid.uuid4().hex[:12]
+        with self._verrou:
+            self._purger()
+            self._travaux[identifiant] = {
+                "etat": "en attente",
+                "chemin": self.dossier / f"export_{identifiant}.{extension}",
+                "lignes": len(lignes),
+                "soumis": time.strftime("%H:%M:%S"),
+                "cree": time.time(),
+            }
+        self._pool.submit(self._executer, identifiant, df, lignes, list(colonnes), extension)
+        return identifiant
+
+    def etat(self, identifiant: str) -> dict:
+        """État d'un export ; « expiré » si son fichier a été purgé (l'entrée est alors oubliée)."""
+        with self._verrou:
+            travail = self._travaux.get(identifiant)
+            if travail is None:
+                return {"etat": "inconnu"}
+            if travail["etat"] == "terminé" and not travail["chemin"].exists():
+                del self._travaux[identifiant]
+                return {**travail, "etat": "expiré"}
+            return dict(travail)
+
+    def contenu(self, identifiant: str) -> bytes:
+        """Octets du fichier d'un export terminé ; ExportExpire s'il a été purgé entre-temps."""
+        travail = self.etat(identifiant)
+        try:
+            return travail["chemin"].read_bytes()
+        except (KeyError, FileNotFoundError):
+            raise ExportExpire() from None
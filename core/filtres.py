@@ -0,0 +1,144 @@
+import threading
+
+import pandas as pd
+import numpy as np
+
+
+# MOTEUR DE FILTRES
+#
+# Un masque booléen par dimension, calculé une seule fois par rerun. Les
+# variantes dont les pages ont besoin (toutes années, année précédente, sans
+# le département...) sont des combinaisons de ces masques : on n'enchaîne
+# plus les df.copy() + filtres successifs sur la base complète.
+
+def masque_egal(s: pd.Series, valeur) -> np.ndarray:
+    """s == valeur ; sur une catégorie, comparaison des codes entiers."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        categories = s.cat.categories
+        if valeur not in categories:
+            return np.zeros(len(s), dtype=bool)
+        return s.cat.codes.to_numpy() == categories.get_loc(valeur)
+    return (s == valeur).to_numpy(dtype=bool, na_value=False)
+
+
+def _dans_intervalle(v: np.ndarray, mini, maxi, inclure_maxi: bool = True) -> np.ndarray:
+    return (v >= mini) & ((v <= maxi) if inclure_maxi else (v < maxi))
+
+
+class Filtres:
+    """
+    Filtres d'une page sur un DataFrame (lecture seule). Chaque dimension
+    (colonne) porte au plus un masque ; appliquer() combine les masques
+    demandés et ne matérialise que les lignes retenues.
+
+    Avec un index inversé (core.index) construit sur ce même DataFrame, les
+    dimensions indexées ne sont pas des masques mais des sélections : lignes()
+    les résout par intersection des row ids triés, puis n'évalue les bornes
+    (entre) et les autres masques que sur les lignes candidates.
+    """
+
+    def __init__(self, df: pd.DataFrame, index=None):
+        self.df = df
+        self.index = index
+        self.masques = {}
+        self.selections = {}
+        self.intervalles = {}
+        # Combinaisons calculées, lues depuis les tâches du pool (core.execution)
+        self._combinaisons = {}
+        self._verrou = threading.Lock()
+
+    def _vider(self) -> None:
+        with self._verrou:
+            self._combinaisons.clear()
+
+    def ajouter(self, nom: str, masque) -> "Filtres":
+        self.masques[nom] = np.asarray(masque, dtype=bool)
+        self._vider()
+        return self
+
+    def _selectionner(self, colonne: str, valeurs) -> "Filtres":
+        self.selections[colonne] = list(valeurs)
+        self._vider()
+        return self
+
+    def egal(self, colonne: str, valeur, tous=None) -> "Filtres":
+        """Filtre colonne == valeur, ignoré si valeur vaut l'option « toutes » (tous)."""
+        if valeur is None or valeur == tous:
+            return self
+        if self.index is not None and colonne in self.index:
+            return self._selectionner(colonne, [valeur])
+        return self.ajouter(colonne, masque_egal(self.df[colonne], valeur))
+
+    def dans(self, colonne: str, valeurs) -> "Filtres":
+        """Filtre multi-valeurs (multiselect) ; une sélection vide ne filtre pas."""
+        valeurs = list(valeurs or [])
+        if not valeurs:
+            return self
+        if self.index is not None and colonne in self.index:
+            return self._selectionner(colonne, valeurs)
+        return self.ajouter(colonne, self.df[colonne].isin(valeurs).to_numpy())
+
+    def entre(self, colonne: str, mini, maxi, inclure_maxi: bool = True) -> "Filtres":
+        """Filtre mini <= colonne <= maxi (ou < maxi si not inclure_maxi)."""
+        if self.index is not None:
+            self.intervalles[colonne] = (mini, maxi, inclure_maxi)
+            self._vider()
+            return self
+        return self.ajouter(colonne, _dans_intervalle(self.df[colonne].to_numpy(), mini, maxi, inclure_maxi))
+
+    def lignes(self, sauf=(), en_plus=None) -> np.ndarray:
+        """Row ids (triés) des lignes retenues (hors `sauf`, et `en_plus` éventuel)."""
+        if self.index is None:
+            return np.flatnonzero(self.masque(sauf, en_plus))
+        cle = frozenset(sauf)
+        with self._verrou:
+            ids = self._combinaisons.get(cle)
+        if ids is None:
+            ids = self.index.intersection({c: v for c, v in self.selections.items() if c not in cle})
+            for colonne, (mini, maxi, inclure_maxi) in self.intervalles.items():
+                if colonne not in cle:
+                    ids = ids[_dans_intervalle(self.df[colonne].to_numpy()[ids], mini, maxi, inclure_maxi)]
+            for nom, masque in self.masques.items():
+                if nom not in cle:
+                    ids = ids[masque[ids]]
+            with self._verrou:
+                ids = self._combinaisons.setdefault(cle, ids)
+        if en_plus is not None:
+            ids = ids[np.asarray(en_plus, dtype=bool)[ids]]
+        return ids
+
+    def masque(self, sauf=(), en_plus=None) -> np.ndarray:
+        """
+        Combinaison (ET) des masques hors `sauf`, mise en cache pour le rerun ;
+        avec un index, bitmap des lignes retenues par lignes().
+        """
+        if self.index is not None:
+            m = np.zeros(len(self.df), dtype=bool)
+            m[self.lignes(sauf, en_plus)] = True
+            return m
+        cle = frozenset(sauf)
+        with self._verrou:
+            m = self._combinaisons.get(cle)
+        if m is None:
+            m = np.ones(len(self.df), dtype=bool)
+            for nom, masque in self.masques.items():
+                if nom not in cle:
+                    m &= masque
+            with self._verrou:
+                m = self._combinaisons.setdefault(cle, m)
+        if en_plus is not None:
+            m = m & np.asarray(en_plus, dtype=bool)
+        return m
+
+    def appliquer(self, sauf=(), en_plus=None) -> pd.DataFrame:
+        """Lignes retenues par les filtres (hors `sauf`, et `en_plus` éventuel)."""
+        if self.index is not None:
+            ids = self.lignes(sauf, en_plus)
+            if len(ids) == len(self.df):
+                return self.df.copy(deep=False)
+            return self.df.take(ids)
+        m = self.masque(sauf, en_plus)
+        if m.all():
+            # copie superficielle (Copy-on-Write) : la base partagée reste intacte
+            return self.df.copy(deep=False)
+        return self.df[m]
@@ -0,0 +1,206 @@
+import pandas as pd
+import numpy as np
+
+
+# RÉFÉRENTIEL GÉOGRAPHIQUE (une ligne par département)
+#
+# Source unique des correspondances département -> nom / région / zones,
+# utilisée par le pipeline (prep_data.py, data/analyse_base.py) et par le
+# dashboard (core/lecture.py). Les colonnes sont appliquées par indexation
+# de tableaux : on ne normalise que les valeurs distinctes (une centaine de
+# codes), jamais ligne par ligne.
+
+DEPARTEMENT_NOMS = {
+    "01": "Ain", "02": "Aisne", "03": "Allier", "04": "Alpes-de-Haute-Provence",
+    "05": "Hautes-Alpes", "06": "Alpes-Maritimes", "07": "Ardèche", "08": "Ardennes",
+    "09": "Ariège", "10": "Aube", "11": "Aude", "12": "Aveyron", "13": "Bouches-du-Rhône",
+    "14": "Calvados", "15": "Cantal", "16": "Charente", "17": "Charente-Maritime",
+    "18": "Cher", "19": "Corrèze", "2A": "Corse-du-Sud", "2B": "Haute-Corse",
+    "21": "Côte-d'Or", "22": "Côtes-d'Armor", "23": "Creuse", "24": "Dordogne",
+    "25": "Doubs", "26": "Drôme", "27": "Eure", "28": "Eure-et-Loir", "29": "Finistère",
+    "30": "Gard", "31": "Haute-Garonne", "32": "Gers", "33": "Gironde", "34": "Hérault",
+    "35": "Ille-et-Vilaine", "36": "Indre", "37": "Indre-et-Loire", "38": "Isère",
+    "39": "Jura", "40": "Landes", "41": "Loir-et-Cher", "42": "Loire",
+    "43": "Haute-Loire", "44": "Loire-Atlantique", "45": "Loiret", "46": "Lot",
+    "47": "Lot-et-Garonne", "48": "Lozère", "49": "Maine-et-Loire", "50": "Manche",
+    "51": "Marne", "52": "Haute-Marne", "53": "Mayenne", "54": "Meurthe-et-Moselle",
+    "55": "Meuse", "56": "Morbihan", "57": "Moselle", "58": "Nièvre",
+    "59": "Nord", "60": "Oise", "61": "Orne", "62": "Pas-de-Calais", "63": "Puy-de-Dôme",
+    "64": "Pyrénées-Atlantiques", "65": "Hautes-Pyrénées", "66": "Pyrénées-Orientales",
+    "67": "Bas-Rhin", "68": "Haut-Rhin", "69": "Rhône", "70": "Haute-Saône",
+    "71": "Saône-et-Loire", "72": "Sarthe", "73": "Savoie", "74": "Haute-Savoie",
+    "75": "Paris", "76": "Seine-Maritime", "77": "Seine-et-Marne", "78": "Yvelines",
+    "79": "Deux-Sèvres", "80": "Somme", "81": "Tarn", "82": "Tarn-et-Garonne",
+    "83": "Var", "84": "Vaucluse", "85": "Vendée", "86": "Vienne", "87": "Haute-Vienne",
+    "88": "Vosges", "89": "Yonne", "90": "Territoire de Belfort", "91": "Essonne",
+    "92": "Hauts-de-Seine", "93": "Seine-Saint-Denis", "94": "Val-de-Marne",
+    "95": "Val-d'Oise",
+}
+
+# Région -> (code court utilisé par le pipeline, départements)
+REGIONS = {
+    "Auvergne-Rhône-Alpes": ("AURA", ["01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74"]),
+    "Bourgogne-Franche-Comté": ("BFC", ["21", "25", "39", "58", "70", "71", "89", "90"]),
+    "Bretagne": ("BRE", ["22", "29", "35", "56"]),
+    "Centre-Val de Loire": ("CVL", ["18", "28", "36", "37", "41", "45"]),
+    "Corse": ("COR", ["2A", "2B"]),
+    "Grand Est": ("GE", ["08", "10", "51", "52", "54", "55", "57", "67", "68", "88"]),
+    "Hauts-de-France": ("HDF", ["02", "59", "60", "62", "80"]),
+    "Île-de-France": ("IDF", ["75", "77", "78", "91", "92", "93", "94", "95"]),
+    "Normandie": ("NOR", ["14", "27", "50", "61", "76"]),
+    "Nouvelle-Aquitaine": ("NAQ", ["16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"]),
+    "Occitanie": ("OCC", ["09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82"]),
+    "Pays de la Loire": ("PDL", ["44", "49", "53", "72", "85"]),
+    "Provence-Alpes-Côte d’Azur": ("PACA", ["04", "05", "06", "13", "83", "84"]),
+}
+
+# Zones macro des pages (zone5) : par région, "Centre" sinon
+ZONES_MACRO = {
+    "Hauts-de-France": "Nord", "Normandie": "Nord",
+    "Grand Est": "Est",
+    "Bretagne": "Ouest", "Pays de la Loire": "Ouest",
+    "Occitanie": "Sud", "Provence-Alpes-Côte d’Azur": "Sud", "Corse": "Sud",
+}
+
+# Zonage fiscal (A / B1 / B2), "Zone C" sinon
+ZONES_FISCALES = {
+    "Zone A": ["75", "92", "93", "94"],
+    "Zone B1": ["77", "78", "91", "95", "13", "06", "69", "31", "33", "59", "67", "44", "34", "35", "38"],
+    "Zone B2": [
+        "02", "08", "10", "14", "21", "22", "24", "25", "26", "27", "28", "29",
+        "30", "32", "37", "39", "40", "41", "42", "45", "46", "47", "48", "49",
+        "50", "51", "52", "53", "54", "55", "56", "58", "60", "61", "62", "63",
+        "64", "65", "66", "68", "70", "71", "72", "73", "74", "76", "79", "80",
+        "81", "82", "83", "84", "85", "86", "87", "88", "89", "90",
+    ],
+}
+
+# Découpage en 4 zones du pipeline DVF (prep_data.py)
+ZONES_4 = {
+    "Zone_NordIDF": ["59", "62", "60", "80", "02", "75", "77", "78", "91", "92", "93", "94", "95"],
+    "Zone_Ouest": [
+        "22", "29", "35", "56", "14", "27", "50", "61", "76", "44", "49", "53", "72", "85",
+        "18", "28", "36", "37", "41", "45", "16", "17", "33", "40", "47", "64",
+    ],
+    "Zone_Sud": [
+        "09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82",
+        "04", "05", "06", "13", "83", "84", "2A", "2B",
+    ],
+    "Zone_Est": [
+        "08", "10", "51", "52", "54", "55", "57", "67", "68", "88",
+        "21", "25", "39", "58", "70", "71", "89", "90",
+        "01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74",
+    ],
+}
+
+ZONES_PARIS = {
+    "Paris": ["75"],
+    "Banlieue IDF": ["77", "78", "91", "92", "93", "94", "95"],
+}
+
+# Valeur des départements hors référentiel (ou code manquant)
+DEFAUTS = {
+    "nom_departement": None,
+    "region": "Région inconnue",
+    "region_code": "Autre",
+    "zone_macro": "Centre",
+    "zone_fiscale": "Zone C",
+    "zone4": "Zone_Autre",
+    "zone_paris": "Autre",
+}
+
+
+def _inverser(groupes: dict) -> dict:
+    return {dep: nom for nom, deps in groupes.items() for dep in deps}
+
+
+def _construire_referentiel() -> pd.DataFrame:
+    dep_region = {dep: region for region, (_, deps) in REGIONS.items() for dep in deps}
+    codes = pd.Index(sorted(DEPARTEMENT_NOMS), name="code_departement")
+    ref = pd.DataFrame({
+        "nom_departement": codes.map(DEPARTEMENT_NOMS),
+        "region": codes.map(dep_region),
+    }, index=codes)
+    ref["region_code"] = ref["region"].map({r: c for r, (c, _) in REGIONS.items()})
+    ref["zone_macro"] = ref["region"].map(ZONES_MACRO).fillna(DEFAUTS["zone_macro"])
+    ref["zone_fiscale"] = codes.map(_inverser(ZONES_FISCALES)).fillna(DEFAUTS["zone_fiscale"])
+    ref["zone4"] = codes.map(_inverser(ZONES_4)).fillna(DEFAUTS["zone4"])
+    ref["zone_paris"] = codes.map(_inverser(ZONES_PARIS)).fillna(DEFAUTS["zone_paris"])
+    return ref
+
+
+REFERENTIEL = _construire_referentiel()
+
+
+# APPLICATION VECTORISÉE
+
+def _normaliser_libelles(valeurs) -> np.ndarray:
+    """'1', ' 1', '1.0', 1 -> '01' ; '2a' -> '2A'."""
+    s = pd.Series(np.asarray(valeurs, dtype=object)).astype(str)
+    s = s.str.replace(" ", "", regex=False).str.upper().str.replace(r"\.0$", "", regex=True)
+    corse = s.isin(["2A", "2B"])
+    return np.where(corse, s, s.str.zfill(2)).astype(object)
+
+
+def _coder(deps) -> tuple:
+    """
+    Codes catégoriels des départements : (codes par ligne, libellés normalisés
+    des catégories). Seules les valeurs distinctes passent par les chaînes.
+    """
+    s = deps if isinstance(deps, pd.Series) else pd.Series(deps)
+    cat = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+    libelles = _normaliser_libelles(cat.cat.categories)
+    uniques, inverse = np.unique(libelles, return_inverse=True) if len(libelles) else (np.array([], dtype=object), np.array([], dtype=np.intp))
+    # code -1 (valeur manquante) -> dernier élément ajouté
+    codes = np.append(inverse, -1)[cat.cat.codes.to_numpy()]
+    return codes, uniques
+
+
+def normaliser_departements(deps, categorie: bool = True) -> pd.Series:
+    """Codes département sur deux caractères (Corse 2A/2B conservée), remplace pad_dep."""
+    s = deps if isinstance(deps, pd.Series) else pd.Series(deps)
+    codes, uniques = _coder(s)
+    out = pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+    if not categorie:
+        out = np.asarray(out, dtype=object)
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def attributs_departement(deps, colonnes=None, defauts=None, categorie: bool = True) -> pd.DataFrame:
+    """
+    Colonnes du référentiel (region, zone_macro, zone_fiscale...) pour chaque
+    ligne : un get_indexer sur les catégories puis un np.take par colonne.
+    `defauts` surcharge DEFAUTS pour les départements inconnus.
+    """
+    s = deps if isinstance(deps, pd.Series) else pd.Series(deps)
+    colonnes = list(REFERENTIEL.columns) if colonnes is None else list(colonnes)
+    defauts = {**DEFAUTS, **(defauts or {})}
+
+    codes, uniques = _coder(s)
+    # position dans le référentiel de chaque catégorie (-1 : inconnu ou manquant)
+    pos_cat = np.append(REFERENTIEL.index.get_indexer(uniques), -1)
+    pos = pos_cat[codes]
+
+    out = {}
+    for col in colonnes:
+        valeurs = REFERENTIEL[col]
+        defaut = defauts.get(col)
+        categories = pd.Index(pd.unique(valeurs), dtype=object)
+        if defaut is not None and defaut not in categories:
+            categories = categories.append(pd.Index([defaut], dtype=object))
+        # codes de l'attribut par département, + une case finale pour les inconnus
+        code_defaut = categories.get_loc(defaut) if defaut is not None else -1
+        table = np.append(categories.get_indexer(valeurs), code_defaut)
+        col_codes = table[pos]
+        valeurs_out = pd.Categorical.from_codes(col_codes, categories=categories)
+        if not categorie:
+            valeurs_out = np.asarray(valeurs_out, dtype=object)
+        out[col] = valeurs_out
+
+    return pd.DataFrame(out, index=s.index)
+
+
+def attribut_departement(deps, colonne: str, defaut=None, categorie: bool = True) -> pd.Series:
+    """Une seule colonne du référentiel (voir attributs_departement)."""
+    defauts = None if defaut is None else {colonne: defaut}
+    return attributs_departement(deps, [colonne], defauts, categorie)[colonne]
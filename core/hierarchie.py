@@ -0,0 +1,73 @@
+from itertools import combinations, product
+
+import numpy as np
+import pandas as pd
+
+
+# HIÉRARCHIE GÉOGRAPHIQUE ET CATALOGUES D'OPTIONS
+#
+# Les listes d'options de la barre latérale ne sont plus recalculées à
+# chaque rerun par sorted(df[col].dropna().unique()) sur toutes les lignes,
+# ni les listes en cascade par filtrage de la base. Une fois par jeu de
+# données (st.cache_resource côté page), on relève les combinaisons
+# présentes des niveaux (zone -> région -> département) et, pour
+# chaque niveau et chaque sous-ensemble de niveaux parents fixés, la liste
+# triée des enfants : une cascade est une lecture de dictionnaire, en
+# O(nombre d'enfants). Les dimensions hors hiérarchie (type, année) ont
+# leur catalogue trié.
+
+
+def _valeurs_presentes(s: pd.Series) -> list:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        presents = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories)) > 0
+        return sorted(s.cat.categories[presents].tolist())
+    return sorted(pd.unique(s.dropna()).tolist())
+
+
+class Hierarchie:
+    """Enfants de chaque niveau selon les parents sélectionnés, et catalogues des autres dimensions."""
+
+    def __init__(self, df: pd.DataFrame, niveaux, catalogues=()):
+        self.niveaux = [c for c in niveaux if c in df.columns]
+        combos = df[self.niveaux].drop_duplicates()
+        self._enfants = {}
+        for i, niveau in enumerate(self.niveaux):
+            parents = self.niveaux[:i]
+            for k in range(len(parents) + 1):
+                for fixes in combinations(parents, k):
+                    self._enfants[(niveau, fixes)] = self._listes(combos, niveau, list(fixes))
+        self.catalogues = {c: _valeurs_presentes(df[c]) for c in catalogues if c in df.columns}
+
+    @staticmethod
+    def _listes(combos: pd.DataFrame, niveau: str, fixes: list) -> dict:
+        if not fixes:
+            return {(): _valeurs_presentes(combos[niveau])}
+        paires = combos[[*fixes, niveau]].dropna().drop_duplicates()
+        return {
+            cle if isinstance(cle, tuple) else (cle,): sorted(groupe[niveau])
+            for cle, groupe in paires.groupby(fixes, observed=True, sort=False)
+        }
+
+    def enfants(self, niveau: str, **parents) -> list:
+        """
+        Valeurs de `niveau` compatibles avec les parents sélectionnés (valeur
+        ou liste de valeurs ; None / liste vide = pas de filtre), triées.
+        """
+        fixes, choix = [], []
+        for p in self.niveaux[:self.niveaux.index(niveau)]:
+            v = parents.get(p)
+            if v is None or (isinstance(v, (list, tuple)) and not v):
+                continue
+            fixes.append(p)
+            choix.append(list(v) if isinstance(v, (list, tuple)) else [v])
+        listes = self._enfants[(niveau, tuple(fixes))]
+        if all(len(c) == 1 for c in choix):
+            return list(listes.get(tuple(c[0] for c in choix), []))
+        return sorted(set().union(*(listes.get(cle, []) for cle in product(*choix))))
+
+    def options(self, colonne: str) -> list:
+        """Options d'une dimension : catalogue, ou niveau sans parent fixé."""
+        if colonne in self.catalogues:
+            return list(self.catalogues[colonne])
+        return self.enfants(colonne)
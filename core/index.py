@@ -0,0 +1,85 @@
+import pandas as pd
+import numpy as np
+
+
+# INDEX INVERSÉ DES DIMENSIONS DE FILTRE
+#
+# Pour chaque dimension (annee, region, type_local...), les numéros de ligne
+# sont triés par valeur une seule fois : la liste des lignes d'une valeur est
+# une tranche contiguë (liste triée de row ids). Un filtre, même à plusieurs
+# valeurs, ne relit donc plus la colonne : il lit les tranches sélectionnées,
+# puis les dimensions se combinent par intersection des listes triées.
+
+class _Dimension:
+    __slots__ = ("valeurs", "lignes", "debuts")
+
+    def __init__(self, s: pd.Series):
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = s.cat.codes.to_numpy()
+            valeurs = s.cat.categories
+        else:
+            codes, valeurs = pd.factorize(s, sort=True)
+        # -1 (valeur manquante) placé en tête puis ignoré
+        ordre = np.argsort(codes, kind="stable").astype(np.int32)
+        bornes = np.searchsorted(codes[ordre], np.arange(-1, len(valeurs) + 1))
+        self.valeurs = pd.Index(valeurs)
+        self.lignes = ordre
+        self.debuts = bornes[1:]
+
+    def tranche(self, valeur) -> np.ndarray:
+        pos = self.valeurs.get_indexer([valeur])[0]
+        if pos < 0:
+            return self.lignes[:0]
+        return self.lignes[self.debuts[pos]:self.debuts[pos + 1]]
+
+    def effectifs(self) -> pd.Series:
+        return pd.Series(np.diff(self.debuts), index=self.valeurs)
+
+
+class IndexInverse:
+    """Index inversé (valeur -> row ids triés) sur les dimensions d'un DataFrame en lecture seule."""
+
+    def __init__(self, df: pd.DataFrame, colonnes):
+        self.nb_lignes = len(df)
+        self.dimensions = {c: _Dimension(df[c]) for c in colonnes if c in df.columns}
+
+    def __contains__(self, colonne) -> bool:
+        return colonne in self.dimensions
+
+    def lignes(self, colonne: str, valeurs) -> np.ndarray:
+        """Row ids (triés) des lignes dont la colonne vaut l'une des valeurs."""
+        dim = self.dimensions[colonne]
+        tranches = [dim.tranche(v) for v in valeurs]
+        if len(tranches) == 1:
+            return tranches[0]
+        return np.sort(np.concatenate(tranches)) if tranches else dim.lignes[:0]
+
+    def intersection(self, selections: dict) -> np.ndarray:
+        """
+        Row ids (triés) vérifiant toutes les sélections {colonne: valeurs}. On
+        part de la dimension la plus sélective, puis chaque autre liste triée
+        ne sert qu'à des recherches dichotomiques : le coût suit la taille des
+        sélections, jamais le nombre de lignes de la base.
+        """
+        listes = sorted(
+            (self.lignes(c, v) for c, v in selections.items()),
+            key=len,
+        )
+        if not listes:
+            return np.arange(self.nb_lignes, dtype=np.int32)
+        ids = listes[0]
+        for autre in listes[1:]:
+            if not len(ids):
+                break
+            pos = np.searchsorted(autre, ids)
+            pos[pos == len(autre)] = 0
+            ids = ids[autre[pos] == ids] if len(autre) else ids[:0]
+        return ids
+
+    def options(self, colonne: str) -> list:
+        """Valeurs présentes (au moins une ligne), triées : options des filtres."""
+        eff = self.dimensions[colonne].effectifs()
+        return sorted(eff.index[eff.to_numpy() > 0])
+
+    def octets(self) -> int:
+        return int(sum(d.lignes.nbytes + d.debuts.nbytes for d in self.dimensions.values()))
@@ -0,0 +1,258 @@
+import logging
+import hashlib
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+from pathlib import Path
+
+from core.geo import normaliser_departements, attributs_departement
+from core.schema import compacter
+
+log = logging.getLogger(__name__)
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+CSV_PATH = DATA_DIR / "base_finale_dashboard.csv"
+# Base dérivée produite hors ligne par prep_dashboard.py (Arrow IPC, mappable en mémoire)
+ARROW_PATH = DATA_DIR / "base_finale_dashboard.arrow"
+
+
+class ColonnesManquantes(ValueError):
+    """Colonnes requises par une page absentes de la base."""
+
+    def __init__(self, manquantes):
+        self.manquantes = sorted(manquantes)
+        super().__init__(
+            "Colonnes introuvables dans la base : " + ", ".join(self.manquantes)
+        )
+
+
+# Colonnes brutes éventuelles -> noms utilisés par les pages
+RENAME_COLONNES = {
+    "PMUN_2014": "population_exposee",
+    "pop_exposee": "population_exposee",
+    "R_ATM_2016": "risque_chaleur",
+    "R_INO_2016": "risque_inondation",
+    "R_MVT_2016": "risque_secheresse",
+    "R_FEU_2016": "risque_feux",
+}
+
+COLONNES_NUMERIQUES = [
+    "annee", "prix_m2", "valeur_fonciere", "surface_reelle_bati",
+    "population_exposee", "risque_climatique", "risque_global",
+    "risque_chaleur", "risque_inondation", "risque_secheresse", "risque_feux",
+]
+
+
+# NORMALISATION
+
+def normaliser(df: pd.DataFrame, compact: bool = True) -> pd.DataFrame:
+    """
+    Réunit en une passe les nettoyages faits auparavant par chaque page :
+    codes département / commune, renommages climat, prix_m2, régions et zones,
+    puis compaction des types (core.schema). Utilisée hors ligne par
+    prep_dashboard.py, et en secours sur le CSV brut.
+    """
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.rename(columns={k: v for k, v in RENAME_COLONNES.items() if v not in df.columns})
+
+    # --- Codes
+    if "code_departement" in df.columns:
+        df["code_departement"] = normaliser_departements(df["code_departement"], categorie=compact)
+
+    if "code_commune" in df.columns:
+        df["code_commune"] = (
+            df["code_commune"].astype(str).str.strip()
+            .str.replace(r"\D", "", regex=True)
+            .str.zfill(5)
+        )
+
+    # --- prix_m2 (calculé si absent)
+    if "prix_m2" not in df.columns and {"valeur_fonciere", "surface_reelle_bati"}.issubset(df.columns):
+        surf = pd.to_numeric(df["surface_reelle_bati"], errors="coerce")
+        val = pd.to_numeric(df["valeur_fonciere"], errors="coerce")
+        df["prix_m2"] = np.where((surf > 0) & (val > 0), val / surf, np.nan)
+
+    for c in COLONNES_NUMERIQUES:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # --- Départements : référentiel core.geo (nom, région, zones)
+    if "code_departement" in df.columns:
+        geo = attributs_departement(
+            df["code_departement"],
+            ["nom_departement", "region", "zone_macro", "zone_fiscale", "zone_paris"],
+            categorie=compact,
+        )
+        if "nom_departement" not in df.columns:
+            # départements hors référentiel : le code sert de libellé
+            df["nom_departement"] = geo["nom_departement"].astype(object).fillna(df["code_departement"].astype(object))
+        regions = geo["region"]
+        if "region" in df.columns:
+            # région de la source prioritaire, complétée par le référentiel
+            source = df["region"].astype(object).replace("", np.nan)
+            regions = source.where(source.notna(), regions.astype(object))
+        df = df.assign(region=regions, **{c: geo[c] for c in ["zone_macro", "zone_fiscale", "zone_paris"]})
+    else:
+        if "nom_departement" not in df.columns:
+            df["nom_departement"] = "N/A"
+        df["region"] = "Région inconnue"
+        df["zone_macro"] = "Centre"
+        df["zone_fiscale"] = "Zone C"
+        df["zone_paris"] = "Autre"
+
+    # --- Zone (colonne source)
+    if "zone" not in df.columns:
+        df["zone"] = "Centre"
+    df["zone"] = df["zone"].replace("Autres", "Centre")
+
+    # --- Types compacts (catégories, entiers courts, float32)
+    if compact:
+        df = compacter(df)
+
+    # --- Alias (même mémoire en Copy-on-Write)
+    if "risque_global" not in df.columns and "risque_climatique" in df.columns:
+        df["risque_global"] = df["risque_climatique"]
+    df["zone5"] = df["zone_macro"]
+
+    return df
+
+
+# SCHÉMA DE LECTURE DU CSV
+#
+# Types explicites (plus d'inférence ni de low_memory) : les codes restent des
+# chaînes à normaliser, les libellés sont lus directement en catégories.
+
+SCHEMA_CSV = {
+    "code_departement": "string[pyarrow]",
+    "code_commune": "string[pyarrow]",
+    "zone": "string[pyarrow]",
+    "nom_departement": "category",
+    "commune": "category",
+    "type_local": "category",
+    "region": "category",
+    "id_mutation": "string[pyarrow]",
+    "annee": "float64",
+    "prix_m2": "float64",
+    "valeur_fonciere": "float64",
+    "surface_reelle_bati": "float64",
+    "nb_transactions": "float64",
+    "population_exposee": "float64",
+    "PMUN_2014": "float64",
+    "pop_exposee": "float64",
+    "risque_climatique": "float64",
+    "risque_global": "float64",
+    "R_ATM_2016": "float64",
+    "R_INO_2016": "float64",
+    "R_MVT_2016": "float64",
+    "R_FEU_2016": "float64",
+}
+
+# Colonnes brutes nécessaires pour produire chaque colonne dérivée
+_CODE = ["code_departement"]
+SOURCES = {
+    "nom_departement": ["nom_departement", "code_departement"],
+    "region": _CODE,
+    "zone_macro": _CODE,
+    "zone5": _CODE,
+    "zone_fiscale": _CODE,
+    "zone_paris": _CODE,
+    "prix_m2": ["prix_m2", "valeur_fonciere", "surface_reelle_bati"],
+    "risque_global": ["risque_global", "risque_climatique"],
+    **{v: [v] + [k for k, cible in RENAME_COLONNES.items() if cible == v] for v in RENAME_COLONNES.values()},
+}
+
+
+# LECTURE PROJETÉE
+
+def base_a_jour() -> bool:
+    """La base dérivée existe et n'est pas plus ancienne que le CSV source."""
+    if not ARROW_PATH.exists():
+        return False
+    return not CSV_PATH.exists() or ARROW_PATH.stat().st_mtime >= CSV_PATH.stat().st_mtime
+
+
+def version_donnees(*chemins: Path) -> str:
+    """
+    Empreinte courte des fichiers de données (nom, taille, date de modification) :
+    change dès que prep_dashboard.py réécrit la base ou que le CSV est remplacé.
+    """
+    h = hashlib.sha1()
+    for p in chemins or (ARROW_PATH, CSV_PATH):
+        if p.exists():
+            st = p.stat()
+            h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+def lire_arrow(colonnes=None, path: Path = ARROW_PATH) -> pd.DataFrame:
+    """
+    Lecture de la base dérivée par memory-map : les buffers Arrow restent sur
+    disque (cache de pages de l'OS) et les colonnes numériques sans valeurs
+    manquantes sont exposées à pandas sans copie. Seules les colonnes
+    demandées (et présentes) sont converties.
+    """
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if colonnes is not None:
+        table = table.select([c for c in colonnes if c in table.column_names])
+    return table.to_pandas(split_blocks=True)
+
+
+def lire_csv(colonnes=None, compact: bool = True) -> pd.DataFrame:
+    """
+    Lecture typée du CSV brut (moteur pyarrow, usecols limité aux colonnes
+    sources des colonnes demandées), puis normalisation.
+    """
+    entete = {str(c).strip(): c for c in pd.read_csv(CSV_PATH, nrows=0).columns}
+
+    if colonnes is None:
+        usecols = list(entete.values())
+    else:
+        besoins = {src for c in colonnes for src in SOURCES.get(c, [c])}
+        usecols = [brut for nom, brut in entete.items() if nom in besoins]
+
+    df = pd.read_csv(
+        CSV_PATH,
+        engine="pyarrow",
+        usecols=usecols,
+        dtype={entete[c]: t for c, t in SCHEMA_CSV.items() if c in entete},
+    )
+    df = normaliser(df, compact=compact)
+
+    if colonnes is not None:
+        df = df[[c for c in colonnes if c in df.columns]]
+    return df
+
+
+def ecrire_arrow(df: pd.DataFrame, path: Path) -> None:
+    """Écriture Arrow IPC non compressée (lisible par memory-map), remplacement atomique."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=1_000_000)
+    tmp_path.replace(path)
+
+
+def lire_colonnes(colonnes) -> pd.DataFrame:
+    """Base dérivée si elle est à jour, sinon CSV brut (dérivations à chaque démarrage)."""
+    if base_a_jour():
+        return lire_arrow(colonnes)
+    log.warning("Base dérivée absente ou périmée : lancer `python prep_dashboard.py`.")
+    return lire_csv(colonnes)
+
+
+def colonnes_disponibles() -> list:
+    """Colonnes de la base dérivée (schéma Arrow), sinon en-tête du CSV brut."""
+    if base_a_jour():
+        with pa.memory_map(str(ARROW_PATH), "r") as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    return [str(c).strip() for c in pd.read_csv(CSV_PATH, nrows=0).columns]
+
+
+def verifier_colonnes(df: pd.DataFrame, requises) -> None:
+    manquantes = set(requises) - set(df.columns)
+    if manquantes:
+        raise ColonnesManquantes(manquantes)
@@ -0,0 +1,112 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+
+# MÉMOÏSATION LRU DES AGRÉGATS PAR ÉTAT DE FILTRES
+#
+# Clé : tuple hashable décrivant les filtres (jamais le DataFrame lui-même,
+# que st.cache_data hacherait à chaque appel). Budget en nombre d'entrées et
+# en octets, éviction de l'entrée la moins récemment utilisée. Partagée
+# entre sessions : les résultats sont à traiter en lecture seule.
+# Optionnellement adossé à un cache disque (core.cache_disque) pour les
+# agrégats tabulaires marqués `persistant`, qui survivent aux redémarrages.
+
+def taille_octets(valeur) -> int:
+    if isinstance(valeur, pd.DataFrame):
+        return int(valeur.memory_usage(index=True, deep=True).sum())
+    if isinstance(valeur, pd.Series):
+        return int(valeur.memory_usage(index=True, deep=True))
+    if isinstance(valeur, np.ndarray):
+        return int(valeur.nbytes)
+    if isinstance(valeur, (tuple, list)):
+        return sys.getsizeof(valeur) + sum(taille_octets(v) for v in valeur)
+    return sys.getsizeof(valeur)
+
+
+def _hashable(v):
+    # Listes / ensembles de multiselect : ordre de sélection sans importance,
+    # triés en gardant le type des éléments. Tuples (bornes...) : ordre conservé.
+    if isinstance(v, (list, set, frozenset)):
+        return tuple(sorted((_hashable(x) for x in v), key=lambda x: (type(x).__name__, x)))
+    if isinstance(v, tuple):
+        return tuple(_hashable(x) for x in v)
+    return v
+
+
+def cle_filtres(nom: str, etat: dict, sauf=()) -> tuple:
+    """
+    Clé compacte : nom de l'agrégat + valeurs des filtres dont il dépend
+    (listes de multiselect -> tuples triés, tuples inchangés). `sauf` retire les dimensions
+    ignorées par l'agrégat (ex. l'année pour une série annuelle).
+    """
+    return (nom,) + tuple((k, _hashable(v)) for k, v in sorted(etat.items()) if k not in sauf)
+
+
+class MemoLRU:
+    def __init__(self, max_entrees: int = 256, max_octets: int = 64 * 1024 ** 2, disque=None):
+        self.max_entrees = max_entrees
+        self.disque = disque
+        self.max_octets = max_octets
+        self._entrees = OrderedDict()
+        self._octets = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obtenir(self, cle, calcul, persistant: bool = False):
+        """
+        Résultat mémorisé pour `cle`, sinon calcul() puis mise en cache.
+        `persistant` : un DataFrame est aussi relu / écrit dans le cache disque.
+        """
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return self._entrees[cle][0]
+            self.misses += 1
+
+        # Calcul hors verrou : les autres sessions ne sont pas bloquées
+        persistant = persistant and self.disque is not None
+        valeur = self.disque.lire(cle) if persistant else None
+        if valeur is None:
+            valeur = calcul()
+            if persistant and isinstance(valeur, pd.DataFrame):
+                self.disque.ecrire(cle, valeur)
+        taille = taille_octets(valeur)
+        if taille > self.max_octets:
+            return valeur
+
+        with self._verrou:
+            if cle in self._entrees:
+                return self._entrees[cle][0]
+            self._entrees[cle] = (valeur, taille)
+            self._octets += taille
+            while self._entrees and (len(self._entrees) > self.max_entrees or self._octets > self.max_octets):
+                _, (_, t) = self._entrees.popitem(last=False)
+                self._octets -= t
+                self.evictions += 1
+        return valeur
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._entrees.clear()
+            self._octets = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entrees": len(self._entrees),
+            "max_entrees": self.max_entrees,
+            "octets": self._octets,
+            "max_octets": self.max_octets,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taux_hit": round(self.hits / total, 3) if total else None,
+            "evictions": self.evictions,
+            "disque": self.disque.stats() if self.disque is not None else None,
+        }
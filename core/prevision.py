@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+
+from core.lecture import ARROW_PATH, DATA_DIR, lire_arrow
+from core.cube import agreger
+from core.climat import RISQUES
+
+
+# PRÉVISIONS LINÉAIRES PAR LOT
+#
+# Une droite des moindres carrés par série (zone, département, type...), en
+# forme fermée : toutes les séries, de longueurs différentes, sont empilées
+# dans un seul DataFrame long et ajustées en une passe de np.bincount
+# (sommes centrées par série), sans boucle Python ni scikit-learn. Les
+# prévisions sont accompagnées d'un intervalle de prévision tiré des résidus
+# de chaque série (loi de Student à n - 2 degrés de liberté).
+
+HORIZON = 3
+
+# Quantiles à 97,5 % de la loi de Student (intervalle bilatéral à 95 %) pour
+# 1 à 30 degrés de liberté ; développement de Cornish-Fisher au-delà
+_STUDENT_975 = np.array([
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+
+
+def quantile_student(ddl) -> np.ndarray:
+    """Quantile bilatéral à 95 % pour `ddl` degrés de liberté (NaN si ddl < 1)."""
+    ddl = np.asarray(ddl)
+    z, nu = 1.959964, np.maximum(ddl, 1).astype("float64")
+    asymptotique = z + (z ** 3 + z) / (4 * nu) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * nu ** 2)
+    q = np.where(ddl > len(_STUDENT_975), asymptotique, _STUDENT_975[np.clip(ddl, 1, len(_STUDENT_975)) - 1])
+    return np.where(ddl >= 1, q, np.nan)
+
+
+def ajuster(series: pd.DataFrame, par=(), x: str = "annee", y: str = "valeur", min_points: int = 2) -> pd.DataFrame:
+    """
+    Coefficients d'une droite par série (`par` = colonnes clés, aucune pour
+    une série unique) : n, x_moy, y_moy, sxx, pente, sigma (écart type des
+    résidus) et x_max. Séries de moins de `min_points` points ou d'une seule
+    abscisse écartées.
+    """
+    par = list(par)
+    d = series.dropna(subset=par + [x, y])
+    xs = d[x].to_numpy(dtype="float64")
+    ys = d[y].to_numpy(dtype="float64")
+
+    if par:
+        groupes = d.groupby(par, observed=True, sort=True)
+        g = groupes.ngroup().to_numpy()
+        cles = groupes.size().reset_index()[par]
+    else:
+        g = np.zeros(len(d), dtype="int64")
+        cles = pd.DataFrame(index=range(1 if len(d) else 0))
+    k = len(cles)
+
+    n = np.bincount(g, minlength=k).astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_moy = np.bincount(g, xs, minlength=k) / n
+        y_moy = np.bincount(g, ys, minlength=k) / n
+        xc = xs - x_moy[g]
+        yc = ys - y_moy[g]
+        sxx = np.bincount(g, xc * xc, minlength=k)
+        pente = np.where(sxx > 0, np.bincount(g, xc * yc, minlength=k) / sxx, np.nan)
+        sse = np.bincount(g, (yc - pente[g] * xc) ** 2, minlength=k)
+        sigma = np.where(n > 2, np.sqrt(sse / (n - 2)), np.nan)
+
+    x_max = np.full(k, -np.inf)
+    np.maximum.at(x_max, g, xs)
+
+    coefs = cles.assign(
+        n=n.astype("int64"), x_moy=x_moy, y_moy=y_moy, sxx=sxx, pente=pente, sigma=sigma, x_max=x_max,
+    )
+    return coefs[(coefs["n"] >= min_points) & (coefs["sxx"] > 0)].reset_index(drop=True)
+
+
+def prevoir(coefs: pd.DataFrame, par=(), x: str = "annee", x_futurs=None, horizon: int = HORIZON, plancher=None) -> pd.DataFrame:
+    """
+    Prévisions (format long : clés, x, prevision, borne_basse, borne_haute)
+    aux abscisses `x_futurs` communes à toutes les séries, ou sur les
+    `horizon` années suivant la dernière année de chaque série. Intervalle
+    de prévision à 95 % (NaN sous 3 points). `plancher` borne les valeurs
+    par le bas (0 pour un prix ; aucun sur les indicateurs climat, qui
+    gardent la droite brute).
+    """
+    par = list(par)
+    if x_futurs is not None:
+        futurs = np.broadcast_to(np.asarray(x_futurs, dtype="float64"), (len(coefs), len(x_futurs)))
+    else:
+        futurs = coefs["x_max"].to_numpy()[:, None] + np.arange(1, horizon + 1)
+
+    n = coefs["n"].to_numpy(dtype="float64")[:, None]
+    x_moy = coefs["x_moy"].to_numpy()[:, None]
+    ecart = futurs - x_moy
+    prevision = coefs["y_moy"].to_numpy()[:, None] + coefs["pente"].to_numpy()[:, None] * ecart
+    erreur = coefs["sigma"].to_numpy()[:, None] * np.sqrt(1 + 1 / n + ecart ** 2 / coefs["sxx"].to_numpy()[:, None])
+    marge = quantile_student(coefs["n"].to_numpy() - 2)[:, None] * erreur
+
+    basse, haute = prevision - marge, prevision + marge
+    if plancher is not None:
+        prevision, basse, haute = (np.maximum(v, plancher) for v in (prevision, basse, haute))
+
+    m = futurs.shape[1]
+    out = coefs[par].loc[coefs.index.repeat(m)].reset_index(drop=True)
+    out[x] = futurs.ravel()
+    if np.all(np.mod(out[x], 1) == 0):
+        out[x] = out[x].astype("int64")
+    out["prevision"] = prevision.ravel()
+    out["borne_basse"] = basse.ravel()
+    out["borne_haute"] = haute.ravel()
+    return out
+
+
+def prevoir_series(
+    series: pd.DataFrame, par=(), x: str = "annee", y: str = "valeur",
+    x_futurs=None, horizon: int = HORIZON, min_points: int = 2, plancher=None,
+) -> pd.DataFrame:
+    """Ajustement puis prévision de toutes les séries de `series` (voir ajuster / prevoir)."""
+    return prevoir(ajuster(series, par, x, y, min_points), par, x, x_futurs, horizon, plancher)
+
+
+# TABLES DE PRÉVISIONS MATÉRIALISÉES (prep_previsions.py)
+#
+# Les prévisions affichées par les pages sont calculées hors ligne pour
+# toutes les sélections courantes, en un seul appel par table : prix au m²
+# par (niveau, clé, type de bien), population exposée et risques par
+# combinaison de filtres de la page climat. Les pages lisent ces tables et
+# ne recalculent en direct que les sélections absentes (multi-sélections).
+
+PREVISIONS_IMMOBILIER_PATH = DATA_DIR / "previsions_immobilier.arrow"
+PREVISIONS_CLIMAT_PATH = DATA_DIR / "previsions_climat.arrow"
+
+# Années retenues pour la prévision du prix : au moins 30 transactions
+SEUIL_TRANSACTIONS = 30
+MIN_ANNEES_PRIX = 3
+
+# Niveaux géographiques de la page immobilier ; « France » = aucun filtre
+NIVEAUX_IMMOBILIER = ["zone_macro", "zone_fiscale", "region", "nom_departement"]
+TOUS = "Tous"
+
+# Horizon de la page climat
+ANNEES_CLIMAT = np.arange(2026, 2031)
+
+
+def series_prix(cellules: pd.DataFrame, par=()) -> pd.DataFrame:
+    """Prix moyen annuel par série (roll-up du cube), années d'au moins SEUIL_TRANSACTIONS transactions."""
+    ts = agreger(cellules, [*par, "annee"])
+    ts = ts[ts["nb"] >= SEUIL_TRANSACTIONS]
+    return ts[[*par, "annee", "nb", "prix_m2"]].sort_values([*par, "annee"]).reset_index(drop=True)
+
+
+def historique_et_prevision(ts: pd.DataFrame, par=(), horizon: int = HORIZON) -> pd.DataFrame:
+    """Historique (prix_m2, nb) suivi de la prévision et de ses bornes, séries d'au moins MIN_ANNEES_PRIX années."""
+    prev = prevoir_series(ts, par, y="prix_m2", horizon=horizon, min_points=MIN_ANNEES_PRIX, plancher=0)
+    gardees = prev[list(par)].drop_duplicates()
+    hist = ts.merge(gardees, on=list(par)) if par else (ts if len(prev) else ts.iloc[:0])
+    return pd.concat([hist, prev], ignore_index=True)
+
+
+def construire_previsions_immobilier(cube: pd.DataFrame) -> pd.DataFrame:
+    """Historique + prévision du prix au m² pour chaque (niveau, clé, type_local), toutes séries en une passe."""
+    series = []
+    for niveau in [None, *NIVEAUX_IMMOBILIER]:
+        for par_type in (False, True):
+            par = ([niveau] if niveau else []) + (["type_local"] if par_type else [])
+            ts = series_prix(cube, par)
+            series.append(pd.DataFrame({
+                "niveau": niveau or "France",
+                "cle": ts[niveau].astype(str) if niveau else "France",
+                "type_local": ts["type_local"].astype(str) if par_type else TOUS,
+                "annee": ts["annee"],
+                "nb": ts["nb"],
+                "prix_m2": ts["prix_m2"],
+            }))
+    empilees = pd.concat(series, ignore_index=True)
+    table = historique_et_prevision(empilees, ["niveau", "cle", "type_local"])
+    for c in ["niveau", "cle", "type_local"]:
+        table[c] = table[c].astype("category")
+    return table
+
+
+def selection_immobilier(selections: dict, types) -> tuple:
+    """
+    (niveau, clé, type) de la table correspondant aux filtres de la page
+    (multisélections par niveau, vide = tous), ou None si la sélection
+    combine plusieurs valeurs ou plusieurs niveaux.
+    """
+    actifs = {niveau: v for niveau, v in selections.items() if v}
+    types = list(types or [])
+    if len(types) > 1 or len(actifs) > 1:
+        return None
+    type_local = types[0] if types else TOUS
+    if not actifs:
+        return ("France", "France", type_local)
+    niveau, valeurs = next(iter(actifs.items()))
+    if len(valeurs) > 1:
+        return None
+    return (niveau, str(valeurs[0]), type_local)
+
+
+def lire_previsions(table: pd.DataFrame, **cles) -> pd.DataFrame:
+    """Lignes de `table` correspondant aux clés (colonne = valeur)."""
+    m = np.ones(len(table), dtype=bool)
+    for colonne, valeur in cles.items():
+        m &= (table[colonne] == valeur).to_numpy(dtype=bool, na_value=False)
+    return table[m].drop(columns=list(cles)).reset_index(drop=True)
+
+
+def cle_climat(zone, region, departement) -> tuple:
+    """Clé de la table climat pour une sélection de la page."""
+    if departement != "Tous":
+        return ("Toutes", "Toutes", departement)
+    return (zone, region, departement)
+
+
+def construire_previsions_climat(annees: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prévisions 2026-2030 pour chaque sélection de la page climat, à partir
+    de la table annuelle du mart (core.climat) : population exposée
+    (indicateur population_exposee) et, par zone, chaque indice de risque
+    (la zone sélectionnée n'y filtre pas, comme sur la page). Une sélection
+    (zone, région, département ; « Toutes » / « Tous » = pas de filtre) est
+    un groupe d'un roll-up de la table annuelle : toutes les séries d'un
+    niveau sont produites par un seul groupby, puis ajustées en un appel.
+    """
+    risques = [c for c in RISQUES if c in annees.columns]
+
+    def selection(groupes: pd.DataFrame, geo: list) -> dict:
+        # Un département est toujours cohérent avec la zone et la région : clé ramenée au seul département
+        return {
+            "filtre_zone5": groupes["zone5"].astype(str) if "zone5" in geo else "Toutes",
+            "filtre_region": groupes["region"].astype(str) if "region" in geo else "Toutes",
+            "filtre_departement": groupes["nom_departement"].astype(str) if "nom_departement" in geo else "Tous",
+        }
+
+    series = []
+    peuplees = annees[annees["nb_population"] > 0]
+    for geo in [[], ["zone5"], ["region"], ["zone5", "region"], ["nom_departement"]]:
+        pop = peuplees.dropna(subset=geo).groupby([*geo, "annee"], observed=True, as_index=False)["population_exposee"].sum()
+        series.append(pd.DataFrame({
+            "annee": pop["annee"], "valeur": pop["population_exposee"], **selection(pop, geo),
+            "indicateur": "population_exposee", "zone5": "Toutes",
+        }))
+
+    # Risques par zone, pour les sélections sans zone (la zone ne filtre pas ces courbes)
+    for geo in [[], ["region"], ["nom_departement"]]:
+        for c in risques:
+            r = annees.groupby([*geo, "annee", "zone5"], observed=True, as_index=False)[[c, f"nb_{c}"]].sum()
+            r = r[r[f"nb_{c}"] > 0]
+            series.append(pd.DataFrame({
+                "annee": r["annee"], "valeur": r[c] / r[f"nb_{c}"], **selection(r, geo),
+                "indicateur": c, "zone5": r["zone5"].astype(str),
+            }))
+
+    cles = ["filtre_zone5", "filtre_region", "filtre_departement", "indicateur", "zone5"]
+    empilees = pd.concat(series, ignore_index=True)
+    table = prevoir_series(empilees, cles, y="valeur", x_futurs=ANNEES_CLIMAT)
+    for c in cles:
+        table[c] = table[c].astype(str).astype("category")
+    return table
+
+
+def charger_previsions(chemin, source=ARROW_PATH):
+    """Table de prévisions à jour (plus récente que la base dérivée), sinon None : la page calcule en direct."""
+    if chemin.exists() and (not source.exists() or chemin.stat().st_mtime >= source.stat().st_mtime):
+        return lire_arrow(path=chemin)
+    return None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+# PROFILS MULTI-RISQUES
+#
+# Matrices département x type de risque et zone x type de risque calculées
+# en une passe groupée sur la table départementale du mart climat, puis
+# gardées en cache (st.cache_resource côté page). Un radar, un profil moyen
+# ou un diagramme groupé se sert par lecture de lignes (get_indexer + take) :
+# comparer 20 départements coûte autant que d'en comparer 2.
+
+RISQUES_PROFIL = ["risque_chaleur", "risque_inondation", "risque_secheresse", "risque_feux"]
+
+
+class ProfilsRisques:
+    """Indices de risque moyens par département et par zone, servis par ligne."""
+
+    def __init__(self, departements: pd.DataFrame, risques=RISQUES_PROFIL):
+        self.risques = [c for c in risques if c in departements.columns]
+        moyennes = {
+            "departement": departements.groupby("nom_departement", observed=True)[self.risques].mean(),
+            "zone": departements.groupby("zone5", observed=True)[self.risques].mean(),
+        }
+        self._index = {niveau: pd.Index(m.index.astype(str)) for niveau, m in moyennes.items()}
+        self._valeurs = {niveau: m.to_numpy(dtype="float64") for niveau, m in moyennes.items()}
+
+    def noms(self, niveau: str = "departement") -> list:
+        return list(self._index[niveau])
+
+    def matrice(self, noms=None, niveau: str = "departement") -> pd.DataFrame:
+        """Lignes de la matrice pour `noms` (toutes si None), dans l'ordre demandé ; noms inconnus ignorés."""
+        index = self._index[niveau]
+        if noms is None:
+            positions = np.arange(len(index))
+        else:
+            positions = index.get_indexer([str(n) for n in noms])
+            positions = positions[positions >= 0]
+        return pd.DataFrame(self._valeurs[niveau].take(positions, axis=0), index=index.take(positions), columns=self.risques)
+
+    def profil_moyen(self, noms=None, niveau: str = "departement") -> pd.Series:
+        """Profil moyen (moyenne des lignes) d'un ensemble de départements ou de zones."""
+        return self.matrice(noms, niveau).mean()
+
+    def format_long(self, noms=None, niveau: str = "departement", colonne: str = "nom_departement") -> pd.DataFrame:
+        """Format long (colonne, type_risque, indice) pour les graphiques groupés."""
+        m = self.matrice(noms, niveau)
+        return pd.DataFrame({
+            colonne: np.repeat(m.index.to_numpy(), len(self.risques)),
+            "type_risque": np.tile(self.risques, len(m)),
+            "indice": m.to_numpy().ravel(),
+        })
@@ -0,0 +1,79 @@
+import pandas as pd
+import numpy as np
+
+
+# SCHÉMA COMPACT DE LA BASE DASHBOARD
+#
+# - "category" : chaînes répétées des millions de fois -> dictionnaire + codes entiers
+# - ("float32", tol) : passage en float32 si l'erreur absolue max reste <= tol
+# - "int16" / "int32" : entiers (passage en float32 si valeurs manquantes)
+
+SCHEMA = {
+    "code_departement": "category",
+    "nom_departement": "category",
+    "code_commune": "category",
+    "commune": "category",
+    "type_local": "category",
+    "region": "category",
+    "zone": "category",
+    "zone5": "category",
+    "zone_macro": "category",
+    "zone_fiscale": "category",
+    "zone_paris": "category",
+    "annee": "int16",
+    "prix_m2": ("float32", 0.01),
+    "surface_reelle_bati": ("float32", 0.01),
+    "valeur_fonciere": ("float32", 0.5),
+    "population_exposee": "int32",
+    "risque_climatique": ("float32", 1e-4),
+    "risque_global": ("float32", 1e-4),
+    "risque_chaleur": ("float32", 1e-4),
+    "risque_inondation": ("float32", 1e-4),
+    "risque_secheresse": ("float32", 1e-4),
+    "risque_feux": ("float32", 1e-4),
+}
+
+
+def _compacter_colonne(s: pd.Series, spec) -> pd.Series:
+    if spec == "category":
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+
+    num = pd.to_numeric(s, errors="coerce")
+
+    if spec in ("int16", "int32"):
+        if num.isna().any():
+            return num.astype("float32")
+        info = np.iinfo(spec)
+        if num.min() >= info.min and num.max() <= info.max:
+            return num.astype(spec)
+        return num
+
+    dtype, tol = spec
+    x = num.to_numpy(dtype="float64", na_value=np.nan)
+    x32 = x.astype(dtype)
+    ecart = np.abs(x32.astype("float64") - x)
+    if np.nanmax(ecart, initial=0.0) <= tol:
+        return pd.Series(x32, index=s.index, name=s.name)
+    return num
+
+
+def compacter(df: pd.DataFrame, schema: dict = SCHEMA) -> pd.DataFrame:
+    """
+    Applique le schéma compact (catégories, entiers courts, float32) aux colonnes
+    présentes. Les colonnes hors schéma sont laissées telles quelles.
+    """
+    cols = {c: _compacter_colonne(df[c], spec) for c, spec in schema.items() if c in df.columns}
+    return df.assign(**cols)
+
+
+def rapport_compaction(avant: pd.DataFrame, apres: pd.DataFrame) -> pd.DataFrame:
+    """Octets par colonne avant / après compaction (mémoire profonde, chaînes comprises)."""
+    rapport = pd.DataFrame({
+        "dtype_avant": avant.dtypes.astype(str),
+        "dtype_apres": apres.dtypes.reindex(avant.columns).astype(str),
+        "octets_avant": avant.memory_usage(index=False, deep=True),
+        "octets_apres": apres.memory_usage(index=False, deep=True).reindex(avant.columns),
+    })
+    rapport.loc["TOTAL", ["octets_avant", "octets_apres"]] = rapport[["octets_avant", "octets_apres"]].sum()
+    rapport["ratio"] = (rapport["octets_avant"] / rapport["octets_apres"]).round(1)
+    return rapport
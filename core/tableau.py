@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+# TABLEAU PAGINÉ CÔTÉ SERVEUR
+#
+# Le tableau ne reçoit plus un DataFrame entier (ni un head() arbitraire) :
+# il parcourt la sélection complète, décrite par ses numéros de ligne dans
+# un DataFrame en lecture seule. Le tri d'une page passe par une sélection
+# partielle (np.argpartition autour des rangs de début et de fin de page,
+# O(n)) puis un tri des seules lignes de la page ; seule la page visible est
+# matérialisée et envoyée au navigateur.
+
+TAILLES_PAGE = [25, 50, 100, 200]
+
+
+def cle_tri(s: pd.Series) -> np.ndarray:
+    """
+    Clé numérique de tri d'une colonne (valeurs manquantes = NaN) : codes
+    rangés dans l'ordre des catégories triées pour une catégorie, codes
+    d'un factorize trié pour un texte.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        rangs = np.empty(len(s.cat.categories), dtype="float64")
+        rangs[np.argsort(s.cat.categories.to_numpy(), kind="stable")] = np.arange(len(rangs))
+        return np.where(codes >= 0, rangs[codes], np.nan)
+    if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+        return s.to_numpy(dtype="float64", na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return np.where(s.isna().to_numpy(), np.nan, s.to_numpy().view("int64").astype("float64"))
+    codes, _ = pd.factorize(s, sort=True)
+    return np.where(codes >= 0, codes, np.nan).astype("float64")
+
+
+def lignes_page(df: pd.DataFrame, lignes: np.ndarray, page: int, taille: int, colonne=None, croissant=True) -> np.ndarray:
+    """
+    Numéros de ligne (dans `df`) de la page `page` (à partir de 0) de la
+    sélection `lignes`, triée sur `colonne` ; valeurs manquantes en fin.
+    Sans colonne, la page suit l'ordre de la sélection.
+    """
+    debut = page * taille
+    fin = min(debut + taille, len(lignes))
+    if debut >= fin:
+        return lignes[:0]
+    if colonne is None:
+        return lignes[debut:fin]
+
+    valeurs = cle_tri(df[colonne].take(lignes))
+    if not croissant:
+        valeurs = -valeurs
+    # Lignes de rang debut..fin-1 regroupées en O(n), triées entre elles seulement
+    if fin - debut == len(valeurs):
+        positions = np.arange(len(valeurs))
+    else:
+        kth = [debut, fin - 1] if fin - 1 > debut else [debut]
+        positions = np.argpartition(valeurs, kth)[debut:fin]
+    positions = positions[np.argsort(valeurs[positions], kind="stable")]
+    return lignes[positions]
+
+
+@st.fragment
+def tableau_pagine(df: pd.DataFrame, lignes: np.ndarray, cle: str, tri_defaut=None, croissant_defaut=True):
+    """
+    Tableau paginé et triable sur les lignes `lignes` de `df` : changer de
+    page ou de tri ne relance que le fragment et ne matérialise qu'une page.
+    """
+    lignes = np.asarray(lignes)
+    colonnes = list(df.columns)
+    cle_page = f"{cle}_page"
+
+    def revenir_debut():
+        st.session_state[cle_page] = 1
+
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    choix_tri = ["(ordre d'origine)"] + colonnes
+    colonne = c1.selectbox(
+        "Trier par", choix_tri,
+        index=choix_tri.index(tri_defaut) if tri_defaut in colonnes else 0,
+        key=f"{cle}_tri", on_change=revenir_debut,
+    )
+    croissant = c2.radio(
+        "Ordre", ["Croissant", "Décroissant"], index=0 if croissant_defaut else 1,
+        key=f"{cle}_ordre", horizontal=True, on_change=revenir_debut,
+    ) == "Croissant"
+    taille = c3.selectbox("Lignes par page", TAILLES_PAGE, index=1, key=f"{cle}_taille", on_change=revenir_debut)
+
+    nb_pages = max(1, -(-len(lignes) // taille))
+    # Sélection réduite depuis le dernier rerun : page ramenée dans les bornes
+    if st.session_state.get(cle_page, 1) > nb_pages:
+        st.session_state[cle_page] = nb_pages
+    page = c4.number_input("Page", 1, nb_pages, key=cle_page)
+
+    idx = lignes_page(
+        df, lignes, page - 1, taille,
+        colonne=None if colonne == choix_tri[0] else colonne, croissant=croissant,
+    )
+    debut = (page - 1) * taille
+    st.caption(
+        f"Lignes {debut + 1 if len(idx) else 0:,}–{debut + len(idx):,} sur {len(lignes):,} "
+        f"(page {page:,} / {nb_pages:,})".replace(",", " ")
+    )
+    # Index affiché = rang dans la sélection triée
+    st.dataframe(df.take(idx).set_axis(np.arange(debut + 1, debut + len(idx) + 1)), use_container_width=True)
@@ -1,6 +1,10 @@
+import sys
 import pandas as pd
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from core.geo import attribut_departement
+
 # -------------------------------------------------------------------
 # 1. Dossiers et lecture de la base finale
 # -------------------------------------------------------------------
@@ -35,34 +39,11 @@ df = df[(df["prix_m2"].notna()) & (df["prix_m2"] > 0)]
 # -------------------------------------------------------------------
 # 3. Ajout des régions à partir des codes départements
 # -------------------------------------------------------------------
-regions = {
-    "01":"AURA","02":"HDF","03":"AURA","04":"PACA","05":"PACA","06":"PACA","07":"AURA","08":"GE",
-    "09":"OCC","10":"GE","11":"OCC","12":"OCC","13":"PACA","14":"NOR","15":"AURA","16":"NAQ",
-    "17":"NAQ","18":"CVL","19":"NAQ","21":"BFC","22":"BRE","23":"NAQ","24":"NAQ","25":"BFC",
-    "26":"AURA","27":"NOR","28":"CVL","29":"BRE","2A":"COR","2B":"COR","30":"OCC","31":"OCC",
-    "32":"OCC","33":"NAQ","34":"OCC","35":"BRE","36":"CVL","37":"CVL","38":"AURA","39":"BFC",
-    "40":"NAQ","41":"CVL","42":"AURA","43":"AURA","44":"PDL","45":"CVL","46":"OCC","47":"NAQ",
-    "48":"OCC","49":"PDL","50":"NOR","51":"GE","52":"GE","53":"PDL","54":"GE","55":"GE",
-    "56":"BRE","57":"GE","58":"BFC","59":"HDF","60":"HDF","61":"NOR","62":"HDF","63":"AURA",
-    "64":"NAQ","65":"OCC","66":"OCC","67":"GE","68":"GE","69":"AURA","70":"BFC","71":"BFC",
-    "72":"PDL","73":"AURA","74":"AURA","75":"IDF","76":"NOR","77":"IDF","78":"IDF","79":"NAQ",
-    "80":"HDF","81":"OCC","82":"OCC","83":"PACA","84":"PACA","85":"PDL","86":"NAQ","87":"NAQ",
-    "88":"GE","89":"BFC","90":"BFC","91":"IDF","92":"IDF","93":"IDF","94":"IDF","95":"IDF"
-}
-
-def map_region(dep):
-    if pd.isna(dep):
-        return "AUTRE"
-    dep = str(dep).strip()
-    if dep in ("2A", "2B"):
-        return regions.get(dep, "AUTRE")
-    # on pad avec un zéro si besoin
-    if dep.isdigit() and len(dep) == 1:
-        dep = "0" + dep
-    return regions.get(dep, "AUTRE")
-
+# Codes courts (AURA, IDF...) du référentiel core.geo, "AUTRE" hors référentiel
 if "code_departement" in df.columns:
-    df["region"] = df["code_departement"].apply(map_region)
+    df["region"] = attribut_departement(
+        df["code_departement"], "region_code", defaut="AUTRE", categorie=False
+    )
 else:
     df["region"] = "AUTRE"
 
@@ -1,165 +1,244 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import numpy as np
-from pathlib import Path
 import plotly.io as pio
 
+from core.dataset import get_base, memo_agregats, pool_calculs, file_exports
+from core.execution import LotCalculs
+from core.memo import cle_filtres
+from core.filtres import Filtres
+from core.carte import MESSAGE_GEOMETRIE, choroplethe, geometrie_disponible
+from core.densite import SEUIL_DENSITE, MAX_POINTS, grille_densite, echantillon_stratifie
+from core.export import FORMATS, MAX_LIGNES_DIRECT, export_direct
+from core.index import IndexInverse
+from core.hierarchie import Hierarchie
+from core.tableau import tableau_pagine
+from core.prevision import (
+    PREVISIONS_IMMOBILIER_PATH, charger_previsions, historique_et_prevision, lire_previsions,
+    selection_immobilier, series_prix,
+)
+from core.classement import SEUIL_VENTES, TOP_N, charger_classement, par_commune, extremes
+from core.cube import BORNES_PRIX, LARGEUR_TRANCHE, charger_cube, agreger, histogramme
+
 pio.templates.default = "plotly_white"
 st.set_page_config(page_title="Analyse immobilière", layout="wide")
 
 
+# CHARGEMENT DES DONNÉES
 
-# FONCTIONS MAPPING ZONES
-
-def map_region(dep: str) -> str:
-    if dep is None:
-        return "Région inconnue"
-    d = str(dep).strip()
-
-    if d in ("2A", "2B"):
-        return "Corse"
-    if d in ("75", "77", "78", "91", "92", "93", "94", "95"):
-        return "Île-de-France"
-    if d in ("18", "28", "36", "37", "41", "45"):
-        return "Centre-Val de Loire"
-    if d in ("21", "58", "71", "89", "25", "39", "70", "90"):
-        return "Bourgogne-Franche-Comté"
-    if d in ("67", "68", "88", "52", "54", "55", "57", "08", "10", "51"):
-        return "Grand Est"
-    if d in ("59", "62", "80", "02", "60"):
-        return "Hauts-de-France"
-    if d in ("14", "27", "50", "61", "76"):
-        return "Normandie"
-    if d in ("22", "29", "35", "56"):
-        return "Bretagne"
-    if d in ("44", "49", "53", "72", "85"):
-        return "Pays de la Loire"
-    if d in ("16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"):
-        return "Nouvelle-Aquitaine"
-    if d in ("03", "15", "43", "63", "07", "26", "38", "42", "69", "73", "74", "01"):
-        return "Auvergne-Rhône-Alpes"
-    if d in ("09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82"):
-        return "Occitanie"
-    if d in ("04", "05", "06", "13", "83", "84"):
-        return "Provence-Alpes-Côte d’Azur"
-    return "Région inconnue"
-
-
-def map_zone_macro(region: str) -> str:
-    if region in ("Hauts-de-France", "Normandie"):
-        return "Nord"
-    if region == "Grand Est":
-        return "Est"
-    if region in ("Bretagne", "Pays de la Loire"):
-        return "Ouest"
-    if region in ("Occitanie", "Provence-Alpes-Côte d’Azur", "Corse"):
-        return "Sud"
-    return "Centre"
-
-
-
-def map_zone_fiscale(dep: str) -> str:
-    if dep is None:
-        return "Zone C"
-    d = str(dep).strip()
-
-    zone_A = {"75", "92", "93", "94"}
-    zone_B1 = {
-        "77", "78", "91", "95", "13", "06", "69", "31", "33", "59", "67", "44",
-        "34", "35", "38"
-    }
-    zone_B2 = {
-        "02", "08", "10", "14", "21", "22", "24", "25", "26", "27", "28", "29",
-        "30", "32", "37", "39", "40", "41", "42", "45", "46", "47", "48", "49",
-        "50", "51", "52", "53", "54", "55", "56", "58", "60", "61", "62", "63",
-        "64", "65", "66", "68", "70", "71", "72", "73", "74", "76", "79", "80",
-        "81", "82", "83", "84", "85", "86", "87", "88", "89", "90"
-    }
 
+# Colonnes lues par la page (projection) : les requises sont vérifiées une fois au chargement
+COLONNES_REQUISES = [
+    "annee", "code_departement", "nom_departement", "region", "zone_macro",
+    "zone_fiscale", "zone_paris", "type_local", "prix_m2",
+]
+COLONNES_OPTIONNELLES = ["valeur_fonciere", "surface_reelle_bati", "commune", "nb_transactions", "id_mutation"]
 
-def pick_count_col(df: pd.DataFrame) -> str:
-    for c in ["valeur_fonciere", "id_mutation", "nb_transactions", "prix_m2"]:
-        if c in df.columns:
-            return c
-    return df.columns[0]
 
+@st.cache_resource
+def load_data():
+    df = get_base(COLONNES_REQUISES, COLONNES_OPTIONNELLES)
 
-# CHARGEMENT DES DONNÉES
+    # --- Nettoyage prix_m2 : vue filtrée calculée une fois et partagée
+    df = df[df["prix_m2"].between(*BORNES_PRIX, inclusive="both")]
 
+    return df
 
-@st.cache_data
-def load_data():
-    BASE_DIR = Path(__file__).resolve().parents[1]
-    data_path = BASE_DIR / "data" / "base_finale_dashboard.csv"
 
-    if not data_path.exists():
-        st.error(f"Fichier introuvable : {data_path}")
-        st.stop()
+# Dimensions des filtres de la barre latérale
+DIMENSIONS = ["annee", "zone_macro", "zone_fiscale", "region", "nom_departement", "type_local"]
+
+
+@st.cache_resource
+def load_index():
+    # Index inversé construit une fois sur la vue partagée (mêmes numéros de ligne)
+    return IndexInverse(load_data(), DIMENSIONS)
+
+
+@st.cache_resource
+def load_hierarchie():
+    # Cascade zone macro -> région -> département et catalogues année / zone fiscale / type, construits une fois
+    return Hierarchie(load_data(), ["zone_macro", "region", "nom_departement"], ["annee", "zone_fiscale", "type_local"])
+
+
+# Nombre de barres de la distribution des prix (bords alignés sur les tranches du cube)
+NB_BARRES_HISTO = 50
+
+# Budget du mémo des agrégats (partagé entre sessions)
+MEMO_MAX_ENTREES = 256
+MEMO_MAX_OCTETS = 64 * 1024 ** 2
+
+
+@st.cache_resource
+def load_cube():
+    # Cube (annee x département x type x tranche de prix) : KPI et graphiques par roll-up
+    return charger_cube(load_data())
+
+
+@st.cache_resource
+def load_previsions():
+    # Prévisions du prix par (niveau, clé, type), None si la table est absente ou périmée
+    return charger_previsions(PREVISIONS_IMMOBILIER_PATH)
+
+
+@st.cache_resource
+def load_classement():
+    # Classement des communes (annee x département x type x commune), None sans colonne commune
+    return charger_classement(load_data())
+
 
-    df = pd.read_csv(
-        data_path,
-        dtype={"code_departement": str, "code_commune": str},
-        low_memory=False
+# FRAGMENTS
+# Widgets locaux de l'onglet comparaisons : leur interaction ne relance que
+# le fragment, sur les agrégats déjà filtrés passés en argument.
+
+@st.fragment
+def classement_departements(comp_agg: pd.DataFrame):
+    st.markdown("Classement des départements (indice 100 = moyenne France)")
+    metric_sel = st.radio(
+        "Indicateur",
+        ["Prix moyen au m²", "Indice (France=100)", "Nombre de transactions"],
+        horizontal=True
     )
 
-    # --- Normalisation codes
-    if "code_departement" in df.columns:
-        df["code_departement"] = (
-            df["code_departement"]
-            .astype(str)
-            .str.strip()
-            .str.upper()
+    if metric_sel == "Prix moyen au m²":
+        bar_fig = px.bar(
+            comp_agg.sort_values("prix_m2", ascending=False),
+            x="nom_departement",
+            y="prix_m2",
+            labels={"nom_departement": "Département", "prix_m2": "Prix moyen au m²"},
         )
-        # zfill pour les codes numériques (01, 02, ...)
-        df["code_departement"] = df["code_departement"].apply(
-            lambda x: x.zfill(2) if x.isdigit() else x
+    elif metric_sel == "Indice (France=100)":
+        bar_fig = px.bar(
+            comp_agg.sort_values("indice_100", ascending=False),
+            x="nom_departement",
+            y="indice_100",
+            labels={"nom_departement": "Département", "indice_100": "Indice prix (France=100)"},
         )
-
-    if "code_commune" in df.columns:
-        df["code_commune"] = df["code_commune"].astype(str).str.zfill(5)
-
-    # --- Si prix_m2 absent, on essaie de le calculer
-    if "prix_m2" not in df.columns:
-        if {"valeur_fonciere", "surface_reelle_bati"}.issubset(df.columns):
-            surf = pd.to_numeric(df["surface_reelle_bati"], errors="coerce")
-            val = pd.to_numeric(df["valeur_fonciere"], errors="coerce")
-            df["prix_m2"] = np.where((surf > 0) & (val > 0), val / surf, np.nan)
-
-    # --- Nettoyage prix_m2 (si dispo)
-    if "prix_m2" in df.columns:
-        df["prix_m2"] = pd.to_numeric(df["prix_m2"], errors="coerce")
-        df = df[df["prix_m2"].between(50, 30000, inclusive="both")]
-
-    # --- Eviter KeyError nom_departement
-    if "nom_departement" not in df.columns:
-        if "code_departement" in df.columns:
-            df["nom_departement"] = df["code_departement"]
-        else:
-            df["nom_departement"] = "N/A"
-
-    # --- Zone (si absente)
-    if "zone" not in df.columns:
-        df["zone"] = "Autres"
-
-    # --- Régions + zones A / C
-    if "code_departement" in df.columns:
-        df["region"] = df["code_departement"].apply(map_region)
-        df["zone_macro"] = df["region"].apply(map_zone_macro)
-        df["zone_fiscale"] = df["code_departement"].apply(map_zone_fiscale)
     else:
-        df["region"] = "Région inconnue"
-        df["zone_macro"] = "Centre"
-        df["zone_fiscale"] = "Zone C"
+        bar_fig = px.bar(
+            comp_agg.sort_values("nb", ascending=False),
+            x="nom_departement",
+            y="nb",
+            labels={"nom_departement": "Département", "nb": "Nombre de transactions"},
+        )
 
-    # --- Paris / Banlieue IDF
-    df["zone_paris"] = "Autre"
-    if "code_departement" in df.columns:
-        df.loc[df["code_departement"] == "75", "zone_paris"] = "Paris"
-        df.loc[df["code_departement"].isin(["77", "78", "91", "92", "93", "94", "95"]), "zone_paris"] = "Banlieue IDF"
+    bar_fig.update_layout(xaxis_tickangle=-60)
+    st.plotly_chart(bar_fig, use_container_width=True)
+
+
+@st.fragment
+def comparaison_ab(comp_agg: pd.DataFrame):
+    st.markdown("Comparaison A vs B")
+
+    options_dep = sorted(comp_agg["nom_departement"].unique())
+    if len(options_dep) >= 2:
+        depA = st.selectbox("Département A", options_dep, index=0)
+        depB = st.selectbox("Département B", options_dep, index=1)
+
+        dfA = comp_agg[comp_agg["nom_departement"] == depA].iloc[0]
+        dfB = comp_agg[comp_agg["nom_departement"] == depB].iloc[0]
+
+        cA, cB = st.columns(2)
+        with cA:
+            st.markdown(f"**{depA}**")
+            st.metric("Prix moyen au m²", f"{dfA['prix_m2']:,.0f} €")
+            st.metric("Indice prix (France=100)", f"{dfA['indice_100']:,.1f}")
+            st.metric("Nombre de transactions", f"{int(dfA['nb']):,}".replace(",", " "))
+        with cB:
+            st.markdown(f"**{depB}**")
+            st.metric("Prix moyen au m²", f"{dfB['prix_m2']:,.0f} €")
+            st.metric("Indice prix (France=100)", f"{dfB['indice_100']:,.1f}")
+            st.metric("Nombre de transactions", f"{int(dfB['nb']):,}".replace(",", " "))
+    else:
+        st.info("Nombre de départements insuffisant pour comparaison A/B.")
+
+
+@st.fragment
+def paris_banlieue(cellules_comp: pd.DataFrame):
+    if st.button("Comparer Paris / Banlieue"):
+        # Roll-up calculé seulement au clic
+        par_zone = agreger(cellules_comp, "zone_paris").set_index("zone_paris")["prix_m2"]
+        prix_paris = par_zone.get("Paris", np.nan)
+        prix_banl = par_zone.get("Banlieue IDF", np.nan)
+
+        colP, colB = st.columns(2)
+        with colP:
+            st.markdown("**Paris (75)**")
+            if pd.notna(prix_paris):
+                st.metric("Prix moyen au m²", f"{prix_paris:,.0f} €")
+            else:
+                st.write("Pas de données pour Paris avec ces filtres.")
 
-    return df
+        with colB:
+            st.markdown("**Banlieue IDF (77,78,91–95)**")
+            if pd.notna(prix_banl):
+                st.metric("Prix moyen au m²", f"{prix_banl:,.0f} €")
+            else:
+                st.write("Pas de données pour la banlieue avec ces filtres.")
+
+        if pd.notna(prix_paris) and pd.notna(prix_banl):
+            comp = pd.DataFrame({
+                "Zone": ["Paris", "Banlieue IDF"],
+                "Prix moyen": [prix_paris, prix_banl]
+            })
+            figpb = px.bar(comp, x="Zone", y="Prix moyen", text="Prix moyen")
+            figpb.update_traces(texttemplate="%{text:,.0f} €", textposition="outside")
+            st.plotly_chart(figpb, use_container_width=True)
+
+
+@st.fragment
+def export_donnees(df: pd.DataFrame, lignes: np.ndarray):
+    """Export des lignes filtrées : colonnes et format au choix, écrit par blocs au clic."""
+    c1, c2 = st.columns([2, 1])
+    colonnes = c1.multiselect("Colonnes exportées", list(df.columns), default=list(df.columns))
+    format_export = c2.selectbox("Format", list(FORMATS))
+    extension, mime = FORMATS[format_export]
+
+    if not colonnes:
+        st.info("Choisir au moins une colonne.")
+    elif len(lignes) <= MAX_LIGNES_DIRECT:
+        st.download_button(
+            label=f"Télécharger {len(lignes):,} lignes ({format_export})".replace(",", " "),
+            data=lambda: export_direct(df, lignes, colonnes, extension),
+            file_name=f"donnees_filtrees_immobilier.{extension}",
+            mime=mime,
+            on_click="ignore",
+        )
+    else:
+        st.info(
+            f"{len(lignes):,} lignes : au-delà de {MAX_LIGNES_DIRECT:,} lignes, ".replace(",", " ")
+            + "l'export est préparé en tâche de fond."
+        )
+        if st.button("Mettre l'export en file d'attente"):
+            st.session_state.setdefault("exports_immobilier", []).append(
+                file_exports().soumettre(df, lignes, colonnes, extension)
+            )
 
+    exports = st.session_state.get("exports_immobilier", [])
+    if exports:
+        st.button("Rafraîchir l'état des exports")
+        for identifiant in list(exports):
+            travail = file_exports().etat(identifiant)
+            if travail["etat"] == "terminé":
+                chemin = travail["chemin"]
+                st.download_button(
+                    label=f"Export du {travail['soumis']} prêt ({travail['lignes']:,} lignes)".replace(",", " "),
+                    data=lambda identifiant=identifiant: file_exports().contenu(identifiant),
+                    file_name=f"donnees_filtrees_immobilier.{chemin.name.split('.', 1)[1]}",
+                    key=f"export_{identifiant}",
+                    on_click="ignore",
+                )
+            elif travail["etat"] in ("expiré", "inconnu"):
+                # Fichier purgé (24 h) ou serveur redémarré : l'export est oublié
+                exports.remove(identifiant)
+                st.warning(
+                    f"Export {travail.get('soumis', identifiant)} expiré : "
+                    "relancer l'export pour obtenir un nouveau fichier."
+                )
+            else:
+                st.caption(f"Export {identifiant} : {travail['etat']}")
 
 
 # APP
@@ -189,445 +268,423 @@ def main():
     st.title("Analyse immobilière - Dashboard professionnel")
 
     df = load_data()
-    count_col = pick_count_col(df)
+    index = load_index()
+    hierarchie = load_hierarchie()
+    cube = load_cube()
+    classement = load_classement()
+    previsions = load_previsions()
+    memo = memo_agregats("analyse_immobilier", MEMO_MAX_ENTREES, MEMO_MAX_OCTETS)
 
     st.sidebar.header("Filtres principaux")
 
-    if "annee" in df.columns:
-        annees = sorted(df["annee"].dropna().unique())
-        annees_options = ["Toutes"] + [str(int(a)) for a in annees]
-        annee_sel = st.sidebar.selectbox(
-            "Année",
-            annees_options,
-            index=len(annees_options) - 1 if len(annees_options) > 1 else 0
-        )
-    else:
-        annee_sel = "Toutes"
+    # Sélections multiples : vide = pas de filtre. Options lues dans la hiérarchie.
+    annees = [int(a) for a in hierarchie.options("annee")]
+    annee_sel = st.sidebar.multiselect(
+        "Année",
+        annees,
+        default=annees[-1:],
+        placeholder="Toutes",
+    )
 
     st.sidebar.markdown("---")
 
     # IMPORTANT: widgets bien en sidebar
     with st.sidebar.expander("Filtres zones (A / C)", expanded=False):
-        zm_options = ["Toutes"] + sorted(df["zone_macro"].dropna().unique()) if "zone_macro" in df.columns else ["Toutes"]
-        zone_macro_sel = st.sidebar.selectbox("Zone macro (Nord / Sud / Est / Ouest / Centre)", zm_options)
-
-        zf_options = ["Toutes"] + sorted(df["zone_fiscale"].dropna().unique()) if "zone_fiscale" in df.columns else ["Toutes"]
-        zone_fiscale_sel = st.sidebar.selectbox("Zone fiscale (A / B1 / B2 / C)", zf_options)
+        zone_macro_sel = st.sidebar.multiselect(
+            "Zone macro (Nord / Sud / Est / Ouest / Centre)", hierarchie.options("zone_macro"), placeholder="Toutes"
+        )
+        zone_fiscale_sel = st.sidebar.multiselect(
+            "Zone fiscale (A / B1 / B2 / C)", hierarchie.options("zone_fiscale"), placeholder="Toutes"
+        )
 
     st.sidebar.markdown("---")
 
-    regions = ["Toutes"] + sorted(df["region"].dropna().unique()) if "region" in df.columns else ["Toutes"]
-    region_sel = st.sidebar.selectbox("Région", regions)
-
-    deps = df["nom_departement"].dropna().unique() if "nom_departement" in df.columns else []
-    deps_options = ["Tous"] + sorted(deps.tolist()) if hasattr(deps, "tolist") else ["Tous"]
-    dep_sel = st.sidebar.selectbox("Département", deps_options)
+    # Régions et départements restreints aux zones / régions sélectionnées
+    region_sel = st.sidebar.multiselect(
+        "Région", hierarchie.enfants("region", zone_macro=zone_macro_sel), placeholder="Toutes"
+    )
+    dep_sel = st.sidebar.multiselect(
+        "Département",
+        hierarchie.enfants("nom_departement", zone_macro=zone_macro_sel, region=region_sel),
+        placeholder="Tous",
+    )
 
     st.sidebar.markdown("---")
 
-    types_bien = ["Tous"] + sorted(df["type_local"].dropna().unique()) if "type_local" in df.columns else ["Tous"]
-    type_sel = st.sidebar.selectbox("Type de bien", types_bien)
+    type_sel = st.sidebar.multiselect("Type de bien", hierarchie.options("type_local"), placeholder="Tous")
 
     st.sidebar.markdown("---")
 
-    if "prix_m2" in df.columns and not df["prix_m2"].dropna().empty:
-        min_p = float(df["prix_m2"].min())
-        max_p = float(df["prix_m2"].max())
+    # Bornes lues dans le cube ; pas du curseur = largeur des tranches de prix,
+    # la borne haute retient toute sa tranche (voir core.cube)
+    if not cube.empty:
+        min_p = int(cube["tranche"].min())
+        max_p = int(cube["tranche"].max())
     else:
-        min_p, max_p = 0.0, 10000.0
+        min_p, max_p = 0, 10000
 
-    if int(min_p) >= int(max_p):
+    if min_p >= max_p:
         st.sidebar.warning("Plage de prix insuffisante pour ce filtre.")
-        prix_min, prix_max = int(min_p), int(max_p)
+        prix_min, prix_max = min_p, max_p
     else:
+        defaut_max = min_p + int((max_p - min_p) * 0.7) // LARGEUR_TRANCHE * LARGEUR_TRANCHE
         prix_min, prix_max = st.sidebar.slider(
             "Filtre sur le prix au m²",
-            min_value=int(min_p),
-            max_value=int(max_p),
-            value=(int(min_p), int(min_p + (max_p - min_p) * 0.7))
+            min_value=min_p,
+            max_value=max_p,
+            value=(min_p, defaut_max),
+            step=LARGEUR_TRANCHE,
+            help=f"Par tranches de {LARGEUR_TRANCHE} € : la borne haute inclut les prix jusqu'à {LARGEUR_TRANCHE} € au-dessus.",
         )
 
-
-    
     # APPLICATION DES FILTRES
-    
-    dff = df.copy()
-
-    if annee_sel != "Toutes" and "annee" in dff.columns:
-        annee_int = int(annee_sel)
-        dff = dff[dff["annee"] == annee_int]
-    else:
-        annee_int = None
-
-    if zone_macro_sel != "Toutes" and "zone_macro" in dff.columns:
-        dff = dff[dff["zone_macro"] == zone_macro_sel]
-
-    if zone_fiscale_sel != "Toutes" and "zone_fiscale" in dff.columns:
-        dff = dff[dff["zone_fiscale"] == zone_fiscale_sel]
-
-    if region_sel != "Toutes" and "region" in dff.columns:
-        dff = dff[dff["region"] == region_sel]
+    # Lignes brutes : sélections résolues par intersection des row ids de
+    # l'index inversé. Cube : un masque par dimension ; les variantes (toutes
+    # années, année précédente, sans département) combinent ces masques sans
+    # recopier la base.
+
+    # Variation vs N-1 uniquement pour une année seule
+    annee_int = annee_sel[0] if len(annee_sel) == 1 else None
+
+    filtres = (
+        Filtres(df, index)
+        .dans("annee", annee_sel)
+        .dans("zone_macro", zone_macro_sel)
+        .dans("zone_fiscale", zone_fiscale_sel)
+        .dans("region", region_sel)
+        .dans("nom_departement", dep_sel)
+        .dans("type_local", type_sel)
+        .entre("prix_m2", prix_min, prix_max + LARGEUR_TRANCHE, inclure_maxi=False)
+    )
 
-    if dep_sel != "Tous" and "nom_departement" in dff.columns:
-        dff = dff[dff["nom_departement"] == dep_sel]
+    # Mêmes filtres sur le cube : les tranches [t, t + largeur) de prix_min à prix_max incluses
+    filtres_cube = (
+        Filtres(cube)
+        .dans("annee", annee_sel)
+        .dans("zone_macro", zone_macro_sel)
+        .dans("zone_fiscale", zone_fiscale_sel)
+        .dans("region", region_sel)
+        .dans("nom_departement", dep_sel)
+        .dans("type_local", type_sel)
+        .entre("tranche", prix_min, prix_max)
+    )
+    cellules = filtres_cube.appliquer()
+
+    # Mêmes filtres, hors prix, sur le classement des communes
+    filtres_classement = None
+    if classement is not None:
+        filtres_classement = (
+            Filtres(classement)
+            .dans("annee", annee_sel)
+            .dans("zone_macro", zone_macro_sel)
+            .dans("zone_fiscale", zone_fiscale_sel)
+            .dans("region", region_sel)
+            .dans("nom_departement", dep_sel)
+            .dans("type_local", type_sel)
+        )
 
-    if type_sel != "Tous" and "type_local" in dff.columns:
-        dff = dff[dff["type_local"] == type_sel]
+    # État des filtres (clé du mémo) : un widget sans rapport (radio, A/B...)
+    # ne change pas la clé, les agrégats ne sont donc pas recalculés.
+    etat = {
+        "annee": annee_sel, "zone_macro": zone_macro_sel, "zone_fiscale": zone_fiscale_sel,
+        "region": region_sel, "nom_departement": dep_sel, "type_local": type_sel,
+        "prix": (prix_min, prix_max + LARGEUR_TRANCHE),
+    }
 
-    if "prix_m2" in dff.columns:
-        dff = dff[(dff["prix_m2"] >= prix_min) & (dff["prix_m2"] <= prix_max)]
+    total = memo.obtenir(cle_filtres("total", etat), lambda: agreger(cellules).iloc[0])
 
-    if dff.empty:
+    if total["nb"] == 0:
         st.warning("Aucune donnée immobilière pour ces filtres.")
         return
 
+    prix_moy = total["prix_m2"]
+
+    # Agrégats indépendants de l'onglet ouvert : soumis au pool dès le début,
+    # récupérés au moment de l'affichage (lot.resultat)
+    lot = LotCalculs(pool_calculs())
+
+    # Onglets à état : seul l'onglet ouvert s'exécute (changer d'onglet relance
+    # le script). Ses agrégats restent dans le mémo tant que les filtres ne changent pas.
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "Vue générale",
         "Comparaisons départements",
         "Typologie des biens",
         "Tableaux & données",
         "Prévisions & tendances"
-    ])
+    ], key="onglet_immobilier", on_change="rerun")
 
     # ---------------------------
     # TAB 1 – VUE GÉNÉRALE
     # ---------------------------
-    with tab1:
-        st.subheader("Indicateurs clés")
-
-        k1, k2, k3, k4 = st.columns(4)
-
-        prix_moy = dff["prix_m2"].mean() if "prix_m2" in dff.columns else None
-        prix_med = dff["prix_m2"].median() if "prix_m2" in dff.columns else None
-
-        if "nb_transactions" in dff.columns:
-            nb_trans = int(pd.to_numeric(dff["nb_transactions"], errors="coerce").fillna(0).sum())
-        else:
-            nb_trans = len(dff)
-
-        val_moy = dff["valeur_fonciere"].mean() if "valeur_fonciere" in dff.columns else None
-
-        delta_txt = None
-        if (
-            prix_moy is not None
-            and annee_sel != "Toutes"
-            and "annee" in df.columns
-            and "prix_m2" in df.columns
-            and annee_int is not None
-        ):
-            prev_year = annee_int - 1
-            df_prev = df.copy()
-
-            if zone_macro_sel != "Toutes" and "zone_macro" in df_prev.columns:
-                df_prev = df_prev[df_prev["zone_macro"] == zone_macro_sel]
-            if zone_fiscale_sel != "Toutes" and "zone_fiscale" in df_prev.columns:
-                df_prev = df_prev[df_prev["zone_fiscale"] == zone_fiscale_sel]
-            if region_sel != "Toutes" and "region" in df_prev.columns:
-                df_prev = df_prev[df_prev["region"] == region_sel]
-            if dep_sel != "Tous" and "nom_departement" in df_prev.columns:
-                df_prev = df_prev[df_prev["nom_departement"] == dep_sel]
-            if type_sel != "Tous" and "type_local" in df_prev.columns:
-                df_prev = df_prev[df_prev["type_local"] == type_sel]
-            if "prix_m2" in df_prev.columns:
-                df_prev = df_prev[(df_prev["prix_m2"] >= prix_min) & (df_prev["prix_m2"] <= prix_max)]
-
-            df_prev = df_prev[df_prev["annee"] == prev_year] if "annee" in df_prev.columns else df_prev
-
-            if not df_prev.empty and "prix_m2" in df_prev.columns:
-                prix_prev = df_prev["prix_m2"].mean()
-                if prix_prev and prix_prev > 0:
-                    delta = (prix_moy / prix_prev - 1) * 100
-                    delta_txt = f"{delta:,.1f} % vs {prev_year}"
-
-        k1.metric("Prix moyen au m²", f"{prix_moy:,.0f} €" if prix_moy is not None else "N/A", delta=delta_txt)
-        k2.metric("Prix médian au m²", f"{prix_med:,.0f} €" if prix_med is not None else "N/A")
-        k3.metric("Nombre de transactions", f"{nb_trans:,}".replace(",", " "))
-        k4.metric("Valeur foncière moyenne", f"{val_moy:,.0f} €" if val_moy is not None else "N/A")
-
-        st.markdown("---")
-
-        c1, c2 = st.columns([1.7, 1])
-
-        with c1:
-            st.subheader("Prix au m² par département")
-
-            geo_url = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson"
-
-            needed = {"code_departement", "nom_departement", "prix_m2"}
-            if needed.issubset(dff.columns) and not dff["prix_m2"].dropna().empty:
-                df_dep = (
-                    dff.groupby(["code_departement", "nom_departement"], as_index=False)
-                    .agg(
-                        prix_m2=("prix_m2", "mean"),
-                        nb=(count_col, "count")
-                    )
-                )
+    if tab1.open:
+        with tab1:
+            def variation_annee_precedente():
+                cellules_prev = filtres_cube.appliquer(sauf=["annee"], en_plus=(cube["annee"] == annee_int - 1).to_numpy())
+                return agreger(cellules_prev).iloc[0]
+
+            def nuage():
+                # Lignes brutes : seul graphique de l'onglet qui ne passe pas par le cube.
+                # Grande sélection -> grille de densité sur tous les points ; sinon points
+                # (échantillon stratifié par type de bien au-delà de MAX_POINTS).
+                ids = filtres.lignes()
+                surface = df["surface_reelle_bati"].to_numpy()[ids]
+                prix = df["prix_m2"].to_numpy()[ids]
+                ok = pd.notna(surface) & pd.notna(prix)
+                ids = ids[ok]
+                nb = len(ids)
+                if nb > SEUIL_DENSITE:
+                    return "densite", nb, grille_densite(surface[ok], prix[ok])
+                colonnes = [
+                    c for c in ["surface_reelle_bati", "prix_m2", "type_local", "valeur_fonciere", "commune", "nom_departement"]
+                    if c in df.columns
+                ]
+                return "points", nb, echantillon_stratifie(df[colonnes].take(ids), "type_local", MAX_POINTS)
+
+            # Médiane exacte sur les prix des lignes retenues (le cube ne la donne qu'à la tranche près)
+            lot.soumettre(
+                "mediane", memo.obtenir, cle_filtres("mediane", etat),
+                lambda: float(np.median(df["prix_m2"].to_numpy()[filtres.lignes()])),
+            )
+            lot.soumettre(
+                "carte", memo.obtenir, cle_filtres("carte", etat),
+                lambda: agreger(cellules, ["code_departement", "nom_departement"]), persistant=True,
+            )
+            # Distribution calculée côté serveur : NB_BARRES_HISTO barres environ, quel que soit le volume
+            lot.soumettre("histogramme", histogramme, cellules, NB_BARRES_HISTO)
+            lot.soumettre(
+                "serie_annee", memo.obtenir, cle_filtres("serie_annee", etat, sauf=["annee"]),
+                lambda: agreger(filtres_cube.appliquer(sauf=["annee"]), "annee").sort_values("annee"), persistant=True,
+            )
+            if annee_int is not None:
+                lot.soumettre("annee_precedente", variation_annee_precedente)
+            if "surface_reelle_bati" in df.columns:
+                lot.soumettre("nuage", memo.obtenir, cle_filtres("nuage", etat), nuage)
 
-                # petite sécurité: il faut des codes non vides
-                df_dep = df_dep[df_dep["code_departement"].notna() & (df_dep["code_departement"].astype(str).str.len() > 0)]
+            st.subheader("Indicateurs clés")
 
-                if df_dep.empty:
-                    st.info("Pas assez de données agrégées pour construire la carte.")
-                else:
-                    fig_map = px.choropleth(
-                        df_dep,
-                        geojson=geo_url,
-                        locations="code_departement",
-                        featureidkey="properties.code",
-                        color="prix_m2",
-                        color_continuous_scale="Blues",
-                        hover_name="nom_departement",
-                        hover_data={"prix_m2": True, "nb": True, "code_departement": False},
-                        labels={"prix_m2": "Prix moyen au m²", "nb": "Nb transactions"}
-                    )
-                    fig_map.update_geos(fitbounds="locations", visible=False)
-                    fig_map.update_layout(margin=dict(l=0, r=0, t=0, b=0))
-                    st.plotly_chart(fig_map, use_container_width=True)
-            else:
-                st.info("Colonnes insuffisantes pour afficher la carte (code_departement / nom_departement / prix_m2).")
+            k1, k2, k3, k4 = st.columns(4)
 
-        with c2:
-            st.subheader("Distribution des prix au m²")
+            prix_med = lot.resultat("mediane")
 
-            if "prix_m2" in dff.columns and not dff["prix_m2"].dropna().empty:
-                hist_fig = px.histogram(
-                    dff,
-                    x="prix_m2",
-                    nbins=50,
-                    labels={"prix_m2": "Prix au m²"},
-                )
-                hist_fig.update_layout(
-                    bargap=0.05,
-                    xaxis_title="Prix au m²",
-                    yaxis_title="Nombre de biens"
-                )
-                st.plotly_chart(hist_fig, use_container_width=True)
+            if "nb_transactions" in total.index:
+                nb_trans = int(total["nb_transactions"])
             else:
-                st.info("Pas assez de données pour afficher la distribution des prix.")
-
-        st.markdown("---")
-
-        c3, c4 = st.columns([1.3, 1.2])
-
-        with c3:
-            st.subheader("Evolution du prix au m² par année")
-
-            df_e = df.copy()
-            if zone_macro_sel != "Toutes" and "zone_macro" in df_e.columns:
-                df_e = df_e[df_e["zone_macro"] == zone_macro_sel]
-            if zone_fiscale_sel != "Toutes" and "zone_fiscale" in df_e.columns:
-                df_e = df_e[df_e["zone_fiscale"] == zone_fiscale_sel]
-            if region_sel != "Toutes" and "region" in df_e.columns:
-                df_e = df_e[df_e["region"] == region_sel]
-            if dep_sel != "Tous" and "nom_departement" in df_e.columns:
-                df_e = df_e[df_e["nom_departement"] == dep_sel]
-            if type_sel != "Tous" and "type_local" in df_e.columns:
-                df_e = df_e[df_e["type_local"] == type_sel]
-            if "prix_m2" in df_e.columns:
-                df_e = df_e[(df_e["prix_m2"] >= prix_min) & (df_e["prix_m2"] <= prix_max)]
-
-                if "annee" in df_e.columns:
-                    df_e = (
-                        df_e.groupby("annee", as_index=False)
-                        .agg(prix_m2=("prix_m2", "mean"), nb=(count_col, "count"))
-                        .sort_values("annee")
-                    )
-                    df_e = df_e[df_e["nb"] >= 30].copy()
-
-                    if not df_e.empty:
-                        df_e["moving"] = df_e["prix_m2"].rolling(window=3, center=True).mean()
-                        evol_fig = px.line(
-                            df_e,
-                            x="annee",
-                            y=["prix_m2", "moving"],
-                            markers=True,
-                            labels={"annee": "Année", "value": "Prix moyen au m²", "variable": ""},
-                        )
-                        evol_fig.update_layout(legend_title_text="")
-                        st.plotly_chart(evol_fig, use_container_width=True)
+                nb_trans = int(total["nb"])
 
-                        st.caption(
-                            f"Évolution calculée uniquement pour les années ayant au moins 30 transactions. "
-                            f"Total utilisé : {int(df_e['nb'].sum()):,}".replace(",", " ")
-                        )
+            val_moy = total["valeur_fonciere"] if "valeur_fonciere" in total.index else None
+
+            delta_txt = None
+            if annee_int is not None:
+                prev_year = annee_int - 1
+                prev = lot.resultat("annee_precedente")
+
+                if prev["nb"] > 0:
+                    prix_prev = prev["prix_m2"]
+                    if prix_prev and prix_prev > 0:
+                        delta = (prix_moy / prix_prev - 1) * 100
+                        delta_txt = f"{delta:,.1f} % vs {prev_year}"
+
+            k1.metric("Prix moyen au m²", f"{prix_moy:,.0f} €", delta=delta_txt)
+            k2.metric("Prix médian au m²", f"{prix_med:,.0f} €")
+            k3.metric("Nombre de transactions", f"{nb_trans:,}".replace(",", " "))
+            k4.metric("Valeur foncière moyenne", f"{val_moy:,.0f} €" if val_moy is not None else "N/A")
+
+            st.markdown("---")
+
+            c1, c2 = st.columns([1.7, 1])
+
+            with c1:
+                st.subheader("Prix au m² par département")
+
+                if total["nb"] > 0:
+                    df_dep = lot.resultat("carte")
+
+                    # petite sécurité: il faut des codes non vides
+                    df_dep = df_dep[df_dep["code_departement"].notna() & (df_dep["code_departement"].astype(str).str.len() > 0)]
+
+                    if df_dep.empty:
+                        st.info("Pas assez de données agrégées pour construire la carte.")
                     else:
-                        st.info("Pas assez de données (≥ 30 transactions/an) pour afficher une évolution robuste.")
+                        # Gabarit en cache : seules les valeurs par département sont injectées
+                        if not geometrie_disponible():
+                            st.error(MESSAGE_GEOMETRIE)
+                        else:
+                            fig_map = choroplethe(
+                                df_dep["code_departement"], df_dep["prix_m2"], df_dep["nom_departement"],
+                                titre="Prix moyen au m²",
+                                survol={"Nb transactions": df_dep["nb"]},
+                                colorscale="Blues",
+                                largeur_px=800,
+                            )
+                            st.plotly_chart(fig_map, use_container_width=True)
                 else:
-                    st.info("Colonne 'annee' manquante pour l'évolution.")
-            else:
-                st.info("Variable prix_m2 indisponible pour l'évolution.")
-
-        with c4:
-            st.subheader("Prix au m² vs surface")
-
-            if "surface_reelle_bati" in dff.columns and "prix_m2" in dff.columns:
-                scat_df = dff.dropna(subset=["surface_reelle_bati", "prix_m2"]).copy()
-                scat_df["surface_reelle_bati"] = pd.to_numeric(scat_df["surface_reelle_bati"], errors="coerce")
-                scat_df = scat_df.dropna(subset=["surface_reelle_bati", "prix_m2"])
-                if not scat_df.empty:
-                    if len(scat_df) > 5000:
-                        scat_df = scat_df.sample(5000, random_state=42)
-                    scat_fig = px.scatter(
-                        scat_df,
-                        x="surface_reelle_bati",
-                        y="prix_m2",
-                        color="type_local" if "type_local" in scat_df.columns else None,
-                        hover_data=[c for c in ["valeur_fonciere", "commune", "nom_departement"] if c in scat_df.columns],
-                        labels={
-                            "surface_reelle_bati": "Surface réelle (m²)",
-                            "prix_m2": "Prix au m²",
-                            "type_local": "Type de bien"
-                        }
+                    st.info("Pas assez de données pour afficher la carte.")
+
+            with c2:
+                st.subheader("Distribution des prix au m²")
+
+                if total["nb"] > 0:
+                    bornes, effectifs = lot.resultat("histogramme")
+                    hist_fig = px.bar(
+                        x=(bornes[:-1] + bornes[1:]) / 2,
+                        y=effectifs,
+                        labels={"x": "Prix au m²", "y": "Nombre de biens"},
+                    )
+                    hist_fig.update_traces(width=np.diff(bornes))
+                    hist_fig.update_layout(
+                        bargap=0.05,
+                        xaxis_title="Prix au m²",
+                        yaxis_title="Nombre de biens"
+                    )
+                    st.plotly_chart(hist_fig, use_container_width=True)
+                    st.caption(
+                        f"Distribution approchée : barres de {bornes[1] - bornes[0]:,.0f} € calées sur les "
+                        f"tranches de {LARGEUR_TRANCHE} € du cube, entre le prix minimal et maximal de la sélection."
+                        .replace(",", " ")
                     )
-                    st.plotly_chart(scat_fig, use_container_width=True)
                 else:
-                    st.info("Pas assez de données pour le nuage de points.")
-            else:
-                st.info("Variables surface ou prix manquantes pour le scatter.")
+                    st.info("Pas assez de données pour afficher la distribution des prix.")
 
+            st.markdown("---")
 
-    
-    ################### TAB 2 – COMPARAISONS DÉPARTEMENTS
-    
-    with tab2:
-        st.subheader("Comparaison inter-départements")
-
-        df_comp = df.copy()
-        if annee_sel != "Toutes" and "annee" in df_comp.columns:
-            df_comp = df_comp[df_comp["annee"] == int(annee_sel)]
-        if zone_macro_sel != "Toutes" and "zone_macro" in df_comp.columns:
-            df_comp = df_comp[df_comp["zone_macro"] == zone_macro_sel]
-        if zone_fiscale_sel != "Toutes" and "zone_fiscale" in df_comp.columns:
-            df_comp = df_comp[df_comp["zone_fiscale"] == zone_fiscale_sel]
-        if region_sel != "Toutes" and "region" in df_comp.columns:
-            df_comp = df_comp[df_comp["region"] == region_sel]
-        if type_sel != "Tous" and "type_local" in df_comp.columns:
-            df_comp = df_comp[df_comp["type_local"] == type_sel]
-        if "prix_m2" in df_comp.columns:
-            df_comp = df_comp[(df_comp["prix_m2"] >= prix_min) & (df_comp["prix_m2"] <= prix_max)]
-
-        if {"code_departement", "nom_departement", "prix_m2"}.issubset(df_comp.columns):
-            comp_agg = (
-                df_comp.groupby(["code_departement", "nom_departement"], as_index=False)
-                .agg(prix_m2=("prix_m2", "mean"), nb=(count_col, "count"))
-                .dropna(subset=["prix_m2"])
-            )
-        else:
-            comp_agg = pd.DataFrame()
-
-        if comp_agg.empty:
-            st.info("Pas assez de données pour la comparaison inter-départements.")
-        else:
-            moyenne_fr = comp_agg["prix_m2"].mean()
-            comp_agg["indice_100"] = comp_agg["prix_m2"] / moyenne_fr * 100 if moyenne_fr and moyenne_fr > 0 else np.nan
-
-            col_top, col_sel = st.columns([1.6, 1.4])
-
-            with col_top:
-                st.markdown("Classement des départements (indice 100 = moyenne France)")
-                metric_sel = st.radio(
-                    "Indicateur",
-                    ["Prix moyen au m²", "Indice (France=100)", "Nombre de transactions"],
-                    horizontal=True
-                )
+            c3, c4 = st.columns([1.3, 1.2])
 
-                if metric_sel == "Prix moyen au m²":
-                    bar_fig = px.bar(
-                        comp_agg.sort_values("prix_m2", ascending=False),
-                        x="nom_departement",
-                        y="prix_m2",
-                        labels={"nom_departement": "Département", "prix_m2": "Prix moyen au m²"},
+            with c3:
+                st.subheader("Evolution du prix au m² par année")
+
+                df_e = lot.resultat("serie_annee")
+                df_e = df_e[df_e["nb"] >= 30].copy()
+
+                if not df_e.empty:
+                    df_e["moving"] = df_e["prix_m2"].rolling(window=3, center=True).mean()
+                    evol_fig = px.line(
+                        df_e,
+                        x="annee",
+                        y=["prix_m2", "moving"],
+                        markers=True,
+                        labels={"annee": "Année", "value": "Prix moyen au m²", "variable": ""},
                     )
-                elif metric_sel == "Indice (France=100)":
-                    bar_fig = px.bar(
-                        comp_agg.sort_values("indice_100", ascending=False),
-                        x="nom_departement",
-                        y="indice_100",
-                        labels={"nom_departement": "Département", "indice_100": "Indice prix (France=100)"},
+                    evol_fig.update_layout(legend_title_text="")
+                    st.plotly_chart(evol_fig, use_container_width=True)
+
+                    st.caption(
+                        f"Évolution calculée uniquement pour les années ayant au moins 30 transactions. "
+                        f"Total utilisé : {int(df_e['nb'].sum()):,}".replace(",", " ")
                     )
                 else:
-                    bar_fig = px.bar(
-                        comp_agg.sort_values("nb", ascending=False),
-                        x="nom_departement",
-                        y="nb",
-                        labels={"nom_departement": "Département", "nb": "Nombre de transactions"},
-                    )
-
-                bar_fig.update_layout(xaxis_tickangle=-60)
-                st.plotly_chart(bar_fig, use_container_width=True)
-
-            with col_sel:
-                st.markdown("Comparaison A vs B")
-
-                options_dep = sorted(comp_agg["nom_departement"].unique())
-                if len(options_dep) >= 2:
-                    depA = st.selectbox("Département A", options_dep, index=0)
-                    depB = st.selectbox("Département B", options_dep, index=1)
-
-                    dfA = comp_agg[comp_agg["nom_departement"] == depA].iloc[0]
-                    dfB = comp_agg[comp_agg["nom_departement"] == depB].iloc[0]
-
-                    cA, cB = st.columns(2)
-                    with cA:
-                        st.markdown(f"**{depA}**")
-                        st.metric("Prix moyen au m²", f"{dfA['prix_m2']:,.0f} €")
-                        st.metric("Indice prix (France=100)", f"{dfA['indice_100']:,.1f}")
-                        st.metric("Nombre de transactions", f"{int(dfA['nb']):,}".replace(",", " "))
-                    with cB:
-                        st.markdown(f"**{depB}**")
-                        st.metric("Prix moyen au m²", f"{dfB['prix_m2']:,.0f} €")
-                        st.metric("Indice prix (France=100)", f"{dfB['indice_100']:,.1f}")
-                        st.metric("Nombre de transactions", f"{int(dfB['nb']):,}".replace(",", " "))
+                    st.info("Pas assez de données (≥ 30 transactions/an) pour afficher une évolution robuste.")
+
+            with c4:
+                st.subheader("Prix au m² vs surface")
+
+                if "surface_reelle_bati" in df.columns:
+                    mode, nb_points, contenu = lot.resultat("nuage")
+                    if nb_points == 0:
+                        st.info("Pas assez de données pour le nuage de points.")
+                    elif mode == "densite":
+                        bords_x, bords_y, effectifs = contenu
+                        # Échelle log : les zones peu denses restent visibles
+                        with np.errstate(divide="ignore"):
+                            z = np.where(effectifs > 0, np.log10(effectifs), np.nan)
+                        graduations = np.arange(0, int(np.nanmax(z)) + 1) if np.isfinite(z).any() else np.array([0])
+                        scat_fig = go.Figure(go.Heatmap(
+                            x=(bords_x[:-1] + bords_x[1:]) / 2,
+                            y=(bords_y[:-1] + bords_y[1:]) / 2,
+                            z=z,
+                            customdata=effectifs,
+                            colorscale="Blues",
+                            colorbar=dict(
+                                title="Nombre de biens",
+                                tickvals=graduations,
+                                ticktext=[f"{10 ** int(g):,}".replace(",", " ") for g in graduations],
+                            ),
+                            hovertemplate="Surface : %{x:,.0f} m²<br>Prix : %{y:,.0f} €/m²<br>Biens : %{customdata:,}<extra></extra>",
+                        ))
+                        scat_fig.update_layout(xaxis_title="Surface réelle (m²)", yaxis_title="Prix au m²")
+                        st.plotly_chart(scat_fig, use_container_width=True)
+                        st.caption(
+                            f"Densité des {nb_points:,} biens filtrés".replace(",", " ")
+                            + " (grille 2D, axes coupés au quantile 99,5 %)."
+                        )
+                    else:
+                        scat_fig = px.scatter(
+                            contenu,
+                            x="surface_reelle_bati",
+                            y="prix_m2",
+                            color="type_local",
+                            hover_data=[c for c in ["valeur_fonciere", "commune", "nom_departement"] if c in contenu.columns],
+                            labels={
+                                "surface_reelle_bati": "Surface réelle (m²)",
+                                "prix_m2": "Prix au m²",
+                                "type_local": "Type de bien"
+                            },
+                            render_mode="webgl",
+                        )
+                        st.plotly_chart(scat_fig, use_container_width=True)
+                        if len(contenu) < nb_points:
+                            st.caption(
+                                f"{len(contenu):,} points sur {nb_points:,} (échantillon stratifié par type de bien).".replace(",", " ")
+                            )
                 else:
-                    st.info("Nombre de départements insuffisant pour comparaison A/B.")
+                    st.info("Variables surface ou prix manquantes pour le scatter.")
 
-        st.markdown("---")
-        st.subheader("Paris vs Banlieue IDF (bouton dédié)")
+    ################### TAB 2 – COMPARAISONS DÉPARTEMENTS
 
-        df_pb = df_comp.copy()
-        df_paris = df_pb[df_pb["zone_paris"] == "Paris"] if "zone_paris" in df_pb.columns else df_pb.iloc[0:0]
-        df_banl = df_pb[df_pb["zone_paris"] == "Banlieue IDF"] if "zone_paris" in df_pb.columns else df_pb.iloc[0:0]
+    if tab2.open:
+        with tab2:
+            st.subheader("Comparaison inter-départements")
 
-        if st.button("Comparer Paris / Banlieue"):
-            colP, colB = st.columns(2)
-            with colP:
-                st.markdown("**Paris (75)**")
-                if not df_paris.empty and "prix_m2" in df_paris.columns:
-                    st.metric("Prix moyen au m²", f"{df_paris['prix_m2'].mean():,.0f} €")
-                else:
-                    st.write("Pas de données pour Paris avec ces filtres.")
+            cellules_comp = filtres_cube.appliquer(sauf=["nom_departement"])
 
-            with colB:
-                st.markdown("**Banlieue IDF (77,78,91–95)**")
-                if not df_banl.empty and "prix_m2" in df_banl.columns:
-                    st.metric("Prix moyen au m²", f"{df_banl['prix_m2'].mean():,.0f} €")
-                else:
-                    st.write("Pas de données pour la banlieue avec ces filtres.")
-
-            if (
-                not df_paris.empty and not df_banl.empty
-                and "prix_m2" in df_paris.columns and "prix_m2" in df_banl.columns
-            ):
-                comp = pd.DataFrame({
-                    "Zone": ["Paris", "Banlieue IDF"],
-                    "Prix moyen": [df_paris["prix_m2"].mean(), df_banl["prix_m2"].mean()]
-                })
-                figpb = px.bar(comp, x="Zone", y="Prix moyen", text="Prix moyen")
-                figpb.update_traces(texttemplate="%{text:,.0f} €", textposition="outside")
-                st.plotly_chart(figpb, use_container_width=True)
+            comp_agg = memo.obtenir(
+                cle_filtres("comp", etat, sauf=["nom_departement"]),
+                lambda: agreger(cellules_comp, ["code_departement", "nom_departement"]).dropna(subset=["prix_m2"]),
+                persistant=True,
+            )
+
+            if comp_agg.empty:
+                st.info("Pas assez de données pour la comparaison inter-départements.")
+            else:
+                moyenne_fr = comp_agg["prix_m2"].mean()
+                # assign : l'agrégat mémorisé est partagé, on ne le modifie pas
+                comp_agg = comp_agg.assign(
+                    indice_100=comp_agg["prix_m2"] / moyenne_fr * 100 if moyenne_fr and moyenne_fr > 0 else np.nan
+                )
+
+                col_top, col_sel = st.columns([1.6, 1.4])
+
+                with col_top:
+                    classement_departements(comp_agg)
+
+                with col_sel:
+                    comparaison_ab(comp_agg)
+
+            st.markdown("---")
+            st.subheader("Paris vs Banlieue IDF (bouton dédié)")
+
+            paris_banlieue(cellules_comp)
 
-    
-    
     ################ TAB 3 – TYPOLOGIE DES BIENS
-    
-    with tab3:
-        st.subheader("Répartition par type de bien")
-
-        if "type_local" in dff.columns and "prix_m2" in dff.columns:
-            agg_type = (
-                dff.groupby("type_local", as_index=False)
-                .agg(prix_m2=("prix_m2", "mean"), nb=(count_col, "count"))
-            )
+
+    if tab3.open:
+        with tab3:
+            def carte_chaleur_types():
+                dep_top = (
+                    agreger(cellules, "nom_departement")
+                    .sort_values("nb", ascending=False)
+                    .head(10)["nom_departement"]
+                    .tolist()
+                )
+                return agreger(
+                    cellules[cellules["nom_departement"].isin(dep_top)], ["nom_departement", "type_local"]
+                )[["nom_departement", "type_local", "prix_m2"]]
+
+            lot.soumettre("types", agreger, cellules, "type_local")
+            lot.soumettre("types_departements", carte_chaleur_types)
+
+            st.subheader("Répartition par type de bien")
+
+            agg_type = lot.resultat("types")
 
             c1, c2 = st.columns([1.2, 1])
 
@@ -646,161 +703,151 @@ def main():
 
             st.markdown("---")
 
-            if "nom_departement" in dff.columns:
-                st.subheader("Prix au m² par type et par département (top 10 départements)")
+            st.subheader("Prix au m² par type et par département (top 10 départements)")
 
-                dep_top = (
-                    dff.groupby("nom_departement", as_index=False)[count_col]
-                    .count()
-                    .rename(columns={count_col: "nb"})
-                    .sort_values("nb", ascending=False)
-                    .head(10)["nom_departement"]
-                    .tolist()
-                )
+            heat = lot.resultat("types_departements")
 
-                dft = dff[dff["nom_departement"].isin(dep_top)].copy()
-                heat = dft.groupby(["nom_departement", "type_local"], as_index=False)["prix_m2"].mean()
+            heat_fig = px.density_heatmap(
+                heat,
+                x="type_local",
+                y="nom_departement",
+                z="prix_m2",
+                color_continuous_scale="Viridis",
+                labels={"prix_m2": "Prix moyen au m²", "type_local": "Type", "nom_departement": "Département"},
+            )
+            st.plotly_chart(heat_fig, use_container_width=True)
 
-                heat_fig = px.density_heatmap(
-                    heat,
-                    x="type_local",
-                    y="nom_departement",
-                    z="prix_m2",
-                    color_continuous_scale="Viridis",
-                    labels={"prix_m2": "Prix moyen au m²", "type_local": "Type", "nom_departement": "Département"},
+    # TAB 4 – TABLEAUX & DONNÉES
+
+    if tab4.open:
+        with tab4:
+            st.subheader("Classement des communes selon le prix au m²")
+
+            if classement is None:
+                st.info("La colonne 'commune' n'est pas disponible dans la base.")
+            else:
+                # Roll-up par commune du classement pré-agrégé (filtres hors prix)
+                agg_commune = memo.obtenir(
+                    cle_filtres("communes", etat, sauf=["prix"]),
+                    lambda: par_commune(filtres_classement.appliquer()),
+                    persistant=True,
                 )
-                st.plotly_chart(heat_fig, use_container_width=True)
-        else:
-            st.info("Variables 'type_local' ou 'prix_m2' manquantes pour cette analyse.")
 
-    
-    # TAB 4 – TABLEAUX & DONNÉES
-    
-    with tab4:
-        st.subheader("Classement des communes selon le prix au m²")
-
-        if "commune" not in dff.columns or "prix_m2" not in dff.columns:
-            st.info("La colonne 'commune' ou 'prix_m2' n'est pas disponible dans la base.")
-        else:
-            group_cols = ["commune"]
-            if "nom_departement" in dff.columns:
-                group_cols.append("nom_departement")
-
-            agg_commune = (
-                dff.groupby(group_cols, as_index=False)["prix_m2"]
-                .mean()
-                .dropna(subset=["prix_m2"])
-            )
+                seuil = st.number_input(
+                    "Nombre minimum de ventes par commune", min_value=1, value=SEUIL_VENTES, step=5,
+                )
+                st.caption("Classement sur toutes les ventes de la sélection, sans le filtre de prix.")
+                top, bottom = extremes(agg_commune, seuil, TOP_N)
 
-            col_left, col_right = st.columns(2)
+                col_left, col_right = st.columns(2)
 
-            with col_left:
-                st.markdown("#### 🔝 Top 20 communes les plus chères")
-                top20 = agg_commune.sort_values("prix_m2", ascending=False).head(20)
-                st.dataframe(top20.reset_index(drop=True))
+                with col_left:
+                    st.markdown(f"#### 🔝 Top {TOP_N} communes les plus chères")
+                    st.dataframe(top)
 
-            with col_right:
-                st.markdown("#### 🔻 Top 20 communes les moins chères")
-                bottom20 = agg_commune.sort_values("prix_m2", ascending=True).head(20)
-                st.dataframe(bottom20.reset_index(drop=True))
+                with col_right:
+                    st.markdown(f"#### 🔻 Top {TOP_N} communes les moins chères")
+                    st.dataframe(bottom)
 
-        st.markdown("---")
-        st.subheader("Aperçu des données filtrées")
-        st.dataframe(dff.head(300))
+                with st.expander("Classement complet"):
+                    retenues = np.flatnonzero(agg_commune["nb_ventes"].to_numpy() >= seuil)
+                    tableau_pagine(
+                        agg_commune, retenues, "communes_immobilier",
+                        tri_defaut="prix_m2", croissant_defaut=False,
+                    )
 
-        csv = dff.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            label="Télécharger les données filtrées (CSV)",
-            data=csv,
-            file_name="donnees_filtrees_immobilier.csv",
-            mime="text/csv"
-        )
+            st.markdown("---")
+            st.subheader("Aperçu des données filtrées")
+            # Lignes retenues (numéros de ligne dans la vue partagée) : tableau paginé et export
+            lignes = filtres.lignes()
+            tableau_pagine(df, lignes, "apercu_immobilier")
+
+            st.markdown("---")
+            st.subheader("Exporter les données filtrées")
+            export_donnees(df, lignes)
 
     # ---------------------------
     # TAB 5 – PRÉVISIONS & TENDANCES
     # ---------------------------
-    with tab5:
-        st.subheader("Prévisions simples & tendances (prix moyen au m²)")
-
-        df_fore = df.copy()
-        if zone_macro_sel != "Toutes" and "zone_macro" in df_fore.columns:
-            df_fore = df_fore[df_fore["zone_macro"] == zone_macro_sel]
-        if zone_fiscale_sel != "Toutes" and "zone_fiscale" in df_fore.columns:
-            df_fore = df_fore[df_fore["zone_fiscale"] == zone_fiscale_sel]
-        if region_sel != "Toutes" and "region" in df_fore.columns:
-            df_fore = df_fore[df_fore["region"] == region_sel]
-        if dep_sel != "Tous" and "nom_departement" in df_fore.columns:
-            df_fore = df_fore[df_fore["nom_departement"] == dep_sel]
-        if type_sel != "Tous" and "type_local" in df_fore.columns:
-            df_fore = df_fore[df_fore["type_local"] == type_sel]
-        if "prix_m2" in df_fore.columns:
-            df_fore = df_fore[(df_fore["prix_m2"] >= prix_min) & (df_fore["prix_m2"] <= prix_max)]
-
-        if "annee" not in df_fore.columns or "prix_m2" not in df_fore.columns:
-            st.info("Colonnes insuffisantes pour faire une prévision (annee / prix_m2).")
-            return
-
-        ts = (
-            df_fore.groupby("annee", as_index=False)
-            .agg(prix_m2=("prix_m2", "mean"), nb=(count_col, "count"))
-            .sort_values("annee")
-        )
+    if tab5.open:
+        with tab5:
+            st.subheader("Prévisions simples & tendances (prix moyen au m²)")
+
+            # Série de la sélection sur toutes les années et tous les prix : lue dans la
+            # table matérialisée (prep_previsions.py), calculée en direct sinon
+            selection = selection_immobilier(
+                {"zone_macro": zone_macro_sel, "zone_fiscale": zone_fiscale_sel,
+                 "region": region_sel, "nom_departement": dep_sel},
+                type_sel,
+            )
+            if previsions is not None and selection is not None:
+                niveau, cle, type_local = selection
+                serie = lire_previsions(previsions, niveau=niveau, cle=cle, type_local=type_local)
+            else:
+                serie = memo.obtenir(
+                    cle_filtres("prevision_prix", etat, sauf=["annee", "prix"]),
+                    lambda: historique_et_prevision(series_prix(filtres_cube.appliquer(sauf=["annee", "tranche"]))),
+                    persistant=True,
+                )
+            st.caption("Tendance calculée sur toutes les années et tous les prix de la sélection (années ≥ 30 transactions).")
 
-        ts = ts[ts["nb"] >= 30].copy()
+            ts = serie[serie["nb"].notna()]
 
-        if not ts.empty and ts["nb"].min() < 50:
-            st.info(
-                "Attention : certaines années reposent sur un nombre limité de transactions. "
-                "La tendance doit être interprétée avec prudence."
-            )
+            if not ts.empty and ts["nb"].min() < 50:
+                st.info(
+                    "Attention : certaines années reposent sur un nombre limité de transactions. "
+                    "La tendance doit être interprétée avec prudence."
+                )
 
-        if len(ts) < 3:
-            st.info("Pas assez d'années (≥ 30 transactions/an) pour une prévision globale (minimum 3 années).")
-        else:
-            X = ts["annee"].values.astype(float)
-            y = ts["prix_m2"].values.astype(float)
+            if len(ts) < 3:
+                st.info("Pas assez d'années (≥ 30 transactions/an) pour une prévision globale (minimum 3 années).")
+            else:
+                # Droite des moindres carrés, 3 années au-delà de la dernière (intervalle à 95 %)
+                df_fut = serie[serie["nb"].isna()].drop(columns="prix_m2")
+                df_fut = df_fut.rename(columns={"prevision": "prix_m2"}).assign(type="Prévision")
 
-            coef = np.polyfit(X, y, 1)
-            trend = np.poly1d(coef)
+                hist = ts.copy()
+                hist["type"] = "Historique"
 
-            last_year = int(ts["annee"].max())
-            future_years = np.arange(last_year + 1, last_year + 4)
-            future_prices = np.maximum(trend(future_years), 0)
+                full = pd.concat([hist[["annee", "prix_m2", "type"]], df_fut[["annee", "prix_m2", "type"]]], ignore_index=True)
 
-            hist = ts.copy()
-            hist["type"] = "Historique"
-            df_fut = pd.DataFrame({"annee": future_years, "prix_m2": future_prices, "type": "Prévision"})
+                fig_fore = px.line(
+                    full,
+                    x="annee",
+                    y="prix_m2",
+                    color="type",
+                    markers=True,
+                    labels={"annee": "Année", "prix_m2": "Prix moyen au m²", "type": ""},
+                )
+                # Intervalle de prévision à 95 % (résidus de la droite)
+                fig_fore.add_scatter(
+                    x=df_fut["annee"], y=df_fut["borne_haute"], mode="lines", line_width=0,
+                    showlegend=False, hoverinfo="skip",
+                )
+                fig_fore.add_scatter(
+                    x=df_fut["annee"], y=df_fut["borne_basse"], mode="lines", line_width=0,
+                    fill="tonexty", fillcolor="rgba(239, 85, 59, 0.15)", name="Intervalle 95 %",
+                )
+                st.plotly_chart(fig_fore, use_container_width=True)
 
-            full = pd.concat([hist[["annee", "prix_m2", "type"]], df_fut], ignore_index=True)
+                st.markdown("#### Prévisions (3 prochaines années)")
+                prev_table = df_fut[["annee", "prix_m2", "borne_basse", "borne_haute"]].round(0)
+                prev_table = prev_table.rename(columns={
+                    "annee": "Année", "prix_m2": "Prix prévisionnel au m²",
+                    "borne_basse": "Borne basse (95 %)", "borne_haute": "Borne haute (95 %)",
+                })
+                st.dataframe(prev_table)
 
-            fig_fore = px.line(
-                full,
-                x="annee",
-                y="prix_m2",
-                color="type",
-                markers=True,
-                labels={"annee": "Année", "prix_m2": "Prix moyen au m²", "type": ""},
-            )
-            st.plotly_chart(fig_fore, use_container_width=True)
-
-            st.markdown("#### Prévisions (3 prochaines années)")
-            prev_table = df_fut.copy()
-            prev_table["prix_m2"] = prev_table["prix_m2"].round(0)
-            prev_table = prev_table.rename(columns={"annee": "Année", "prix_m2": "Prix prévisionnel au m²"})
-            st.dataframe(prev_table)
-
-        st.markdown("---")
-        st.subheader("Tendance par zone macro / fiscale")
-
-        colz1, colz2 = st.columns(2)
-
-        with colz1:
-            st.markdown("**Tendance par zone macro (Nord/Sud/Est/Ouest/Centre)**")
-            if {"annee", "zone_macro", "prix_m2"}.issubset(df.columns):
-                zone_ts = (
-                    df.groupby(["annee", "zone_macro"], as_index=False)["prix_m2"]
-                    .mean()
-                    .sort_values(["zone_macro", "annee"])
+            st.markdown("---")
+            st.subheader("Tendance par zone macro / fiscale")
+
+            colz1, colz2 = st.columns(2)
+
+            with colz1:
+                st.markdown("**Tendance par zone macro (Nord/Sud/Est/Ouest/Centre)**")
+                zone_ts = memo.obtenir(
+                    cle_filtres("zone_ts", {}),
+                    lambda: agreger(cube, ["annee", "zone_macro"]).sort_values(["zone_macro", "annee"]),
                 )
                 if not zone_ts.empty:
                     fig_zone = px.line(
@@ -813,13 +860,11 @@ def main():
                     )
                     st.plotly_chart(fig_zone, use_container_width=True)
 
-        with colz2:
-            st.markdown("**Tendance par zone fiscale (A / B1 / B2 / C)**")
-            if {"annee", "zone_fiscale", "prix_m2"}.issubset(df.columns):
-                zf_ts = (
-                    df.groupby(["annee", "zone_fiscale"], as_index=False)["prix_m2"]
-                    .mean()
-                    .sort_values(["zone_fiscale", "annee"])
+            with colz2:
+                st.markdown("**Tendance par zone fiscale (A / B1 / B2 / C)**")
+                zf_ts = memo.obtenir(
+                    cle_filtres("zf_ts", {}),
+                    lambda: agreger(cube, ["annee", "zone_fiscale"]).sort_values(["zone_fiscale", "annee"]),
                 )
                 if not zf_ts.empty:
                     fig_zf = px.line(
@@ -832,14 +877,12 @@ def main():
                     )
                     st.plotly_chart(fig_zf, use_container_width=True)
 
-        st.markdown("---")
-        st.subheader("Tendance par type de bien (global France)")
+            st.markdown("---")
+            st.subheader("Tendance par type de bien (global France)")
 
-        if {"annee", "type_local", "prix_m2"}.issubset(df.columns):
-            type_ts = (
-                df.groupby(["annee", "type_local"], as_index=False)["prix_m2"]
-                .mean()
-                .sort_values(["type_local", "annee"])
+            type_ts = memo.obtenir(
+                cle_filtres("type_ts", {}),
+                lambda: agreger(cube, ["annee", "type_local"]).sort_values(["type_local", "annee"]),
             )
             if not type_ts.empty:
                 fig_type_ts = px.line(
@@ -852,21 +895,27 @@ def main():
                 )
                 st.plotly_chart(fig_type_ts, use_container_width=True)
 
-        st.markdown("---")
-        st.subheader("Synthèse automatique (lecture Data Scientist)")
+            st.markdown("---")
+            st.subheader("Synthèse automatique (lecture Data Scientist)")
 
-        try:
-            prix_global = df["prix_m2"].mean() if "prix_m2" in df.columns else np.nan
-            prix_filtre = dff["prix_m2"].mean() if "prix_m2" in dff.columns else np.nan
-            txt = f"""
+            try:
+                prix_global = agreger(cube).iloc[0]["prix_m2"]
+                prix_filtre = prix_moy
+                txt = f"""
 - Prix moyen national (toutes données) : **{prix_global:,.0f} € / m²**
 - Prix moyen avec vos filtres : **{prix_filtre:,.0f} € / m²**
-- Zone macro sélectionnée : **{zone_macro_sel if zone_macro_sel != 'Toutes' else 'Toutes'}**
-- Zone fiscale sélectionnée : **{zone_fiscale_sel if zone_fiscale_sel != 'Toutes' else 'Toutes'}**
+- Zone macro sélectionnée : **{', '.join(zone_macro_sel) or 'Toutes'}**
+- Zone fiscale sélectionnée : **{', '.join(zone_fiscale_sel) or 'Toutes'}**
 """
-            st.markdown(txt.replace(",", " "))
-        except Exception:
-            st.info("Impossible de générer une synthèse automatique.")
+                st.markdown(txt.replace(",", " "))
+            except Exception:
+                st.info("Impossible de générer une synthèse automatique.")
+
+    # Compteurs du mémo et temps des jobs du rerun (dimensionnement sous trafic réel)
+    with st.sidebar.expander("Cache des agrégats", expanded=False):
+        st.json(memo.stats())
+        st.caption(f"Jobs de calcul du rerun ({lot.workers} workers)")
+        st.dataframe(lot.chronos(), hide_index=True)
 
 
 if __name__ == "__main__":
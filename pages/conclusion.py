@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from pathlib import Path
+
+from core.dataset import FICHIERS_DONNEES, get_base
+from core.lecture import version_donnees
+from core.geo import attributs_departement
+from core.filtres import Filtres
+from core.carte import MESSAGE_GEOMETRIE, choroplethe, geometrie_disponible
+from core.hierarchie import Hierarchie
 
 st.set_page_config(page_title="Conclusion", layout="wide")
 
@@ -72,112 +77,41 @@ def classify_vs_reference(value: float, ref: float, tol: float = 0.02):
 # CHARGEMENT DES DONNÉES
 
 
-@st.cache_data
-def load_data():
-    base_dir = Path(__file__).resolve().parents[1]
-    path = base_dir / "data" / "base_finale_dashboard.csv"
+# Colonnes lues par la page (projection) : les requises sont vérifiées une fois au chargement
+COLONNES_REQUISES = ["zone", "region", "code_departement", "nom_departement", "type_local", "annee"]
+COLONNES_OPTIONNELLES = ["prix_m2", "risque_climatique"]
 
-    df = pd.read_csv(path, dtype={"code_departement": str}, low_memory=False)
 
-    # Normalisation
-    if "code_departement" in df.columns:
-        df["code_departement"] = df["code_departement"].astype(str).str.strip().str.upper()
-        mask_corse = df["code_departement"].isin(["2A", "2B"])
-        df.loc[~mask_corse, "code_departement"] = df.loc[~mask_corse, "code_departement"].str.zfill(2)
+@st.cache_resource
+def _vue_conclusion(version: str) -> pd.DataFrame:
+    # Projection de la base commune construite une fois par version des données
+    df = get_base(COLONNES_REQUISES, COLONNES_OPTIONNELLES)
 
-    if "nom_departement" not in df.columns:
-        df["nom_departement"] = df["code_departement"]
+    # Colonnes optionnelles (assign renvoie un nouvel objet : la base n'est pas modifiée)
+    if "prix_m2" not in df.columns:
+        df = df.assign(prix_m2=pd.NA)
 
-    if "zone" not in df.columns:
-        df["zone"] = "Centre"
-    df["zone"] = df["zone"].replace("Autres", "Centre")
+    if "risque_climatique" not in df.columns:
+        df = df.assign(risque_climatique=pd.NA)
 
-    # Colonnes attendues
-    if "region" not in df.columns:
-        df["region"] = pd.NA
-    df["region"] = df["region"].replace("", pd.NA)
+    # Région de la base, complétée par le référentiel (code département) si absente
+    manquantes = df["region"].isna()
+    if manquantes.any():
+        referentiel = attributs_departement(df["code_departement"], ["region"], categorie=False)["region"]
+        df = df.assign(region=df["region"].astype(object).where(~manquantes, referentiel))
 
-    if "annee" in df.columns:
-        df["annee"] = pd.to_numeric(df["annee"], errors="coerce")
+    return df
 
-    if "prix_m2" not in df.columns:
-        df["prix_m2"] = pd.NA
 
-    if "risque_climatique" not in df.columns:
-        df["risque_climatique"] = pd.NA
+def load_data():
+    # Vue partagée entre reruns et sessions, reconstruite quand les fichiers de données changent
+    return _vue_conclusion(version_donnees(*FICHIERS_DONNEES))
 
-    
-    # REMPLISSAGE DES RÉGIONS (par code département)
-  
-    regions_par_departement = {
-        # Auvergne-Rhône-Alpes
-        "01": "Auvergne-Rhône-Alpes", "03": "Auvergne-Rhône-Alpes", "07": "Auvergne-Rhône-Alpes",
-        "15": "Auvergne-Rhône-Alpes", "26": "Auvergne-Rhône-Alpes", "38": "Auvergne-Rhône-Alpes",
-        "42": "Auvergne-Rhône-Alpes", "43": "Auvergne-Rhône-Alpes", "63": "Auvergne-Rhône-Alpes",
-        "69": "Auvergne-Rhône-Alpes", "73": "Auvergne-Rhône-Alpes", "74": "Auvergne-Rhône-Alpes",
-
-        # Bourgogne-Franche-Comté
-        "21": "Bourgogne-Franche-Comté", "25": "Bourgogne-Franche-Comté",
-        "39": "Bourgogne-Franche-Comté", "58": "Bourgogne-Franche-Comté",
-        "70": "Bourgogne-Franche-Comté", "71": "Bourgogne-Franche-Comté",
-        "89": "Bourgogne-Franche-Comté", "90": "Bourgogne-Franche-Comté",
-
-        # Bretagne
-        "22": "Bretagne", "29": "Bretagne", "35": "Bretagne", "56": "Bretagne",
-
-        # Centre-Val de Loire
-        "18": "Centre-Val de Loire", "28": "Centre-Val de Loire",
-        "36": "Centre-Val de Loire", "37": "Centre-Val de Loire",
-        "41": "Centre-Val de Loire", "45": "Centre-Val de Loire",
-
-        # Grand Est
-        "08": "Grand Est", "10": "Grand Est", "51": "Grand Est",
-        "52": "Grand Est", "54": "Grand Est", "55": "Grand Est",
-        "57": "Grand Est", "67": "Grand Est", "68": "Grand Est",
-        "88": "Grand Est",
-
-        # Hauts-de-France
-        "02": "Hauts-de-France", "59": "Hauts-de-France", "60": "Hauts-de-France",
-        "62": "Hauts-de-France", "80": "Hauts-de-France",
-
-        # Île-de-France
-        "75": "Île-de-France", "77": "Île-de-France", "78": "Île-de-France",
-        "91": "Île-de-France", "92": "Île-de-France", "93": "Île-de-France",
-        "94": "Île-de-France", "95": "Île-de-France",
-
-        # Normandie
-        "14": "Normandie", "27": "Normandie", "50": "Normandie",
-        "61": "Normandie", "76": "Normandie",
-
-        # Nouvelle-Aquitaine
-        "16": "Nouvelle-Aquitaine", "17": "Nouvelle-Aquitaine", "19": "Nouvelle-Aquitaine",
-        "23": "Nouvelle-Aquitaine", "24": "Nouvelle-Aquitaine", "33": "Nouvelle-Aquitaine",
-        "40": "Nouvelle-Aquitaine", "47": "Nouvelle-Aquitaine", "64": "Nouvelle-Aquitaine",
-        "79": "Nouvelle-Aquitaine", "86": "Nouvelle-Aquitaine", "87": "Nouvelle-Aquitaine",
-
-        # Occitanie
-        "09": "Occitanie", "11": "Occitanie", "12": "Occitanie", "30": "Occitanie",
-        "31": "Occitanie", "32": "Occitanie", "34": "Occitanie", "46": "Occitanie",
-        "48": "Occitanie", "65": "Occitanie", "66": "Occitanie", "81": "Occitanie",
-        "82": "Occitanie",
-
-        # Pays de la Loire
-        "44": "Pays de la Loire", "49": "Pays de la Loire",
-        "53": "Pays de la Loire", "72": "Pays de la Loire", "85": "Pays de la Loire",
-
-        # Provence-Alpes-Côte d’Azur
-        "04": "Provence-Alpes-Côte d’Azur", "05": "Provence-Alpes-Côte d’Azur",
-        "06": "Provence-Alpes-Côte d’Azur", "13": "Provence-Alpes-Côte d’Azur",
-        "83": "Provence-Alpes-Côte d’Azur", "84": "Provence-Alpes-Côte d’Azur",
-
-        # Corse
-        "2A": "Corse", "2B": "Corse",
-    }
-
-    df["region"] = df["region"].fillna(df["code_departement"].map(regions_par_departement))
-    df["region"] = df["region"].fillna("Non renseignée")
 
-    return df
+@st.cache_resource
+def load_hierarchie():
+    # Cascade zone -> région -> département et catalogues type / année, construits une fois
+    return Hierarchie(load_data(), ["zone", "region", "nom_departement"], ["type_local", "annee"])
 
 
 
@@ -189,39 +123,35 @@ def main():
 
     st.sidebar.header("Filtres géographiques")
 
+    hierarchie = load_hierarchie()
+
     # Zone
-    zone_sel = st.sidebar.selectbox("Zone", ["Toutes"] + sorted(df["zone"].dropna().unique()))
-    df_zone = df if zone_sel == "Toutes" else df[df["zone"] == zone_sel]
+    zone_sel = st.sidebar.selectbox("Zone", ["Toutes"] + hierarchie.options("zone"))
+    zone = None if zone_sel == "Toutes" else zone_sel
 
     # Région (dépend de la zone)
-    region_dispo = sorted(df_zone["region"].dropna().unique())
-    region_sel = st.sidebar.selectbox("Région", ["Toutes"] + region_dispo)
-    if region_sel != "Toutes" and region_sel not in region_dispo:
-        region_sel = "Toutes"
-    df_region = df_zone if region_sel == "Toutes" else df_zone[df_zone["region"] == region_sel]
+    region_sel = st.sidebar.selectbox("Région", ["Toutes"] + hierarchie.enfants("region", zone=zone))
+    region = None if region_sel == "Toutes" else region_sel
 
     # Département (dépend de zone + région)
-    dep_dispo = sorted(df_region["nom_departement"].dropna().unique())
-    dep_sel = st.sidebar.selectbox("Département", ["Tous les départements"] + dep_dispo)
-    if dep_sel != "Tous les départements" and dep_sel not in dep_dispo:
-        dep_sel = "Tous les départements"
+    dep_sel = st.sidebar.selectbox(
+        "Département", ["Tous les départements"] + hierarchie.enfants("nom_departement", zone=zone, region=region)
+    )
 
     # Autres filtres
-    type_sel = st.sidebar.selectbox("Type de bien", ["Tous"] + sorted(df["type_local"].dropna().unique()))
-    year_sel = st.sidebar.selectbox("Année", ["Toutes"] + sorted(df["annee"].dropna().unique()))
-
-    # Application des filtres
-    dff = df.copy()
-    if zone_sel != "Toutes":
-        dff = dff[dff["zone"] == zone_sel]
-    if region_sel != "Toutes":
-        dff = dff[dff["region"] == region_sel]
-    if dep_sel != "Tous les départements":
-        dff = dff[dff["nom_departement"] == dep_sel]
-    if type_sel != "Tous":
-        dff = dff[dff["type_local"] == type_sel]
-    if year_sel != "Toutes":
-        dff = dff[dff["annee"] == year_sel]
+    type_sel = st.sidebar.selectbox("Type de bien", ["Tous"] + hierarchie.options("type_local"))
+    year_sel = st.sidebar.selectbox("Année", ["Toutes"] + hierarchie.options("annee"))
+
+    # Application des filtres (un masque par dimension, sans copie de la base)
+    dff = (
+        Filtres(df)
+        .egal("zone", zone_sel, tous="Toutes")
+        .egal("region", region_sel, tous="Toutes")
+        .egal("nom_departement", dep_sel, tous="Tous les départements")
+        .egal("type_local", type_sel, tous="Tous")
+        .egal("annee", year_sel, tous="Toutes")
+        .appliquer()
+    )
 
     if dff.empty:
         st.warning("Aucune donnée disponible avec ces filtres.")
@@ -245,7 +175,6 @@ def main():
     k4.metric("Risque climatique national", f"{risque_nat:.2f}" if pd.notna(risque_nat) else "N/A")
 
     # Tabs (sans les bandes blanches)
-    geo_url = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson"
     tab_immo, tab_clim = st.tabs(["Synthèse immobilière", "Synthèse climatique"])
 
 
@@ -260,23 +189,18 @@ def main():
 
         with col_c:
             map_df = (
-                dff.groupby(["code_departement", "nom_departement"], as_index=False)
+                dff.groupby(["code_departement", "nom_departement"], as_index=False, observed=True)
                 .agg(prix_m2=("prix_m2", "mean"))
                 .dropna()
             )
-            fig = px.choropleth(
-                map_df,
-                geojson=geo_url,
-                locations="code_departement",
-                featureidkey="properties.code",
-                color="prix_m2",
-                color_continuous_scale="Blues",
-                hover_name="nom_departement",
-                labels={"prix_m2": "Prix moyen au m²"}
-            )
-            fig.update_geos(fitbounds="locations", visible=False)
-            fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            if not geometrie_disponible():
+                st.error(MESSAGE_GEOMETRIE)
+            else:
+                fig = choroplethe(
+                    map_df["code_departement"], map_df["prix_m2"], map_df["nom_departement"],
+                    titre="Prix moyen au m²", colorscale="Blues", largeur_px=1000,
+                )
+                st.plotly_chart(fig, use_container_width=True)
 
         # Conclusion spécifique immobilier
         if prix_status == "moins":
@@ -318,23 +242,18 @@ def main():
 
         with col_c:
             map_df = (
-                dff.groupby(["code_departement", "nom_departement"], as_index=False)
+                dff.groupby(["code_departement", "nom_departement"], as_index=False, observed=True)
                 .agg(risque=("risque_climatique", "mean"))
                 .dropna()
             )
-            fig = px.choropleth(
-                map_df,
-                geojson=geo_url,
-                locations="code_departement",
-                featureidkey="properties.code",
-                color="risque",
-                color_continuous_scale="Reds",
-                hover_name="nom_departement",
-                labels={"risque": "Indice de risque climatique"}
-            )
-            fig.update_geos(fitbounds="locations", visible=False)
-            fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            if not geometrie_disponible():
+                st.error(MESSAGE_GEOMETRIE)
+            else:
+                fig = choroplethe(
+                    map_df["code_departement"], map_df["risque"], map_df["nom_departement"],
+                    titre="Indice de risque climatique", colorscale="Reds", format_z=".2f", largeur_px=1000,
+                )
+                st.plotly_chart(fig, use_container_width=True)
 
         # Conclusion spécifique climat
         if risque_status == "moins":
@@ -0,0 +1,85 @@
+import pandas as pd
+import pyarrow as pa
+import time
+
+from core.lecture import CSV_PATH, ARROW_PATH, lire_csv, ecrire_arrow
+from core.cube import CUBE_PATH, BORNES_PRIX, construire_cube, ecrire_cube
+from core.classement import CLASSEMENT_PATH, construire_classement, ecrire_classement
+from core.climat import MART_CLIMAT, construire_mart, ecrire_mart
+from core.schema import compacter, rapport_compaction
+
+# ---------------------------------------------------------
+# Base dashboard dérivée (Arrow IPC)
+# ---------------------------------------------------------
+# Toutes les dérivations faites au démarrage des pages (codes, prix_m2,
+# régions, zones, Paris/Banlieue) sont appliquées une fois ici. Les pages
+# n'ont plus qu'à mapper le fichier en mémoire (core.dataset.get_base).
+
+print(f"📥 Lecture : {CSV_PATH}")
+t0 = time.perf_counter()
+df_large = lire_csv(compact=False)
+print(f"➜ {len(df_large):,} lignes, {df_large.shape[1]} colonnes ({time.perf_counter() - t0:.1f} s)")
+
+# ---------------------------------------------------------
+# Types finaux compacts (catégories -> dictionnaires Arrow)
+# ---------------------------------------------------------
+df = compacter(df_large)
+
+pd.set_option("display.width", 140)
+print("📊 Octets par colonne avant / après compaction :")
+print(rapport_compaction(df_large, df).to_string())
+del df_large
+
+# ---------------------------------------------------------
+# Écriture Arrow IPC (non compressé : lisible par memory-map sans décodage)
+# ---------------------------------------------------------
+ecrire_arrow(df, ARROW_PATH)
+print(f"💾 {ARROW_PATH.name} ({ARROW_PATH.stat().st_size / 1024 ** 2:,.1f} Mo)")
+
+# ---------------------------------------------------------
+# Cube immobilier (annee x département x type x tranche de prix)
+# ---------------------------------------------------------
+# Même vue que la page immobilier (prix_m2 dans BORNES_PRIX).
+t0 = time.perf_counter()
+vue_immo = df[df["prix_m2"].between(*BORNES_PRIX, inclusive="both")]
+cube = construire_cube(vue_immo)
+ecrire_cube(cube)
+print(
+    f"💾 {CUBE_PATH.name} : {len(cube):,} cellules pour {len(vue_immo):,} lignes "
+    f"({time.perf_counter() - t0:.1f} s)"
+)
+
+# ---------------------------------------------------------
+# Classement des communes (annee x département x type x commune)
+# ---------------------------------------------------------
+# Même vue ; le seuil de ventes et le top-k sont appliqués par la page.
+if "commune" in vue_immo.columns:
+    t0 = time.perf_counter()
+    classement = construire_classement(vue_immo)
+    ecrire_classement(classement)
+    print(
+        f"💾 {CLASSEMENT_PATH.name} : {len(classement):,} lignes "
+        f"({classement['commune'].nunique():,} communes, {time.perf_counter() - t0:.1f} s)"
+    )
+del vue_immo
+
+# ---------------------------------------------------------
+# Mart climat (départements, communes, séries annuelles)
+# ---------------------------------------------------------
+t0 = time.perf_counter()
+mart = construire_mart(df)
+ecrire_mart(mart)
+for nom, table in mart.items():
+    print(f"💾 {MART_CLIMAT[nom].name} : {len(table):,} lignes")
+print(f"   mart climat construit en {time.perf_counter() - t0:.1f} s")
+del mart
+
+# ---------------------------------------------------------
+# Contrôle : temps de chargement côté dashboard
+# ---------------------------------------------------------
+t0 = time.perf_counter()
+with pa.memory_map(str(ARROW_PATH), "r") as source:
+    check = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+print(f"⏱️ Chargement memory-map : {time.perf_counter() - t0:.2f} s ({len(check):,} lignes)")
+
+print("\n✅ FIN — base dashboard prête")
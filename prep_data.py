@@ -4,6 +4,9 @@ import unicodedata
 import os
 import numpy as np
 
+from core.geo import normaliser_departements, attributs_departement
+from core.classement import SEUIL_VENTES
+
 # ---------------------------------------------------------
 # CHEMINS
 # ---------------------------------------------------------
@@ -68,64 +71,16 @@ df["prix_m2"] = df["valeur_fonciere"] / df["surface_reelle_bati"]
 # ---------------------------------------------------------
 # Normalisation code departement
 # ---------------------------------------------------------
-df["code_departement"] = df["code_departement"].astype(str).str.replace(" ", "")
-
-def pad_dep(dep):
-    if dep in ["2A", "2B"]:
-        return dep
-    return dep.zfill(2)
-
-df["code_departement"] = df["code_departement"].apply(pad_dep)
-
-# ---------------------------------------------------------
-# Zones
-# ---------------------------------------------------------
-zones = {
-    "Zone_NordIDF": ["59","62","60","80","02","75","77","78","91","92","93","94","95"],
-    "Zone_Ouest": [
-        "22","29","35","56","14","27","50","61","76","44","49","53","72","85",
-        "18","28","36","37","41","45","16","17","33","40","47","64"
-    ],
-    "Zone_Sud": [
-        "09","11","12","30","31","32","34","46","48","65","66","81","82",
-        "04","05","06","13","83","84","2A","2B"
-    ],
-    "Zone_Est": [
-        "08","10","51","52","54","55","57","67","68","88",
-        "21","25","39","58","70","71","89","90",
-        "01","03","07","15","26","38","42","43","63","69","73","74"
-    ]
-}
-
-def get_zone(dep):
-    for z, liste in zones.items():
-        if dep in liste:
-            return z
-    return "Zone_Autre"
-
-df["zone"] = df["code_departement"].apply(get_zone)
-
-# ---------------------------------------------------------
-# Régions
-# ---------------------------------------------------------
-regions = {
-    "01":"AURA","02":"HDF","03":"AURA","04":"PACA","05":"PACA","06":"PACA","07":"AURA",
-    "08":"GE","09":"OCC","10":"GE","11":"OCC","12":"OCC","13":"PACA","14":"NOR","15":"AURA",
-    "16":"NAQ","17":"NAQ","18":"CVL","19":"NAQ","21":"BFC","22":"BRE","23":"NAQ",
-    "24":"NAQ","25":"BFC","26":"AURA","27":"NOR","28":"CVL","29":"BRE","2A":"COR",
-    "2B":"COR","30":"OCC","31":"OCC","32":"OCC","33":"NAQ","34":"OCC","35":"BRE",
-    "36":"CVL","37":"CVL","38":"AURA","39":"BFC","40":"NAQ","41":"CVL","42":"AURA",
-    "43":"AURA","44":"PDL","45":"CVL","46":"OCC","47":"NAQ","48":"OCC","49":"PDL",
-    "50":"NOR","51":"GE","52":"GE","53":"PDL","54":"GE","55":"GE","56":"BRE","57":"GE",
-    "58":"BFC","59":"HDF","60":"HDF","61":"NOR","62":"HDF","63":"AURA","64":"NAQ",
-    "65":"OCC","66":"OCC","67":"GE","68":"GE","69":"AURA","70":"BFC","71":"BFC",
-    "72":"PDL","73":"AURA","74":"AURA","75":"IDF","76":"NOR","77":"IDF","78":"IDF",
-    "79":"NAQ","80":"HDF","81":"OCC","82":"OCC","83":"PACA","84":"PACA","85":"PDL",
-    "86":"NAQ","87":"NAQ","88":"GE","89":"BFC","90":"BFC","91":"IDF","92":"IDF",
-    "93":"IDF","94":"IDF","95":"IDF"
-}
-
-df["region"] = df["code_departement"].apply(lambda d: regions.get(d, "Autre"))
+df["code_departement"] = normaliser_departements(df["code_departement"], categorie=False)
+
+# ---------------------------------------------------------
+# Zones + régions (référentiel core.geo, appliqué par département distinct)
+# ---------------------------------------------------------
+geo = attributs_departement(
+    df["code_departement"], ["zone4", "region_code"], categorie=False
+)
+df["zone"] = geo["zone4"]
+df["region"] = geo["region_code"]
 
 # ---------------------------------------------------------
 # Garder seulement Maison / Appartement
@@ -292,13 +247,19 @@ print("💾 prix_par_surface_type_annee.csv")
 annee_max = int(df["annee"].max())
 df_last = df[df["annee"] == annee_max]
 
-moy_villes_last = df_last.groupby(["commune","code_departement"])["prix_m2"].mean().reset_index()
+# Communes d'au moins SEUIL_VENTES ventes (même seuil que le dashboard)
+moy_villes_last = (
+    df_last.groupby(["commune","code_departement"])["prix_m2"]
+    .agg(prix_m2="mean", nb_ventes="count")
+    .reset_index()
+)
+moy_villes_last = moy_villes_last[moy_villes_last["nb_ventes"] >= SEUIL_VENTES]
 
-top20 = moy_villes_last.sort_values("prix_m2", ascending=False).head(20)
+top20 = moy_villes_last.nlargest(20, "prix_m2")
 top20.to_csv(RESULT_DIR / "top20_villes_plus_cheres.csv", index=False)
 print(f"💾 top20_villes_plus_cheres.csv (année {annee_max})")
 
-bottom20 = moy_villes_last.sort_values("prix_m2", ascending=True).head(20)
+bottom20 = moy_villes_last.nsmallest(20, "prix_m2")
 bottom20.to_csv(RESULT_DIR / "bottom20_villes_moins_cheres.csv", index=False)
 print(f"💾 bottom20_villes_moins_cheres.csv (année {annee_max})")
 
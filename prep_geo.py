@@ -0,0 +1,49 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+from core.carte import GEO_DIR, STATIC_GEO_DIR, SOURCE_GEOJSON, NIVEAUX, chemin_niveau, simplifier_topologie
+
+# ---------------------------------------------------------
+# Géométrie locale des départements (plusieurs niveaux)
+# ---------------------------------------------------------
+# Source : departements.geojson de france-geojson (propriétés code / nom),
+# récupéré une fois sur un poste connecté puis déposé dans data/geo/
+# (ou passé en argument). Les niveaux simplifiés sont écrits dans static/geo/,
+# servis par Streamlit : aucun accès réseau externe au runtime.
+#
+#   python prep_geo.py [chemin/vers/departements.geojson]
+
+SOURCE_URL = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements.geojson"
+
+source = Path(sys.argv[1]) if len(sys.argv) > 1 else SOURCE_GEOJSON
+if not source.exists():
+    print(f"❌ Source introuvable : {source}")
+    print(f"   Télécharger {SOURCE_URL} et le déposer dans {GEO_DIR}/")
+    sys.exit(1)
+
+print(f"📥 Lecture : {source}")
+with open(source, encoding="utf-8") as f:
+    geojson = json.load(f)
+taille_source = source.stat().st_size
+print(f"➜ {len(geojson['features'])} départements ({taille_source / 1024:,.0f} Ko)")
+
+STATIC_GEO_DIR.mkdir(parents=True, exist_ok=True)
+
+# ---------------------------------------------------------
+# Simplification topologique par niveau
+# ---------------------------------------------------------
+for niveau, (tolerance, decimales) in NIVEAUX.items():
+    t0 = time.perf_counter()
+    simplifie = simplifier_topologie(geojson, tolerance, decimales)
+    chemin = chemin_niveau(niveau)
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(simplifie, f, separators=(",", ":"))
+    taille = chemin.stat().st_size
+    print(
+        f"💾 {chemin.name} : tolérance {tolerance}°, {taille / 1024:,.0f} Ko "
+        f"(÷{taille_source / taille:,.1f}, {time.perf_counter() - t0:.1f} s)"
+    )
+
+print("\n✅ FIN — géométries prêtes")
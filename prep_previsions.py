@@ -0,0 +1,49 @@
+import sys
+import time
+
+from core.lecture import ARROW_PATH, lire_arrow, ecrire_arrow
+from core.cube import CUBE_PATH
+from core.climat import COLONNES_CLIMAT, charger_mart
+from core.prevision import (
+    PREVISIONS_IMMOBILIER_PATH, PREVISIONS_CLIMAT_PATH,
+    construire_previsions_immobilier, construire_previsions_climat,
+)
+
+# ---------------------------------------------------------
+# Prévisions matérialisées (à lancer après prep_dashboard.py)
+# ---------------------------------------------------------
+# Les pages lisent ces tables au lieu de regrouper et d'ajuster à chaque
+# rerun : mêmes chiffres pour tous les utilisateurs, onglets de prévision
+# affichés immédiatement. Une table plus ancienne que la base dérivée est
+# ignorée par les pages (calcul en direct).
+
+if not ARROW_PATH.exists() or not CUBE_PATH.exists():
+    print("❌ Base dérivée ou cube absent : lancer d'abord `python prep_dashboard.py`.")
+    sys.exit(1)
+
+# ---------------------------------------------------------
+# Prix au m² : (niveau, clé, type de bien), 3 ans
+# ---------------------------------------------------------
+t0 = time.perf_counter()
+cube = lire_arrow(path=CUBE_PATH)
+prev_immo = construire_previsions_immobilier(cube)
+ecrire_arrow(prev_immo, PREVISIONS_IMMOBILIER_PATH)
+nb_series = len(prev_immo[["niveau", "cle", "type_local"]].drop_duplicates())
+print(
+    f"💾 {PREVISIONS_IMMOBILIER_PATH.name} : {nb_series:,} séries, {len(prev_immo):,} lignes "
+    f"({time.perf_counter() - t0:.1f} s)"
+)
+
+# ---------------------------------------------------------
+# Climat : population exposée et risques par zone, 2026-2030
+# ---------------------------------------------------------
+t0 = time.perf_counter()
+annees = charger_mart(lambda: lire_arrow(COLONNES_CLIMAT))["annees"]
+prev_climat = construire_previsions_climat(annees)
+ecrire_arrow(prev_climat, PREVISIONS_CLIMAT_PATH)
+print(
+    f"💾 {PREVISIONS_CLIMAT_PATH.name} : {len(prev_climat):,} lignes "
+    f"({time.perf_counter() - t0:.1f} s)"
+)
+
+print("\n✅ FIN — prévisions prêtes")
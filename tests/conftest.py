@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules du dépôt (core/) importables depuis les tests, comme dans benchmarks/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,107 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from core.carte import NIVEAUX, simplifier_topologie
+
+
+# Grille N x N de « départements » : frontières intérieures sinueuses (bruit +
+# arc), bord extérieur rectiligne, et une île rattachée au premier.
+N = 4
+POINTS_PAR_BORD = 60
+
+
+def _bord(cache, rng, p, q):
+    """Polyligne de p à q, la même (à l'envers) pour les deux voisins."""
+    cle = tuple(sorted([p, q]))
+    if cle not in cache:
+        a, b = np.array(cle[0], dtype="float64"), np.array(cle[1], dtype="float64")
+        t = np.linspace(0, 1, POINTS_PAR_BORD)[:, None]
+        pts = a + t * (b - a)
+        exterieur = (a[0] == b[0] and a[0] in (0, N)) or (a[1] == b[1] and a[1] in (0, N))
+        if not exterieur:
+            normale = np.array([-(b - a)[1], (b - a)[0]])
+            decalage = rng.normal(0, 0.03, POINTS_PAR_BORD) + 0.1 * np.sin(np.linspace(0, np.pi, POINTS_PAR_BORD))
+            decalage[[0, -1]] = 0
+            pts = pts + normale * decalage[:, None]
+        cache[cle] = pts
+    pts = cache[cle]
+    return pts if cle[0] == p else pts[::-1]
+
+
+@pytest.fixture(scope="module")
+def grille():
+    rng = np.random.default_rng(0)
+    cache = {}
+    features = []
+    for i in range(N):
+        for j in range(N):
+            coins = [(i, j), (i + 1, j), (i + 1, j + 1), (i, j + 1)]
+            anneau = np.concatenate([_bord(cache, rng, coins[k], coins[(k + 1) % 4])[:-1] for k in range(4)])
+            anneau = np.vstack([anneau, anneau[:1]])
+            features.append({
+                "type": "Feature",
+                "properties": {"code": f"{i}{j}", "nom": f"D{i}{j}"},
+                "geometry": {"type": "Polygon", "coordinates": [anneau.tolist()]},
+            })
+    angle = np.linspace(0, 2 * np.pi, 80)[:-1]
+    ile = np.c_[N + 2 + 0.3 * np.cos(angle), 1 + 0.3 * np.sin(angle)]
+    ile = np.vstack([ile, ile[:1]])
+    features[0]["geometry"] = {
+        "type": "MultiPolygon",
+        "coordinates": [features[0]["geometry"]["coordinates"], [ile.tolist()]],
+    }
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _anneaux(geojson):
+    for feature in geojson["features"]:
+        g = feature["geometry"]
+        for poly in [g["coordinates"]] if g["type"] == "Polygon" else g["coordinates"]:
+            yield from poly
+
+
+def _nb_points(geojson) -> int:
+    return sum(len(anneau) for anneau in _anneaux(geojson))
+
+
+def _sur_bord_exterieur(p) -> bool:
+    return p[0] in (0, N) or p[1] in (0, N) or p[0] > N + 1
+
+
+@pytest.mark.parametrize("niveau", list(NIVEAUX))
+def test_frontieres_communes_etanches(grille, niveau):
+    tolerance, decimales = NIVEAUX[niveau]
+    simplifie = simplifier_topologie(grille, tolerance, decimales)
+
+    segments = Counter()
+    for anneau in _anneaux(simplifie):
+        for a, b in zip(anneau, anneau[1:]):
+            segments[(tuple(a), tuple(b))] += 1
+
+    # Chaque segment intérieur est parcouru une fois par chacun des deux
+    # voisins, en sens inverse : ni trou ni chevauchement
+    orphelins = [
+        s for s in segments
+        if (s[1], s[0]) not in segments and not (_sur_bord_exterieur(s[0]) and _sur_bord_exterieur(s[1]))
+    ]
+    assert not orphelins
+    assert all(n == 1 for n in segments.values())
+
+
+def test_points_decroissants_par_niveau(grille):
+    nb_source = _nb_points(grille)
+    par_tolerance = sorted(NIVEAUX.items(), key=lambda kv: kv[1][0])
+    nbs = [_nb_points(simplifier_topologie(grille, tol, dec)) for _, (tol, dec) in par_tolerance]
+    assert nbs[0] < nb_source
+    assert all(a >= b for a, b in zip(nbs, nbs[1:]))
+    assert nbs[-1] < nbs[0]
+
+
+def test_proprietes_et_departements_conserves(grille):
+    tolerance, decimales = NIVEAUX["leger"]
+    simplifie = simplifier_topologie(grille, tolerance, decimales)
+    assert [f["properties"] for f in simplifie["features"]] == [
+        {"code": f["properties"]["code"], "nom": f["properties"]["nom"]} for f in grille["features"]
+    ]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.prevision import ajuster, prevoir, prevoir_series, quantile_student
+
+
+# Séries empilées de longueurs différentes, dont une à un point (écartée) et
+# une à deux points (droite exacte, pas d'intervalle)
+LONGUEURS = {"a": 1, "b": 2, "c": 3, "d": 7, "e": 40}
+FUTURS = [2026, 2028, 2030]
+
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(0)
+    morceaux = []
+    for cle, n in LONGUEURS.items():
+        annees = 2025 - np.sort(rng.choice(60, n, replace=False))
+        valeurs = 100 + rng.normal(2, 1) * (annees - 2000) + rng.normal(0, 5, n)
+        morceaux.append(pd.DataFrame({"cle": cle, "annee": annees, "valeur": valeurs}))
+    return pd.concat(morceaux, ignore_index=True).sample(frac=1, random_state=0)
+
+
+def _serie(series, cle):
+    s = series[series["cle"] == cle]
+    return s["annee"].to_numpy(dtype="float64"), s["valeur"].to_numpy()
+
+
+def test_pente_et_ordonnee_comme_polyfit(series):
+    coefs = ajuster(series, ["cle"]).set_index("cle")
+    assert list(coefs.index) == ["b", "c", "d", "e"]
+    for cle, ligne in coefs.iterrows():
+        x, y = _serie(series, cle)
+        pente, ordonnee = np.polyfit(x, y, 1)
+        assert ligne["n"] == LONGUEURS[cle]
+        assert ligne["pente"] == pytest.approx(pente, rel=1e-9)
+        assert ligne["y_moy"] - ligne["pente"] * ligne["x_moy"] == pytest.approx(ordonnee, rel=1e-9)
+
+
+def test_intervalle_de_prevision(series):
+    stats = pytest.importorskip("scipy.stats")
+    prev = prevoir_series(series, ["cle"], x_futurs=FUTURS)
+    for cle in ["c", "d", "e"]:
+        x, y = _serie(series, cle)
+        n = len(x)
+        pente, ordonnee = np.polyfit(x, y, 1)
+        sigma = np.sqrt(np.sum((y - (ordonnee + pente * x)) ** 2) / (n - 2))
+        futurs = np.array(FUTURS, dtype="float64")
+        attendu = ordonnee + pente * futurs
+        marge = stats.t.ppf(0.975, n - 2) * sigma * np.sqrt(
+            1 + 1 / n + (futurs - x.mean()) ** 2 / np.sum((x - x.mean()) ** 2)
+        )
+        p = prev[prev["cle"] == cle]
+        assert list(p["annee"]) == FUTURS
+        np.testing.assert_allclose(p["prevision"], attendu, rtol=1e-9)
+        # Quantiles tabulés à 3 décimales
+        np.testing.assert_allclose(p["borne_haute"] - p["prevision"], marge, rtol=1e-3)
+        np.testing.assert_allclose(p["prevision"] - p["borne_basse"], marge, rtol=1e-3)
+
+
+def test_serie_a_deux_points_sans_intervalle(series):
+    prev = prevoir(ajuster(series, ["cle"]), ["cle"], x_futurs=FUTURS)
+    p = prev[prev["cle"] == "b"]
+    x, y = _serie(series, "b")
+    np.testing.assert_allclose(p["prevision"], np.polyval(np.polyfit(x, y, 1), FUTURS), rtol=1e-9)
+    assert p["borne_basse"].isna().all() and p["borne_haute"].isna().all()
+    assert "a" not in set(prev["cle"])
+
+
+def test_quantile_student():
+    stats = pytest.importorskip("scipy.stats")
+    # Table à 3 décimales jusqu'à 30, développement asymptotique au-delà
+    ddl = np.arange(1, 201)
+    np.testing.assert_allclose(quantile_student(ddl), stats.t.ppf(0.975, ddl), rtol=0, atol=5e-4)
+    assert np.isnan(quantile_student([0, -1])).all()